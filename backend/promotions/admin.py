@@ -5,8 +5,8 @@ from .models import FlashDeal
 @admin.register(FlashDeal)
 class FlashDealAdmin(admin.ModelAdmin):
     list_display = ('name', 'product_type', 'original_price', 'discount_percentage', 
-                   'sale_price', 'start_date', 'end_date', 'is_active', 'stock')
-    list_filter = ('product_type', 'is_active')
+                   'sale_price', 'start_date', 'end_date', 'is_active', 'is_live', 'stock')
+    list_filter = ('product_type', 'is_active', 'is_live')
     search_fields = ('name', 'description')
     readonly_fields = ('price_calculator',)
     fieldsets = (
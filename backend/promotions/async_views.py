@@ -0,0 +1,23 @@
+"""
+Async version of the homepage view, served by the ASGI deployment
+(store.asgi_urls).
+"""
+from django.views import View
+from store.concurrency import run_sync
+from store.responses import rendered_json_response
+from store.services.cache_service import CatalogCacheService, HOMEPAGE_KEY
+from .services.payload_service import PromotionPayloadService
+
+
+class AsyncHomepageView(View):
+    """
+    HomepageAPIView, running the flash deal, phone and accessory queries
+    at the same time when the payload is rebuilt
+    """
+    async def get(self, request):
+        payload = await run_sync(lambda: CatalogCacheService.get_or_build(
+            HOMEPAGE_KEY,
+            lambda: PromotionPayloadService.build_homepage(request, concurrent=True),
+            timeout=PromotionPayloadService.get_cache_timeout
+        ))
+        return rendered_json_response(request, payload)
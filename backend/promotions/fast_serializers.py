@@ -0,0 +1,29 @@
+"""
+values()-based version of FlashDealSerializer, see store.fast_serializers.
+"""
+from store.fast_serializers import ValuesSerializer, decimal_string, datetime_string, file_url
+
+
+class FlashDealValuesSerializer(ValuesSerializer):
+    """
+    FlashDealSerializer
+    """
+    fragment_name = 'flash_deal.1'
+    version_columns = ('updated_at',)
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('slug', 'slug', None),
+        ('description', 'description', None),
+        ('product_type', 'product_type', None),
+        ('original_price', 'original_price', decimal_string),
+        ('discount_percentage', 'discount_percentage', decimal_string),
+        ('sale_price', 'sale_price', decimal_string),
+        ('start_date', 'start_date', datetime_string),
+        ('end_date', 'end_date', datetime_string),
+        ('is_active', 'is_active', None),
+        ('stock', 'stock', None),
+        ('image_url', 'image', file_url),
+        ('reference_phone', 'reference_phone', None),
+        ('reference_accessory', 'reference_accessory', None),
+    )
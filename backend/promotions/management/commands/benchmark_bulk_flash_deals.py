@@ -0,0 +1,107 @@
+"""
+Management command to time creating flash deals for many phone variants
+at once (FlashDealService.bulk_create_flash_deals) against creating them
+one by one (create_flash_deal_from_product), and the set-based slug
+allocation (store.utils.allocate_slugs) the bulk path uses.
+
+Temporary phones and variants are created with --phones distinct phones,
+so most deal names repeat and get numbered slugs, as in a brand-wide
+sale. Everything runs in one transaction that is rolled back at the end.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.text import slugify
+from promotions.models import FlashDeal
+from promotions.services.flash_deal_service import FlashDealService
+from store.models import Phones, PhoneVariant
+from store.utils import allocate_slugs
+
+COLORS = ['Black', 'White', 'Blue', 'Green']
+STORAGES = ['128GB', '256GB', '512GB']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time bulk flash deal creation and slug allocation against creating deals one by one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000,
+                            help='Phone variants to create deals for (default: 10000)')
+        parser.add_argument('--phones', type=int, default=50,
+                            help='Distinct phones the variants belong to (default: 50)')
+        parser.add_argument('--one-by-one', type=int, default=200,
+                            help='Deals created one by one, to extrapolate from (default: 200)')
+
+    def handle(self, *args, **options):
+        if min(options['count'], options['phones'], options['one_by_one']) < 1:
+            raise CommandError('--count, --phones and --one-by-one must be positive')
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        now = timezone.now()
+        start_date, end_date = now, now + timedelta(days=1)
+        phones = Phones.objects.bulk_create([
+            Phones(name=f'Model {number}', brand='Benchmark', slug=f'benchmark-bulk-flash-deals-{number}')
+            for number in range(options['phones'])
+        ])
+        PhoneVariant.objects.bulk_create([
+            PhoneVariant(
+                phone=phones[number % len(phones)],
+                sku=f'BENCHMARK-BULK-{number}',
+                color=COLORS[number // len(phones) % len(COLORS)],
+                storage=STORAGES[number // len(phones) // len(COLORS) % len(STORAGES)],
+                price=Decimal(50000 + number % 100000).scaleb(-2),
+                stock=10
+            )
+            for number in range(options['count'] + options['one_by_one'])
+        ])
+        variants = PhoneVariant.objects.filter(phone__in=phones).order_by('id')
+        bulk_ids = list(variants.values_list('id', flat=True)[:options['count']])
+        names = [
+            slugify(f'{variant.phone.brand} {variant.phone.name} {variant.color} {variant.storage} Flash Deal')
+            for variant in variants.select_related('phone')[:options['count']]
+        ]
+        self.stdout.write(
+            f"{options['count']} variants of {options['phones']} phones, "
+            f"{len(set(names))} distinct deal names"
+        )
+
+        self.measure('allocate_slugs, no deals yet', lambda: allocate_slugs(FlashDeal.objects, names))
+        summary = self.measure('bulk_create_flash_deals', lambda: FlashDealService.bulk_create_flash_deals(
+            variants.filter(id__in=bulk_ids), start_date, end_date, discount_percentage=Decimal('15')
+        ))
+        if summary['created'] != options['count']:
+            raise CommandError(f"Created {summary['created']} deals, expected {options['count']}")
+        self.measure('allocate_slugs, all names taken', lambda: allocate_slugs(FlashDeal.objects, names))
+
+        one_by_one = list(variants.exclude(id__in=bulk_ids).select_related('phone'))
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for variant in one_by_one:
+                FlashDealService.create_flash_deal_from_product(variant, Decimal('15'), start_date, end_date)
+        elapsed = (time.perf_counter() - started) / len(one_by_one)
+        self.stdout.write(
+            f'  create_flash_deal_from_product: {elapsed * 1000:.1f}ms and '
+            f'{len(queries) / len(one_by_one):.1f} queries per deal, '
+            f"{elapsed * options['count']:.1f}s for {options['count']}"
+        )
+
+    def measure(self, label, function):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            result = function()
+        self.stdout.write(f'  {label}: {time.perf_counter() - started:.2f}s in {len(queries)} queries')
+        return result
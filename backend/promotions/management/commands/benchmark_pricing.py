@@ -0,0 +1,62 @@
+"""
+Management command to time the batch pricing functions against the
+Decimal ones they replace.
+
+"price_products, one discount" is how bulk flash deal creation prices a
+chunk (FlashDealService.price_products): converting to cents and back
+included, unlike "cents core".
+"""
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from promotions import utils
+from promotions.services.flash_deal_service import FlashDealService
+
+
+class Command(BaseCommand):
+    help = 'Time promotions.utils batch pricing against the per-product Decimal functions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Numbers of prices to time (default: 1000 10000 100000)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per measurement; the fastest is reported (default: 3)')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or min(options['count']) < 1:
+            raise CommandError('--count and --repeat must be positive')
+        rng = random.Random(0)
+        backend = 'NumPy' if utils.np is not None else 'pure Python'
+        self.stdout.write(f'Batch arithmetic: {backend}')
+
+        for count in options['count']:
+            prices = [Decimal(rng.randint(100, 200000)).scaleb(-2) for _ in range(count)]
+            discounts = [Decimal(rng.randint(0, 10000)).scaleb(-2) for _ in range(count)]
+            cents = [int(price * 100) for price in prices]
+            hundredths = [int(discount * 100) for discount in discounts]
+            timings = {
+                'Decimal loop': lambda: [
+                    utils.calculate_sale_price(price, discount) for price, discount in zip(prices, discounts)
+                ],
+                'batch': lambda: utils.batch_calculate_sale_prices(prices, discounts),
+                'batch, one discount': lambda: utils.batch_calculate_sale_prices(prices, discounts[0]),
+                'price_products, one discount': lambda: FlashDealService.price_products(prices, discounts[0]),
+                'cents core': lambda: utils.batch_sale_price_cents(cents, hundredths),
+            }
+            self.stdout.write(self.style.SUCCESS(f'{count} sale prices'))
+            baseline = None
+            for name, function in timings.items():
+                elapsed = self.time(options['repeat'], function)
+                baseline = baseline or elapsed
+                self.stdout.write(f'  {name}: {elapsed * 1000:.1f}ms ({baseline / elapsed:.1f}x)')
+
+    @staticmethod
+    def time(repeat, function):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
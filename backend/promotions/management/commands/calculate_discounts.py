@@ -1,9 +1,12 @@
 """
 Management command to calculate discounts for products.
 """
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
+from itertools import islice
+import csv
 import datetime
 from store.models import PhoneVariant, Accessory
 from promotions.utils import calculate_sale_price, calculate_discount_percentage, apply_discount
@@ -14,10 +17,25 @@ class Command(BaseCommand):
     help = 'Calculate discounts for products and optionally create flash deals'
 
     def add_arguments(self, parser):
-        parser.add_argument('--product-type', type=str, choices=['phone', 'accessory'], required=True,
+        parser.add_argument('--product-type', type=str, choices=['phone', 'accessory'],
                             help='Type of product to calculate discounts for')
-        parser.add_argument('--product-id', type=int, required=True,
+        parser.add_argument('--product-id', type=int,
                             help='ID of the product to calculate discounts for')
+
+        # Bulk selectors; without --create-deal the results are written to
+        # stdout as CSV and nothing is changed
+        parser.add_argument('--brand', type=str,
+                            help='Select the active variants of all phones of this brand')
+        parser.add_argument('--all-accessories', action='store_true',
+                            help='Select all active accessories')
+        parser.add_argument('--ids-file', type=str,
+                            help='Select the products whose ids are listed in this file, one per line')
+        parser.add_argument('--min-price', type=float,
+                            help='Only select products priced at least this much')
+        parser.add_argument('--max-price', type=float,
+                            help='Only select products priced at most this much')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Products read and priced per batch in bulk mode (default: 1000)')
         
         # Create a mutually exclusive group for discount calculation method
         discount_group = parser.add_mutually_exclusive_group(required=True)
@@ -32,6 +50,22 @@ class Command(BaseCommand):
                             help='Number of days the flash deal should be active (default: 7)')
 
     def handle(self, *args, **options):
+        selectors = ['brand', 'all_accessories', 'ids_file', 'min_price', 'max_price']
+        bulk = any(options[name] not in (None, False) for name in selectors)
+        if options['product_id'] is not None:
+            if bulk:
+                raise CommandError('--product-id cannot be combined with bulk selectors')
+            if options['product_type'] is None:
+                raise CommandError('--product-type is required with --product-id')
+            return self.handle_product(options)
+        if not bulk:
+            raise CommandError(
+                'Pass --product-id, or select products with --brand, --all-accessories, '
+                '--ids-file, --min-price or --max-price'
+            )
+        return self.handle_bulk(options)
+
+    def handle_product(self, options):
         product_type = options['product_type']
         product_id = options['product_id']
         create_deal = options['create_deal']
@@ -104,3 +138,114 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS(f'Active from: {flash_deal.start_date.strftime("%Y-%m-%d %H:%M")}'))
             self.stdout.write(self.style.SUCCESS(f'Active until: {flash_deal.end_date.strftime("%Y-%m-%d %H:%M")}'))
             self.stdout.write(self.style.SUCCESS(f'Deal slug: {flash_deal.slug}'))
+
+    def handle_bulk(self, options):
+        product_type = self.get_bulk_product_type(options)
+        querysets = self.selected_querysets(product_type, options)
+        if options['discount'] is not None:
+            discount_percentage = Decimal(str(options['discount']))
+            sale_price = None
+        else:
+            discount_percentage = None
+            sale_price = Decimal(str(options['sale_price']))
+
+        if not options['create_deal']:
+            self.write_report(querysets, product_type, discount_percentage, sale_price, options['chunk_size'])
+            return
+
+        now = timezone.now()
+        end_date = now + datetime.timedelta(days=options['days_active'])
+        totals = {'created': 0, 'phones': 0, 'accessories': 0}
+        # One transaction for all chunks: either every deal is created or none
+        with transaction.atomic():
+            for queryset in querysets:
+                summary = FlashDealService.bulk_create_flash_deals(
+                    queryset,
+                    start_date=now,
+                    end_date=end_date,
+                    discount_percentage=discount_percentage,
+                    sale_price=sale_price,
+                    chunk_size=options['chunk_size']
+                )
+                for key in totals:
+                    totals[key] += summary[key]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {totals['created']} flash deals ({totals['phones']} phones, "
+            f"{totals['accessories']} accessories), active until {end_date.strftime('%Y-%m-%d %H:%M')}"
+        ))
+
+    def get_bulk_product_type(self, options):
+        product_type = options['product_type']
+        if options['brand'] and options['all_accessories']:
+            raise CommandError('--brand and --all-accessories select different product types')
+        if options['brand']:
+            implied = 'phone'
+        elif options['all_accessories']:
+            implied = 'accessory'
+        else:
+            implied = product_type
+        if implied is None:
+            raise CommandError('--product-type is required with --ids-file or a price range')
+        if product_type is not None and product_type != implied:
+            raise CommandError(f'The selected products are not of type {product_type}')
+        return implied
+
+    def selected_querysets(self, product_type, options):
+        """
+        Yield querysets that together select the products to discount, in
+        id order. An ids file is read in chunks so it is never loaded whole.
+        """
+        if product_type == 'phone':
+            queryset = PhoneVariant.objects.filter(is_active=True).select_related('phone')
+            if options['brand']:
+                queryset = queryset.filter(phone__brand__iexact=options['brand'])
+        else:
+            queryset = Accessory.objects.filter(is_active=True)
+        if options['min_price'] is not None:
+            queryset = queryset.filter(price__gte=Decimal(str(options['min_price'])))
+        if options['max_price'] is not None:
+            queryset = queryset.filter(price__lte=Decimal(str(options['max_price'])))
+        queryset = queryset.order_by('id')
+
+        if not options['ids_file']:
+            yield queryset
+            return
+        try:
+            with open(options['ids_file'], encoding='utf-8') as f:
+                ids = (self.parse_id(line) for line in f if line.strip())
+                while chunk := list(islice(ids, options['chunk_size'])):
+                    yield queryset.filter(id__in=chunk)
+        except OSError as e:
+            raise CommandError(f"Could not read {options['ids_file']}: {e}")
+
+    def parse_id(self, line):
+        try:
+            return int(line)
+        except ValueError:
+            raise CommandError(f'Invalid product id in ids file: {line.strip()!r}')
+
+    def write_report(self, querysets, product_type, discount_percentage, sale_price, chunk_size):
+        """
+        Stream the calculated prices to stdout as CSV, one chunk at a time
+        """
+        writer = csv.writer(self.stdout, lineterminator='\n')
+        writer.writerow([
+            'product_type', 'product_id', 'product_name', 'original_price',
+            'discount_percentage', 'sale_price', 'savings'
+        ])
+        for queryset in querysets:
+            iterator = queryset.iterator(chunk_size=chunk_size)
+            while chunk := list(islice(iterator, chunk_size)):
+                discounts, sale_prices = FlashDealService.price_products(
+                    [product.price for product in chunk], discount_percentage, sale_price
+                )
+                for product, discount, product_sale_price in zip(chunk, discounts, sale_prices):
+                    if product_type == 'phone':
+                        product_name = f"{product.phone.brand} {product.phone.name} {product.color} {product.storage}"
+                    else:
+                        product_name = product.name
+                    writer.writerow([
+                        product_type, product.id, product_name, product.price,
+                        discount, product_sale_price, product.price - product_sale_price
+                    ])
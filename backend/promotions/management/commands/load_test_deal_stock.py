@@ -0,0 +1,92 @@
+"""
+Management command to load test the flash deal stock: threads buy a
+temporary deal's stock one unit at a time until it is sold out, giving
+some units back as failed purchases, and the final counts are checked.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from promotions.models import FlashDeal
+from promotions.services.deal_stock_service import DealStockService
+
+
+class Command(BaseCommand):
+    help = 'Time concurrent purchases of a flash deal and check that exactly its stock sells'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=20000,
+                            help='Units of the temporary deal (default: 20000)')
+        parser.add_argument('--threads', type=int, default=16,
+                            help='Concurrent buyers (default: 16)')
+        parser.add_argument('--give-back-every', type=int, default=10,
+                            help='Give back every nth unit a buyer takes (default: 10)')
+
+    def handle(self, *args, **options):
+        if min(options['stock'], options['threads'], options['give_back_every']) < 1:
+            raise CommandError('--stock, --threads and --give-back-every must be positive')
+        if DealStockService.counts_in_cache():
+            self.stdout.write(f"Counting in the cache ({type(caches['default']).__name__})")
+        else:
+            self.stdout.write('Counting in FlashDeal.stock (no shared cache)')
+
+        now = timezone.now()
+        deal = FlashDeal.objects.create(
+            name='Stock load test',
+            product_type='accessory',
+            original_price=Decimal('100.00'),
+            discount_percentage=Decimal('10.00'),
+            start_date=now - timedelta(minutes=1),
+            end_date=now + timedelta(hours=1),
+            stock=options['stock']
+        )
+        try:
+            self.run(deal, options)
+        finally:
+            deal.delete()
+
+    def run(self, deal, options):
+        lock = threading.Lock()
+        counts = {'taken': 0, 'given_back': 0, 'refused': 0}
+
+        def buy(_):
+            taken = given_back = 0
+            try:
+                while DealStockService.take(deal.id):
+                    taken += 1
+                    if taken % options['give_back_every'] == 0:
+                        DealStockService.give_back(deal.id)
+                        given_back += 1
+            finally:
+                connections.close_all()
+            with lock:
+                counts['taken'] += taken
+                counts['given_back'] += given_back
+                counts['refused'] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['threads']) as executor:
+            list(executor.map(buy, range(options['threads'])))
+        elapsed = time.perf_counter() - started
+        calls = sum(counts.values())
+
+        # A buyer may be refused while another's refusal is being undone:
+        # sell what is left
+        while DealStockService.take(deal.id):
+            counts['taken'] += 1
+        sold = counts['taken'] - counts['given_back']
+        DealStockService.reconcile()
+        deal.refresh_from_db()
+
+        self.stdout.write(
+            f"{counts['taken']} taken, {counts['given_back']} given back and {counts['refused']} refused "
+            f"in {elapsed:.2f}s ({calls / elapsed:.0f} calls/s)"
+        )
+        if sold != options['stock'] or deal.stock != 0:
+            raise CommandError(f"Sold {sold} of {options['stock']}, {deal.stock} left in FlashDeal.stock")
+        self.stdout.write(self.style.SUCCESS(f'Sold exactly {sold}, 0 left in FlashDeal.stock'))
@@ -0,0 +1,29 @@
+"""
+Management command to write the live flash deal stock counters back to
+the database.
+"""
+import time
+from django.core.management.base import BaseCommand
+from promotions.services.deal_stock_service import DealStockService
+
+
+class Command(BaseCommand):
+    help = 'Copy the cached flash deal stock counters to FlashDeal.stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep reconciling')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between runs in --loop mode (default: 5)')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                updated = DealStockService.reconcile()
+                if updated or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(f'Updated the stock of {updated} flash deals'))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
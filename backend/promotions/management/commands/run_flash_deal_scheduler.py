@@ -0,0 +1,45 @@
+"""
+Management command that starts and ends flash deals on time, see
+FlashDealScheduler.
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from promotions.services.flash_deal_scheduler import FlashDealScheduler
+
+
+class Command(BaseCommand):
+    help = 'Set the live state of flash deals and rebuild their payloads as deals start and end'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reload-interval', type=float, default=60,
+                            help='Seconds between reloads of the deal boundaries (default: 60)')
+        parser.add_argument('--once', action='store_true',
+                            help='Update the live states once and exit')
+
+    def handle(self, *args, **options):
+        scheduler = FlashDealScheduler()
+        try:
+            while True:
+                scheduler.load()
+                self.update(scheduler)
+                if options['once']:
+                    return
+                reload_at = time.monotonic() + options['reload_interval']
+                while (remaining := reload_at - time.monotonic()) > 0:
+                    boundary = scheduler.next_boundary()
+                    if boundary is not None:
+                        remaining = min(remaining, (boundary - timezone.now()).total_seconds())
+                    if remaining > 0:
+                        time.sleep(remaining)
+                    if scheduler.pop_due():
+                        self.update(scheduler)
+        except KeyboardInterrupt:
+            pass
+
+    def update(self, scheduler):
+        started, ended = scheduler.update_live_states()
+        if started or ended:
+            self.stdout.write(self.style.SUCCESS(
+                f'{timezone.now():%Y-%m-%d %H:%M:%S}: {len(started)} deals started, {len(ended)} ended'
+            ))
@@ -2,6 +2,22 @@ from django.db import migrations
 from django.utils import timezone
 from django.utils.text import slugify
 
+
+def allocate_slug(manager, base_slug):
+    """
+    First of base_slug, base_slug-1, ... not taken, with one prefix query.
+    Kept here rather than imported from store.utils so later changes to the
+    app code cannot change what this migration does.
+    """
+    taken = set(manager.filter(slug__startswith=base_slug).values_list('slug', flat=True))
+    if base_slug not in taken:
+        return base_slug
+    n = 1
+    while f"{base_slug}-{n}" in taken:
+        n += 1
+    return f"{base_slug}-{n}"
+
+
 def transfer_flash_deals(apps, schema_editor):
     """
     Transfer existing flash deals from PhoneVariant and Accessory models to the new FlashDeal model
@@ -24,11 +40,7 @@ def transfer_flash_deals(apps, schema_editor):
         
         # Create slug
         base_slug = f"{slugify(phone.phone.name)}-{slugify(phone.color)}-{slugify(phone.storage)}-flash-deal"
-        slug = base_slug
-        n = 1
-        while FlashDeal.objects.filter(slug=slug).exists():
-            slug = f"{base_slug}-{n}"
-            n += 1
+        slug = allocate_slug(FlashDeal.objects, base_slug)
         
         # Create flash deal
         FlashDeal.objects.create(
@@ -61,11 +73,7 @@ def transfer_flash_deals(apps, schema_editor):
         
         # Create slug
         base_slug = f"{slugify(accessory.name)}-flash-deal"
-        slug = base_slug
-        n = 1
-        while FlashDeal.objects.filter(slug=slug).exists():
-            slug = f"{base_slug}-{n}"
-            n += 1
+        slug = allocate_slug(FlashDeal.objects, base_slug)
         
         # Create flash deal
         FlashDeal.objects.create(
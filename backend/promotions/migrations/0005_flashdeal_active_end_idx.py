@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0004_alter_flashdeal_discount_percentage'),
+        ('store', '0004_remove_accessory_flash_deal_end_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flashdeal',
+            index=models.Index(fields=['is_active', 'end_date'], name='flashdeal_active_end_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0005_flashdeal_active_end_idx'),
+        ('store', '0005_catalog_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='flashdeal',
+            name='flashdeal_active_end_idx',
+        ),
+        migrations.AddIndex(
+            model_name='flashdeal',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['end_date', 'start_date', 'id'], name='flashdeal_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flashdeal',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['start_date', 'id'], name='flashdeal_upcoming_idx'),
+        ),
+    ]
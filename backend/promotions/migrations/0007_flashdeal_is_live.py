@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0006_flashdeal_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashdeal',
+            name='is_live',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from store.models import PhoneVariant, Accessory
+from store.utils import save_kwargs_excluding, save_with_unique_slug
 from .utils import calculate_sale_price, calculate_discount_percentage
 
 class FlashDeal(models.Model):
@@ -21,6 +22,8 @@ class FlashDeal(models.Model):
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    # Whether the deal is running, set by run_flash_deal_scheduler
+    is_live = models.BooleanField(default=False, editable=False)
     stock = models.IntegerField(default=0)
     slug = models.CharField(max_length=255, unique=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -43,6 +46,21 @@ class FlashDeal(models.Model):
     
     class Meta:
         verbose_name_plural = "Flash Deals"
+        indexes = [
+            # Running deals (FlashDealService.get_active_flash_deals) and the
+            # next start/end boundary, both range scans on end_date > now
+            models.Index(
+                fields=['end_date', 'start_date', 'id'],
+                condition=models.Q(is_active=True),
+                name='flashdeal_live_idx'
+            ),
+            # FlashDealService.get_upcoming_flash_deals
+            models.Index(
+                fields=['start_date', 'id'],
+                condition=models.Q(is_active=True),
+                name='flashdeal_upcoming_idx'
+            ),
+        ]
     
     def clean(self):
         if self.end_date <= self.start_date:
@@ -87,8 +105,21 @@ class FlashDeal(models.Model):
             return self.sale_price
         return None
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stock = instance.__dict__.get('stock')
+        return instance
+
     def save(self, *args, **kwargs):
         self.clean()
+        # is_live is changed by the scheduler only. The live stock is counted
+        # by DealStockService and written back by reconcile, so stock is
+        # only written when it was set on this instance.
+        excluded = {'is_live'}
+        if getattr(self, '_loaded_stock', None) == self.stock:
+            excluded.add('stock')
+        kwargs = save_kwargs_excluding(self, kwargs, excluded)
         
         # If both original price and sale price are provided but no discount percentage,
         # calculate the discount percentage automatically
@@ -101,15 +132,9 @@ class FlashDeal(models.Model):
             self.calculate_sale_from_discount()
         
         # Generate slug if not provided
-        if not self.slug:
-            base_slug = slugify(self.name)
-            self.slug = base_slug
-            n = 1
-            while FlashDeal.objects.filter(slug=self.slug).exists():
-                self.slug = f"{base_slug}-{n}"
-                n += 1
-        
-        super().save(*args, **kwargs)
+        base_slug = None if self.slug else slugify(self.name)
+        save_with_unique_slug(self, base_slug, lambda: super(FlashDeal, self).save(*args, **kwargs))
+        self._loaded_stock = self.stock
     
     def __str__(self):
         return f"{self.name} ({self.discount_percentage}% off)"
@@ -0,0 +1,156 @@
+from django.core.cache import cache, caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from store.services.cache_service import CatalogCacheService
+from ..models import FlashDeal
+
+DEAL_STOCK_KEY_PREFIX = 'flash_deal_stock'
+
+
+class DealStockService:
+    """
+    Live stock of the flash deals, kept as one atomic counter per deal in
+    the shared cache so purchases do not queue on the deal's row lock.
+
+    A counter is seeded from FlashDeal.stock the first time it is used and
+    written back by reconcile (reconcile_flash_deal_stock), so the row is
+    only updated once per interval however many units sell. Saving a deal
+    with a new stock resets its counter to it; other saves leave the
+    counter (and FlashDeal.stock) alone.
+
+    If a counter is evicted before it was reconciled, it is seeded again
+    from the last reconciled stock, so the cache must not evict these keys
+    (they are stored without a timeout) and reconcile should run often.
+
+    The counters need a cache shared by all the workers with atomic
+    increments (Redis or Memcached). With any other cache, e.g. the
+    per-process local memory one where each worker would sell the whole
+    stock, stock is taken from FlashDeal.stock with a conditional UPDATE.
+    """
+    @staticmethod
+    def counts_in_cache():
+        """
+        Whether the live stock is counted in the cache
+        """
+        return isinstance(caches['default'], (RedisCache, BaseMemcachedCache))
+
+    @staticmethod
+    def stock_key(deal_id):
+        return f'{DEAL_STOCK_KEY_PREFIX}:{deal_id}'
+
+    @staticmethod
+    def seed(deal_ids):
+        """
+        Create the missing counters from FlashDeal.stock
+        """
+        stocks = FlashDeal.objects.filter(id__in=deal_ids).values_list('id', 'stock')
+        for deal_id, stock in stocks:
+            # add() keeps a counter another process created meanwhile
+            cache.add(DealStockService.stock_key(deal_id), max(stock, 0), None)
+
+    @staticmethod
+    def take(deal_id, quantity=1):
+        """
+        Take stock of a deal if that much is left
+
+        Returns:
+            bool: Whether the stock was taken. A request may be refused
+                while another one asking for more than is left is being
+                undone, but stock is never taken past zero.
+        """
+        if not DealStockService.counts_in_cache():
+            return FlashDeal.objects.filter(pk=deal_id, stock__gte=quantity).update(
+                stock=F('stock') - quantity,
+                updated_at=timezone.now()
+            ) > 0
+        key = DealStockService.stock_key(deal_id)
+        try:
+            remaining = cache.decr(key, quantity)
+        except ValueError:
+            DealStockService.seed([deal_id])
+            try:
+                remaining = cache.decr(key, quantity)
+            except ValueError:
+                # No such deal
+                return False
+        if remaining < 0:
+            cache.incr(key, quantity)
+            return False
+        return True
+
+    @staticmethod
+    def give_back(deal_id, quantity=1):
+        """
+        Return stock taken for a purchase that did not go through
+        """
+        if DealStockService.counts_in_cache():
+            try:
+                cache.incr(DealStockService.stock_key(deal_id), quantity)
+                return
+            except ValueError:
+                # No counter (evicted, or the deal was deleted): the next
+                # seed reads the row
+                pass
+        FlashDeal.objects.filter(pk=deal_id).update(
+            stock=F('stock') + quantity,
+            updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def get_stock(deal_ids):
+        """
+        Returns:
+            dict: deal id -> live stock, for the deals with a counter
+        """
+        if not DealStockService.counts_in_cache():
+            return {}
+        keys = {deal_id: DealStockService.stock_key(deal_id) for deal_id in deal_ids}
+        counters = cache.get_many(keys.values())
+        return {deal_id: counters[key] for deal_id, key in keys.items() if key in counters}
+
+    @staticmethod
+    def reset(deal):
+        """
+        Set the counter of a saved deal to its stock, once the save commits
+        """
+        if not DealStockService.counts_in_cache():
+            return
+        transaction.on_commit(lambda: cache.set(DealStockService.stock_key(deal.id), max(deal.stock, 0), None))
+
+    @staticmethod
+    def forget(deal_id):
+        if not DealStockService.counts_in_cache():
+            return
+        transaction.on_commit(lambda: cache.delete(DealStockService.stock_key(deal_id)))
+
+    @staticmethod
+    def reconcile():
+        """
+        Write the live counters of the deals that have not ended back to
+        FlashDeal.stock, in one UPDATE, and purge the flash deal payloads
+        if any stock changed
+
+        Returns:
+            int: How many deals were updated
+        """
+        deals = dict(FlashDeal.objects.filter(
+            is_active=True,
+            end_date__gt=timezone.now()
+        ).values_list('id', 'stock'))
+        live = DealStockService.get_stock(deals)
+        changed = {deal_id: stock for deal_id, stock in live.items() if stock != deals[deal_id]}
+        if not changed:
+            return 0
+        with transaction.atomic():
+            FlashDeal.objects.filter(id__in=changed).update(
+                stock=Case(
+                    *[When(pk=deal_id, then=Value(stock)) for deal_id, stock in changed.items()],
+                    output_field=IntegerField()
+                ),
+                updated_at=timezone.now()
+            )
+            CatalogCacheService.invalidate_flash_deals()
+        return len(changed)
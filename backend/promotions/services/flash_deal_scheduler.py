@@ -0,0 +1,86 @@
+import heapq
+from django.db import transaction
+from django.utils import timezone
+from store.services.cache_service import CatalogCacheService, HOMEPAGE_KEY, FLASH_DEALS_KEY
+from store.utils import build_catalog_request
+from ..models import FlashDeal
+from ..signals import flash_deals_live_changed
+from .flash_deal_service import FlashDealService
+from .payload_service import PromotionPayloadService
+
+
+class FlashDealScheduler:
+    """
+    Acts when flash deals start and end. The start and end times of the
+    deals that have not ended are kept in a min-heap; at each one the
+    scheduler sets FlashDeal.is_live for the running deals, rebuilds the
+    homepage and flash deal payloads so launch traffic finds them cached,
+    and sends flash_deals_live_changed.
+
+    Deals created or moved after loading are picked up by the next load.
+    """
+    def __init__(self):
+        self.boundaries = []
+
+    def load(self, now=None):
+        """
+        Fill the heap with the future boundaries of the running and upcoming deals
+        """
+        now = now or timezone.now()
+        self.boundaries = []
+        deals = list(FlashDealService.get_active_flash_deals().values_list('id', 'start_date', 'end_date'))
+        deals += FlashDealService.get_upcoming_flash_deals().values_list('id', 'start_date', 'end_date')
+        for deal_id, start_date, end_date in deals:
+            for boundary in (start_date, end_date):
+                if boundary > now:
+                    self.boundaries.append((boundary, deal_id))
+        heapq.heapify(self.boundaries)
+
+    def next_boundary(self):
+        return self.boundaries[0][0] if self.boundaries else None
+
+    def pop_due(self, now=None):
+        """
+        Remove the boundaries that have passed
+
+        Returns:
+            bool: Whether any had
+        """
+        now = now or timezone.now()
+        due = False
+        while self.boundaries and self.boundaries[0][0] <= now:
+            heapq.heappop(self.boundaries)
+            due = True
+        return due
+
+    def update_live_states(self, now=None):
+        """
+        Set is_live to whether each deal is running, with one UPDATE per
+        direction, then rebuild the deal payloads and send
+        flash_deals_live_changed if any deal started or ended
+
+        Returns:
+            tuple: (started deal ids, ended deal ids)
+        """
+        now = now or timezone.now()
+        running = {'is_active': True, 'start_date__lte': now, 'end_date__gt': now}
+        with transaction.atomic():
+            started = list(FlashDeal.objects.filter(is_live=False, **running).values_list('id', flat=True))
+            ended = list(FlashDeal.objects.filter(is_live=True).exclude(**running).values_list('id', flat=True))
+            if started:
+                FlashDeal.objects.filter(id__in=started).update(is_live=True)
+            if ended:
+                FlashDeal.objects.filter(id__in=ended).update(is_live=False)
+
+        if started or ended:
+            self.rebuild_payloads()
+            flash_deals_live_changed.send(sender=FlashDeal, started=started, ended=ended)
+        return started, ended
+
+    def rebuild_payloads(self):
+        request = build_catalog_request()
+        with CatalogCacheService.build_reads():
+            CatalogCacheService.set_many({
+                HOMEPAGE_KEY: PromotionPayloadService.build_homepage(request),
+                FLASH_DEALS_KEY: PromotionPayloadService.build_flash_deals(request),
+            }, PromotionPayloadService.get_cache_timeout())
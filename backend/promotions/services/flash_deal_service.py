@@ -1,8 +1,21 @@
+import math
+import time
+from itertools import islice
 from django.utils import timezone
+from django.utils.text import slugify
 from decimal import Decimal
-from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from django.db.models import Min, Q
+from django.db.models.query import QuerySet
+from store.services.cache_service import CatalogCacheService
+from store.utils import allocate_slugs
 from ..models import FlashDeal
-from ..utils import calculate_sale_price, calculate_discount_percentage, apply_discount
+from ..utils import (
+    calculate_sale_price, calculate_discount_percentage, apply_discount,
+    batch_calculate_sale_prices, batch_calculate_discount_percentages,
+    batch_sale_price_cents, batch_discount_hundredths, to_cents, from_cents
+)
 
 class FlashDealService:
     @staticmethod
@@ -15,12 +28,51 @@ class FlashDealService:
             is_active=True,
             start_date__lte=now,
             end_date__gt=now
-        )
+        ).order_by('end_date', 'start_date', 'id')
         
         if limit:
             return query[:limit]
         return query
     
+    @staticmethod
+    def get_next_boundary(now=None):
+        """
+        Get the next moment at which the set of active flash deals changes,
+        i.e. the earliest future start_date or end_date of an active deal.
+
+        Only deals that have not ended yet can have a future boundary, so this
+        is a single range scan over the flashdeal_live_idx partial index.
+        """
+        now = now or timezone.now()
+        boundaries = FlashDeal.objects.filter(
+            is_active=True,
+            end_date__gt=now
+        ).aggregate(
+            next_start=Min('start_date', filter=Q(start_date__gt=now)),
+            next_end=Min('end_date')
+        )
+        upcoming = [boundary for boundary in boundaries.values() if boundary is not None]
+        return min(upcoming) if upcoming else None
+
+    @staticmethod
+    def get_cache_timeout(default):
+        """
+        Get a cache timeout for payloads containing active flash deals that
+        expires no later than the next deal start/end boundary
+        
+        Args:
+            default (int): The timeout to use when no boundary comes sooner
+            
+        Returns:
+            int: Timeout in seconds, at least 1
+        """
+        now = timezone.now()
+        boundary = FlashDealService.get_next_boundary(now)
+        if boundary is None:
+            return default
+        seconds = math.ceil((boundary - now).total_seconds())
+        return max(1, min(default, seconds))
+    
     @staticmethod
     def get_flash_deal_by_slug(slug):
         """
@@ -40,7 +92,7 @@ class FlashDealService:
         query = FlashDeal.objects.filter(
             is_active=True,
             start_date__gt=now
-        ).order_by('start_date')
+        ).order_by('start_date', 'id')
         
         if limit:
             return query[:limit]
@@ -184,13 +236,195 @@ class FlashDealService:
         Returns:
             list: The created flash deal instances
         """
-        created_deals = []
-        for product in products:
-            deal = FlashDealService.create_flash_deal_from_product(
-                product=product,
-                discount_percentage=discount_percentage,
-                start_date=start_date,
-                end_date=end_date
+        summary = FlashDealService.bulk_create_flash_deals(
+            products,
+            start_date=start_date,
+            end_date=end_date,
+            discount_percentage=discount_percentage,
+            return_deals=True
+        )
+        return summary['deals']
+
+    @staticmethod
+    def bulk_create_flash_deals(products, start_date, end_date, discount_percentage=None,
+                                sale_price=None, product_type=None, chunk_size=1000,
+                                return_deals=False, attempts=3):
+        """
+        Create flash deals for many products in one transaction: either all
+        deals are created or none are.
+
+        Products are read in chunks of chunk_size; each chunk is priced in one
+        pass, gets its slugs from one query and is inserted with bulk_create.
+        
+        Args:
+            products: A PhoneVariant or Accessory queryset, a list of instances,
+                or a list of ids together with product_type
+            start_date (datetime): When the flash deals start
+            end_date (datetime): When the flash deals end
+            discount_percentage (Decimal, optional): Discount applied to every product
+            sale_price (Decimal, optional): Sale price for every product, used
+                instead of discount_percentage
+            product_type (str, optional): 'phone' or 'accessory' when products are ids
+            chunk_size (int): Products priced and inserted per batch
+            return_deals (bool): Include the created FlashDeal instances in the summary
+            attempts (int): Retries when a concurrent writer takes one of the slugs
+            
+        Returns:
+            dict: {'created', 'phones', 'accessories', 'seconds'} and 'deals'
+                when return_deals is set
+        """
+        if (discount_percentage is None) == (sale_price is None):
+            raise ValueError("Pass exactly one of discount_percentage or sale_price")
+        if end_date <= start_date:
+            raise ValidationError("End date must be after start date.")
+        if not isinstance(products, QuerySet):
+            # Read an iterator once, so a retry sees the same products
+            products = list(products)
+
+        for attempt in range(attempts):
+            started = time.monotonic()
+            try:
+                with transaction.atomic():
+                    summary = FlashDealService._bulk_insert_flash_deals(
+                        products, start_date, end_date, discount_percentage,
+                        sale_price, product_type, chunk_size, return_deals
+                    )
+                    CatalogCacheService.invalidate_flash_deals()
+            except IntegrityError:
+                # A concurrent writer took one of the allocated slugs; nothing
+                # was created, so start over with fresh slugs
+                if attempt == attempts - 1:
+                    raise
+                continue
+            summary['seconds'] = round(time.monotonic() - started, 3)
+            return summary
+
+    @staticmethod
+    def price_products(prices, discount_percentage=None, sale_price=None):
+        """
+        Price many products with one discount percentage or one sale price,
+        with the same results as calculate_sale_price and
+        calculate_discount_percentage
+
+        The prices are converted to cents once and passed to the cents
+        functions of promotions.utils. The Decimal batch functions are only
+        used when the cents ones do not apply: a price that is not positive
+        or not whole cents, a discount outside 0-100%, or a sale price above
+        a price.
+        
+        Args:
+            prices (list): The original prices
+            discount_percentage (Decimal, optional): Discount applied to every price
+            sale_price (Decimal, optional): Sale price for every price, used
+                instead of discount_percentage
+            
+        Returns:
+            tuple: (discount percentages, sale prices), lists in the order of prices
+        """
+        cents = to_cents(prices)
+        whole_cents = None not in cents
+        if sale_price is None:
+            discounts = [discount_percentage] * len(prices)
+            discount = to_cents([discount_percentage])[0]
+            if whole_cents and discount is not None and 0 <= discount <= 10000 and min(cents, default=1) > 0:
+                sale_prices = from_cents(batch_sale_price_cents(cents, [discount] * len(cents)))
+            else:
+                sale_prices = batch_calculate_sale_prices(prices, discount_percentage)
+        else:
+            sale_prices = [sale_price] * len(prices)
+            sale = to_cents([sale_price])[0]
+            if whole_cents and sale is not None and 0 <= sale and min(cents, default=1) >= max(sale, 1):
+                discounts = from_cents(batch_discount_hundredths(cents, [sale] * len(cents)))
+            else:
+                discounts = batch_calculate_discount_percentages(prices, sale_price)
+        return discounts, sale_prices
+
+    @staticmethod
+    def _iter_product_chunks(products, product_type, chunk_size):
+        """
+        Yield lists of PhoneVariant (with their phone) or Accessory instances
+        """
+        from store.models import PhoneVariant, Accessory
+        models = {'phone': PhoneVariant, 'accessory': Accessory}
+
+        if isinstance(products, QuerySet):
+            queryset = products
+            if queryset.model is PhoneVariant:
+                queryset = queryset.select_related('phone')
+            iterator = queryset.iterator(chunk_size=chunk_size)
+        else:
+            products = list(products)
+            if products and not isinstance(products[0], (PhoneVariant, Accessory)):
+                if product_type not in models:
+                    raise ValueError("product_type must be 'phone' or 'accessory' when passing ids")
+                queryset = models[product_type].objects.filter(id__in=products).order_by('id')
+                if product_type == 'phone':
+                    queryset = queryset.select_related('phone')
+                iterator = queryset.iterator(chunk_size=chunk_size)
+            else:
+                # Load the phones of all variants at once instead of one by one
+                variants = [product for product in products if isinstance(product, PhoneVariant)]
+                phones = PhoneVariant.objects.filter(
+                    id__in=[variant.id for variant in variants if not PhoneVariant.phone.is_cached(variant)]
+                ).select_related('phone').in_bulk()
+                for variant in variants:
+                    if variant.id in phones:
+                        variant.phone = phones[variant.id].phone
+                iterator = iter(products)
+
+        while chunk := list(islice(iterator, chunk_size)):
+            yield chunk
+
+    @staticmethod
+    def _bulk_insert_flash_deals(products, start_date, end_date, discount_percentage,
+                                 sale_price, product_type, chunk_size, return_deals):
+        from store.models import PhoneVariant, Accessory
+
+        summary = {'created': 0, 'phones': 0, 'accessories': 0}
+        deals = []
+        for chunk in FlashDealService._iter_product_chunks(products, product_type, chunk_size):
+            discounts, sale_prices = FlashDealService.price_products(
+                [product.price for product in chunk], discount_percentage, sale_price
             )
-            created_deals.append(deal)
-        return created_deals
+
+            chunk_deals = []
+            for product, deal_discount, deal_sale_price in zip(chunk, discounts, sale_prices):
+                if isinstance(product, PhoneVariant):
+                    deal_type = 'phone'
+                    product_name = f"{product.phone.brand} {product.phone.name} {product.color} {product.storage}"
+                    product_description = product.phone.description
+                elif isinstance(product, Accessory):
+                    deal_type = 'accessory'
+                    product_name = product.name
+                    product_description = product.description
+                else:
+                    raise ValueError("Product must be either a PhoneVariant or Accessory instance")
+
+                chunk_deals.append(FlashDeal(
+                    name=f"{product_name} Flash Deal",
+                    description=product_description,
+                    product_type=deal_type,
+                    original_price=product.price,
+                    discount_percentage=deal_discount,
+                    sale_price=deal_sale_price,
+                    image=product.image,
+                    start_date=start_date,
+                    end_date=end_date,
+                    is_active=True,
+                    stock=product.stock,
+                    reference_phone=product if deal_type == 'phone' else None,
+                    reference_accessory=product if deal_type == 'accessory' else None
+                ))
+                summary['phones' if deal_type == 'phone' else 'accessories'] += 1
+
+            slugs = allocate_slugs(FlashDeal.objects, [slugify(deal.name) for deal in chunk_deals])
+            for deal, slug in zip(chunk_deals, slugs):
+                deal.slug = slug
+            FlashDeal.objects.bulk_create(chunk_deals)
+            summary['created'] += len(chunk_deals)
+            if return_deals:
+                deals.extend(chunk_deals)
+
+        if return_deals:
+            summary['deals'] = deals
+        return summary
@@ -0,0 +1,65 @@
+from store.fast_serializers import PhoneVariantValuesSerializer, AccessoryValuesSerializer
+from store.services.product_service import ProductService
+from store.services.cache_service import CatalogCacheService
+from store.concurrency import run_concurrently
+from ..fast_serializers import FlashDealValuesSerializer
+from .flash_deal_service import FlashDealService
+
+
+class PromotionPayloadService:
+    """
+    Builds the rendered flash deal and homepage payloads cached by the
+    promotions views and the cache warmer
+    """
+    @staticmethod
+    def get_cache_timeout():
+        # Expire no later than the next deal start/end so prices stay correct
+        return FlashDealService.get_cache_timeout(CatalogCacheService.get_timeout())
+
+    @staticmethod
+    def build_flash_deals(request):
+        flash_deals = FlashDealService.get_active_flash_deals()
+        return CatalogCacheService.render(FlashDealValuesSerializer.serialize_cached(
+            flash_deals.values(*FlashDealValuesSerializer.columns()),
+            request
+        ))
+
+    @staticmethod
+    def build_homepage(request, concurrent=False):
+        """
+        Args:
+            concurrent (bool): Run the flash deal, phone and accessory
+                queries at the same time, see store.concurrency
+        """
+        # Rows are fetched as values() and serialized by store.fast_serializers,
+        # reusing the cached fragments of unchanged rows
+        queries = (
+            lambda: list(FlashDealService.get_active_flash_deals(limit=8).values(
+                *FlashDealValuesSerializer.columns()
+            )),
+            lambda: ProductService.get_homepage_section_rows(
+                'phones', limit=8, fields=PhoneVariantValuesSerializer.columns()
+            ),
+            lambda: ProductService.get_homepage_section_rows(
+                'accessories', limit=8, fields=AccessoryValuesSerializer.columns()
+            ),
+        )
+        if concurrent:
+            flash_deals, phones, accessories = run_concurrently(*queries)
+        else:
+            flash_deals, phones, accessories = [query() for query in queries]
+        sections = ProductService.group_homepage_sections(phones, accessories)
+        new_arrivals = sections['new_arrivals']
+        best_sellers = sections['best_sellers']
+
+        return CatalogCacheService.render({
+            'flash_deals': FlashDealValuesSerializer.serialize_cached(flash_deals, request),
+            'new_arrivals': {
+                'phones': PhoneVariantValuesSerializer.serialize_cached(new_arrivals['phones'], request),
+                'accessories': AccessoryValuesSerializer.serialize_cached(new_arrivals['accessories'], request)
+            },
+            'best_sellers': {
+                'phones': PhoneVariantValuesSerializer.serialize_cached(best_sellers['phones'], request),
+                'accessories': AccessoryValuesSerializer.serialize_cached(best_sellers['accessories'], request)
+            }
+        })
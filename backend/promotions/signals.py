@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from store.services.cache_service import CatalogCacheService
+from .models import FlashDeal
+from .services.deal_stock_service import DealStockService
+
+# Sent by run_flash_deal_scheduler when deals start or end, with the
+# started and ended deal ids
+flash_deals_live_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=FlashDeal)
+def flash_deal_changed(sender, instance, **kwargs):
+    CatalogCacheService.invalidate_flash_deals()
+
+
+@receiver(post_save, sender=FlashDeal)
+def flash_deal_saved(sender, instance, created, update_fields, **kwargs):
+    # Only a stock that was set replaces the live counter (FlashDeal.save()
+    # leaves an unchanged stock out of the UPDATE)
+    if created or update_fields is None or 'stock' in update_fields:
+        DealStockService.reset(instance)
+
+
+@receiver(post_delete, sender=FlashDeal)
+def flash_deal_deleted(sender, instance, **kwargs):
+    DealStockService.forget(instance.id)
@@ -0,0 +1,375 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.db import IntegrityError, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from store.models import Phones, PhoneVariant, Accessory
+from store.tests import FastSerializerContract, QueryPlanAssertions
+from . import utils
+from .fast_serializers import FlashDealValuesSerializer
+from .models import FlashDeal
+from .serializers import FlashDealSerializer
+from .services.deal_stock_service import DealStockService
+from .services.flash_deal_service import FlashDealService
+from .services.payload_service import PromotionPayloadService
+
+
+class FlashDealQueryPlanTests(QueryPlanAssertions, TestCase):
+    """
+    The running and upcoming deal queries use the partial deal indexes on
+    a table where most deals have ended
+    """
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+
+        def deal(number, start_date, end_date):
+            return FlashDeal(
+                name=f'Deal {number}',
+                slug=f'deal-{number}',
+                product_type='accessory',
+                original_price=Decimal('100.00'),
+                discount_percentage=Decimal('10.00'),
+                sale_price=Decimal('90.00'),
+                start_date=start_date,
+                end_date=end_date,
+                is_active=number % 7 != 0
+            )
+
+        # Ended, running and upcoming
+        deals = [
+            deal(number, now - timedelta(days=60, hours=number), now - timedelta(days=30, hours=number))
+            for number in range(20000)
+        ]
+        deals += [deal(20000 + number, now - timedelta(hours=1), now + timedelta(hours=number + 1)) for number in range(50)]
+        deals += [deal(30000 + number, now + timedelta(hours=number + 1), now + timedelta(days=2)) for number in range(50)]
+        FlashDeal.objects.bulk_create(deals)
+        cls.analyze()
+
+    def test_active_flash_deals(self):
+        self.assertIndexScan(FlashDealService.get_active_flash_deals(limit=8), 'promotions_flashdeal', ['flashdeal_live_idx'])
+
+    def test_upcoming_flash_deals(self):
+        self.assertIndexScan(FlashDealService.get_upcoming_flash_deals(), 'promotions_flashdeal', ['flashdeal_upcoming_idx'])
+
+
+class HomepageQueryCountTests(TestCase):
+    """
+    Building the homepage runs three queries however large the catalog:
+    flash deals, phone variants with their phone, and accessories. A cache
+    miss adds one for the next deal boundary, which caps the entry's timeout.
+    """
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, count):
+        now = timezone.now()
+        start = FlashDeal.objects.count()
+        phones = Phones.objects.bulk_create([
+            Phones(name=f'Phone {start + number}', slug=f'phone-{start + number}', brand='Brand')
+            for number in range(count)
+        ])
+        variants = PhoneVariant.objects.bulk_create([
+            PhoneVariant(
+                phone=phone,
+                sku=f'SKU-{phone.id}',
+                color='Black',
+                storage='128GB',
+                price=Decimal('500.00'),
+                is_new_arrival=True,
+                is_best_seller=phone.id % 2 == 0
+            )
+            for phone in phones
+        ])
+        accessories = Accessory.objects.bulk_create([
+            Accessory(
+                name=f'Accessory {start + number}',
+                slug=f'accessory-{start + number}',
+                price=Decimal('20.00'),
+                is_new_arrival=True,
+                is_best_seller=number % 2 == 0
+            )
+            for number in range(count)
+        ])
+        FlashDeal.objects.bulk_create([
+            FlashDeal(
+                name=f'Deal {start + number}',
+                slug=f'deal-{start + number}',
+                product_type='phone',
+                original_price=Decimal('500.00'),
+                discount_percentage=Decimal('10.00'),
+                sale_price=Decimal('450.00'),
+                start_date=now - timedelta(hours=1),
+                end_date=now + timedelta(hours=1),
+                reference_phone=variant,
+                reference_accessory=accessory
+            )
+            for number, (variant, accessory) in enumerate(zip(variants, accessories))
+        ])
+
+    def test_cache_miss_query_count(self):
+        for count in (3, 30):
+            self.seed(count)
+            cache.clear()
+            with self.assertNumQueries(3):
+                PromotionPayloadService.build_homepage(RequestFactory().get('/'))
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse('homepage'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['flash_deals']), 3 if count == 3 else 8)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('homepage'))
+
+
+class BulkCreateFlashDealsTests(TestCase):
+    def test_retry_after_slug_conflict_reuses_iterator(self):
+        accessories = Accessory.objects.bulk_create([
+            Accessory(name=f'Accessory {number}', slug=f'accessory-{number}', price=Decimal('20.00'))
+            for number in range(5)
+        ])
+        insert = FlashDealService._bulk_insert_flash_deals
+        calls = []
+
+        def conflict_once(products, *args):
+            calls.append(products)
+            if len(calls) == 1:
+                list(products)
+                raise IntegrityError('duplicate slug')
+            return insert(products, *args)
+
+        now = timezone.now()
+        with mock.patch.object(FlashDealService, '_bulk_insert_flash_deals', side_effect=conflict_once):
+            summary = FlashDealService.bulk_create_flash_deals(
+                (accessory for accessory in accessories),
+                start_date=now,
+                end_date=now + timedelta(days=1),
+                discount_percentage=Decimal('10')
+            )
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(summary['created'], 5)
+        self.assertEqual(FlashDeal.objects.count(), 5)
+
+
+class BatchPricingTests(SimpleTestCase):
+    """
+    The batch pricing functions return exactly what the Decimal
+    ROUND_HALF_UP functions return, on random and edge-case inputs
+    """
+    CASES = 20000
+
+    def random_cases(self, seed):
+        rng = random.Random(seed)
+        prices, discounts, sales = [], [], []
+        for _ in range(self.CASES):
+            price = Decimal(rng.randint(1, 10 ** rng.randint(1, 9))).scaleb(-2)
+            prices.append(price)
+            # Mostly whole hundredths in range, some that take the scalar path
+            discounts.append(rng.choice([
+                Decimal(rng.randint(0, 10000)).scaleb(-2),
+                Decimal(rng.randint(0, 10000)).scaleb(-2),
+                Decimal(rng.randint(0, 100000)).scaleb(-3),
+                Decimal(rng.randint(-5000, 20000)).scaleb(-2),
+            ]))
+            sales.append(rng.choice([
+                Decimal(rng.randint(0, int(price * 100))).scaleb(-2),
+                price + Decimal('0.01'),
+                Decimal(rng.randint(0, 100000)).scaleb(-3),
+            ]))
+        return prices, discounts, sales
+
+    def assertMatchesScalar(self, prices, discounts, sales):
+        self.assertEqual(
+            utils.batch_calculate_sale_prices(prices, discounts),
+            [utils.calculate_sale_price(price, discount) for price, discount in zip(prices, discounts)]
+        )
+        self.assertEqual(
+            utils.batch_apply_discount(prices, discounts),
+            [utils.apply_discount(price, discount) for price, discount in zip(prices, discounts)]
+        )
+        self.assertEqual(
+            utils.batch_calculate_discount_percentages(prices, sales),
+            [utils.calculate_discount_percentage(price, sale) for price, sale in zip(prices, sales)]
+        )
+
+    def test_random_inputs(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.assertMatchesScalar(*self.random_cases(seed))
+
+    def test_random_inputs_without_numpy(self):
+        with mock.patch.object(utils, 'np', None):
+            self.assertMatchesScalar(*self.random_cases(3))
+
+    def test_edge_cases(self):
+        prices = [
+            Decimal('0.01'), Decimal('0.05'), Decimal('1.00'), Decimal('0'),
+            None, Decimal('-5.00'), Decimal('9999999.99')
+        ]
+        for discount in ['0.5', '50', '12.5', '33.33', '0', '100', '100.01', '-1', None]:
+            discounts = [Decimal(discount) if discount is not None else None] * len(prices)
+            sales = [price / 2 if price is not None else None for price in prices]
+            with self.subTest(discount=discount):
+                self.assertMatchesScalar(prices, discounts, sales)
+
+    def test_iterables_of_values(self):
+        prices = [Decimal('10.00'), Decimal('19.99'), Decimal('5.55')]
+        expected = [utils.calculate_sale_price(price, Decimal('12.5')) for price in prices]
+        discounts = [Decimal('12.5')] * 3
+        self.assertEqual(utils.batch_calculate_sale_prices(prices, Decimal('12.5')), expected)
+        self.assertEqual(utils.batch_calculate_sale_prices(iter(prices), (discount for discount in discounts)), expected)
+        if utils.np is not None:
+            self.assertEqual(utils.batch_calculate_sale_prices(prices, utils.np.array([12.5] * 3)), expected)
+            self.assertEqual(
+                utils.batch_calculate_sale_prices(prices, utils.np.array([10] * 3)),
+                [Decimal('9.00'), Decimal('17.99'), Decimal('5.00')]
+            )
+        with self.assertRaises(ValueError):
+            utils.batch_calculate_sale_prices(prices, (discount for discount in discounts[:2]))
+
+    def test_price_products(self):
+        prices, discounts, sales = self.random_cases(4)
+        edge_prices = [Decimal('0.01'), Decimal('0'), Decimal('-5.00'), Decimal('1.005'), None]
+        for value in discounts[:5] + sales[:5] + [Decimal('0'), Decimal('100'), Decimal('100.01')]:
+            for chunk in (prices[:1000], prices[:1000] + edge_prices):
+                with self.subTest(value=value, edge_prices=len(chunk) > 1000):
+                    self.assertEqual(
+                        FlashDealService.price_products(chunk, discount_percentage=value),
+                        ([value] * len(chunk), [utils.calculate_sale_price(price, value) for price in chunk])
+                    )
+                    self.assertEqual(
+                        FlashDealService.price_products(chunk, sale_price=value),
+                        ([utils.calculate_discount_percentage(price, value) for price in chunk], [value] * len(chunk))
+                    )
+
+
+def create_deal(stock):
+    now = timezone.now()
+    return FlashDeal.objects.create(
+        name='Deal',
+        product_type='accessory',
+        original_price=Decimal('100.00'),
+        discount_percentage=Decimal('10.00'),
+        start_date=now - timedelta(hours=1),
+        end_date=now + timedelta(hours=1),
+        stock=stock
+    )
+
+
+class DealStockTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_save_keeps_live_counter(self):
+        with mock.patch.object(DealStockService, 'counts_in_cache', return_value=True):
+            deal = create_deal(10)
+            self.assertTrue(DealStockService.take(deal.id, 3))
+
+            deal = FlashDeal.objects.get(pk=deal.id)
+            deal.name = 'Renamed'
+            with self.captureOnCommitCallbacks(execute=True):
+                deal.save()
+            self.assertEqual(DealStockService.get_stock([deal.id]), {deal.id: 7})
+
+            DealStockService.reconcile()
+            deal.refresh_from_db()
+            self.assertEqual(deal.stock, 7)
+
+            deal.stock = 50
+            with self.captureOnCommitCallbacks(execute=True):
+                deal.save()
+            self.assertEqual(DealStockService.get_stock([deal.id]), {deal.id: 50})
+
+    def test_counts_in_database_without_shared_cache(self):
+        self.assertFalse(DealStockService.counts_in_cache())
+        deal = create_deal(5)
+        self.assertTrue(DealStockService.take(deal.id, 5))
+        self.assertFalse(DealStockService.take(deal.id))
+        DealStockService.give_back(deal.id, 2)
+        deal.refresh_from_db()
+        self.assertEqual(deal.stock, 2)
+        self.assertEqual(DealStockService.get_stock([deal.id]), {})
+
+
+class DealStockLoadTests(TransactionTestCase):
+    """
+    Concurrent buyers sell exactly a deal's stock, counting in the cache
+    and in the database
+    """
+    STOCK = 500
+    THREADS = 16
+
+    def setUp(self):
+        cache.clear()
+
+    def sell_out(self, deal):
+        def buy(_):
+            taken = given_back = 0
+            try:
+                while DealStockService.take(deal.id):
+                    taken += 1
+                    if taken % 10 == 0:
+                        DealStockService.give_back(deal.id)
+                        given_back += 1
+            finally:
+                connections.close_all()
+            return taken - given_back
+
+        with ThreadPoolExecutor(self.THREADS) as executor:
+            sold = sum(executor.map(buy, range(self.THREADS)))
+        # Refused while another refusal was being undone
+        while DealStockService.take(deal.id):
+            sold += 1
+        return sold
+
+    def test_counting_in_cache(self):
+        with mock.patch.object(DealStockService, 'counts_in_cache', return_value=True):
+            deal = create_deal(self.STOCK)
+            self.assertEqual(self.sell_out(deal), self.STOCK)
+            self.assertEqual(DealStockService.get_stock([deal.id]), {deal.id: 0})
+            self.assertEqual(DealStockService.reconcile(), 1)
+        deal.refresh_from_db()
+        self.assertEqual(deal.stock, 0)
+
+    def test_counting_in_database(self):
+        deal = create_deal(self.STOCK)
+        self.assertEqual(self.sell_out(deal), self.STOCK)
+        deal.refresh_from_db()
+        self.assertEqual(deal.stock, 0)
+
+
+class FlashDealSerializerContractTests(FastSerializerContract, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        phone = Phones.objects.create(name='Galaxy', brand='Samsung')
+        variant = PhoneVariant.objects.create(phone=phone, sku='GALAXY-128', color='Black', storage='128GB', price=Decimal('800.00'))
+        accessory = Accessory.objects.create(name='Case', price=Decimal('20.00'))
+        now = timezone.now()
+        FlashDeal.objects.bulk_create([
+            FlashDeal(
+                name=f'Deal {number} — Soldes',
+                slug=f'deal-{number}',
+                description=[None, '', 'Limited'][number % 3],
+                product_type=['phone', 'accessory'][number % 2],
+                original_price=[Decimal('800.00'), Decimal('19.9'), Decimal('5')][number % 3],
+                discount_percentage=[Decimal('12.5'), None, Decimal('100')][number % 3],
+                sale_price=[Decimal('700.00'), Decimal('0.01'), None][number % 3],
+                image=['', 'flash_deals/deal.jpg'][number % 2],
+                start_date=now - timedelta(days=number, microseconds=number * 1234),
+                end_date=now + timedelta(hours=number, seconds=0.5),
+                is_active=number % 4 != 0,
+                stock=number,
+                reference_phone=variant if number % 2 == 0 else None,
+                reference_accessory=accessory if number % 3 == 1 else None
+            )
+            for number in range(12)
+        ])
+
+    def test_flash_deal(self):
+        self.assertSameOutput(FlashDealSerializer, FlashDealValuesSerializer, FlashDeal.objects.order_by('id'))
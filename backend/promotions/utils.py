@@ -1,8 +1,20 @@
 """
 Utility functions for the promotions app.
 """
+import numbers
 from decimal import Decimal, ROUND_HALF_UP
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Integer inputs of the batch functions must stay below this (summed with
+# 10000) for their products to fit in an int64
+NUMPY_SAFE_LIMIT = 2 ** 30
+
+HUNDREDTH = Decimal('0.01')
+
 
 def calculate_sale_price(original_price, discount_percentage):
     """
@@ -71,3 +83,226 @@ def apply_discount(original_price, discount_percentage):
     savings = savings.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
     
     return sale_price, savings
+
+
+# Batch versions of the functions above. Prices are converted to integer
+# cents and percentages to hundredths of a percent, so the arithmetic is
+# exact and rounds exactly like the Decimal versions (ROUND_HALF_UP, i.e.
+# half away from zero). NumPy is used for the arithmetic when installed.
+
+def _to_hundredths(value):
+    """
+    Convert a value to an integer number of hundredths, or None if it is
+    None or not a whole number of hundredths
+    """
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        value = Decimal(value)
+    try:
+        numerator, denominator = value.as_integer_ratio()
+    except (ValueError, OverflowError):
+        # NaN or infinity
+        return None
+    if 100 % denominator:
+        return None
+    return numerator * (100 // denominator)
+
+
+def _from_hundredths(value):
+    # Same value and exponent as Decimal(value).scaleb(-2), but cheaper
+    return Decimal(value) * HUNDREDTH
+
+
+def _as_arrays(*columns):
+    """
+    Convert the columns to int64 arrays, or return None if NumPy is not
+    installed or the values are too large for int64 arithmetic
+    """
+    if np is None or not len(columns[0]):
+        return None
+    arrays = [np.asarray(column, dtype=np.int64) for column in columns]
+    if sum(int(array.max()) for array in arrays) + 10000 >= NUMPY_SAFE_LIMIT:
+        return None
+    return arrays
+
+
+def _as_list(values):
+    """
+    List of an iterable of values, with NumPy scalars as Python numbers
+    """
+    if np is not None and isinstance(values, np.ndarray):
+        return values.tolist()
+    return list(values)
+
+
+def to_cents(values):
+    """
+    Integer hundredths of many prices or percentages (19.99 -> 1999,
+    12.5 -> 1250), as the cents functions below take them. None for the
+    values that are None or not a whole number of hundredths.
+    """
+    return [_to_hundredths(value) for value in values]
+
+
+def from_cents(values):
+    """
+    Decimals with two decimal places of many integer hundredths
+    """
+    return [_from_hundredths(value) for value in values]
+
+
+def _round_half_up_div(numerator, denominator):
+    """
+    numerator / denominator rounded half up, for non-negative ints or NumPy
+    int64 arrays
+    """
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def batch_sale_price_cents(price_cents, discount_hundredths):
+    """
+    Sale prices in cents for prices in cents and discounts in hundredths of
+    a percent (12.5% -> 1250). Discounts must be between 0 and 100%.
+    
+    Args:
+        price_cents (list): Original prices in cents
+        discount_hundredths (list): Discounts in hundredths of a percent
+        
+    Returns:
+        list: Sale prices in cents
+    """
+    arrays = _as_arrays(price_cents, discount_hundredths)
+    if arrays is not None:
+        prices, discounts = arrays
+        return _round_half_up_div(prices * (10000 - discounts), 10000).tolist()
+    return [
+        _round_half_up_div(price * (10000 - discount), 10000)
+        for price, discount in zip(price_cents, discount_hundredths)
+    ]
+
+
+def batch_savings_cents(price_cents, discount_hundredths):
+    """
+    Savings in cents for prices in cents and discounts in hundredths of a
+    percent. Discounts must be between 0 and 100%.
+    """
+    arrays = _as_arrays(price_cents, discount_hundredths)
+    if arrays is not None:
+        prices, discounts = arrays
+        return _round_half_up_div(prices * discounts, 10000).tolist()
+    return [
+        _round_half_up_div(price * discount, 10000)
+        for price, discount in zip(price_cents, discount_hundredths)
+    ]
+
+
+def batch_discount_hundredths(price_cents, sale_cents):
+    """
+    Discounts in hundredths of a percent for prices and sale prices in
+    cents. Prices must be positive and sale prices between 0 and the price.
+    """
+    arrays = _as_arrays(price_cents, sale_cents)
+    if arrays is not None:
+        prices, sales = arrays
+        return _round_half_up_div((prices - sales) * 10000, prices).tolist()
+    return [
+        _round_half_up_div((price - sale) * 10000, price)
+        for price, sale in zip(price_cents, sale_cents)
+    ]
+
+
+def _batch(scalar_function, batch_function, original_prices, values, capped_at_price=False):
+    """
+    Run batch_function on the entries with a positive price and a value
+    between 0 and 100 (or the price, if capped_at_price), both with at most
+    two decimal places, and scalar_function on the rest, keeping the input
+    order. Only the scalar functions can return negative results.
+    """
+    original_prices = _as_list(original_prices)
+    prices = [_to_hundredths(price) for price in original_prices]
+    if values is None or isinstance(values, (str, numbers.Number)):
+        others = [_to_hundredths(values)] * len(original_prices)
+        values = [values] * len(original_prices)
+    else:
+        values = _as_list(values)
+        if len(values) != len(original_prices):
+            raise ValueError("Expected one value per price")
+        others = [_to_hundredths(value) for value in values]
+
+    fast = [
+        price is not None and value is not None and price > 0
+        and 0 <= value <= (price if capped_at_price else 10000)
+        for price, value in zip(prices, others)
+    ]
+    if all(fast):
+        return batch_function(prices, others)
+
+    results = [
+        None if is_fast else scalar_function(price, value)
+        for is_fast, price, value in zip(fast, original_prices, values)
+    ]
+    indexes = [index for index, is_fast in enumerate(fast) if is_fast]
+    if indexes:
+        batch_results = batch_function(
+            [prices[index] for index in indexes],
+            [others[index] for index in indexes]
+        )
+        for index, result in zip(indexes, batch_results):
+            results[index] = result
+    return results
+
+
+def batch_calculate_sale_prices(original_prices, discount_percentages):
+    """
+    Calculate sale prices for many products at once, with the same results
+    as calculate_sale_price.
+    
+    Args:
+        original_prices (iterable): The original prices
+        discount_percentages (iterable or Decimal): One discount per price,
+            or a single discount for all of them
+        
+    Returns:
+        list: The sale prices (Decimal or None), in the order of original_prices
+    """
+    def batch(prices, discounts):
+        return [_from_hundredths(cents) for cents in batch_sale_price_cents(prices, discounts)]
+    return _batch(calculate_sale_price, batch, original_prices, discount_percentages)
+
+
+def batch_calculate_discount_percentages(original_prices, sale_prices):
+    """
+    Calculate discount percentages for many products at once, with the same
+    results as calculate_discount_percentage.
+    
+    Args:
+        original_prices (iterable): The original prices
+        sale_prices (iterable or Decimal): One sale price per original
+            price, or a single sale price for all of them
+        
+    Returns:
+        list: The discount percentages (Decimal or None), in the order of
+            original_prices
+    """
+    def batch(prices, sales):
+        return [_from_hundredths(value) for value in batch_discount_hundredths(prices, sales)]
+    return _batch(calculate_discount_percentage, batch, original_prices, sale_prices, capped_at_price=True)
+
+
+def batch_apply_discount(original_prices, discount_percentages):
+    """
+    Apply discounts to many prices at once, with the same results as
+    apply_discount.
+    
+    Returns:
+        list: (sale_price, savings) tuples, in the order of original_prices
+    """
+    def batch(prices, discounts):
+        sales = batch_sale_price_cents(prices, discounts)
+        savings = batch_savings_cents(prices, discounts)
+        return [
+            (_from_hundredths(sale), _from_hundredths(saved))
+            for sale, saved in zip(sales, savings)
+        ]
+    return _batch(apply_discount, batch, original_prices, discount_percentages)
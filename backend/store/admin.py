@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Phones, PhoneVariant, Accessory
+from .models import Phones, PhoneVariant, Accessory, StockReservation, StripeSyncTask
 
 @admin.register(Phones)
 class PhonesAdmin(admin.ModelAdmin):
@@ -10,15 +10,35 @@ class PhonesAdmin(admin.ModelAdmin):
 
 @admin.register(PhoneVariant)
 class PhoneVariantAdmin(admin.ModelAdmin):
-    list_display = ('sku', 'phone', 'color', 'storage', 'price', 'stock', 'is_active', 'is_new_arrival', 'is_best_seller')
+    list_display = ('sku', 'phone', 'color', 'storage', 'price', 'stock', 'reservedStock', 'is_active', 'is_new_arrival', 'is_best_seller')
     list_filter = ('is_active', 'is_new_arrival', 'is_best_seller', 'phone__brand')
     search_fields = ('sku', 'phone__name', 'color', 'storage')
     list_editable = ('price', 'stock', 'is_active', 'is_new_arrival', 'is_best_seller')
 
 @admin.register(Accessory)
 class AccessoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'stock', 'is_active', 'is_new_arrival', 'is_best_seller')
+    list_display = ('name', 'price', 'stock', 'reservedStock', 'is_active', 'is_new_arrival', 'is_best_seller')
     list_filter = ('is_active', 'is_new_arrival', 'is_best_seller')
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
     list_editable = ('price', 'stock', 'is_active', 'is_new_arrival', 'is_best_seller')
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('reference', 'product_type', 'object_id', 'quantity', 'status', 'client', 'expires_at')
+    list_filter = ('status', 'product_type')
+    search_fields = ('reference', 'object_id', 'client')
+    # Changing these would get reservedStock out of step with the reservations
+    readonly_fields = (
+        'reference', 'product_type', 'object_id', 'quantity', 'status', 'client',
+        'expires_at', 'createdAt', 'updatedAt'
+    )
+
+
+@admin.register(StripeSyncTask)
+class StripeSyncTaskAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'status', 'attempts', 'next_attempt_at', 'last_error')
+    list_filter = ('status', 'kind')
+    search_fields = ('object_id',)
+    readonly_fields = ('kind', 'object_id', 'attempts', 'idempotency_key', 'last_error', 'createdAt', 'updatedAt')
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'store.settings')
+# Django opens a connection per request under ASGI, so a persistent one
+# would only stay open unused. Use DB_POOL_MAX_SIZE to reuse connections.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+os.environ.setdefault('ROOT_URLCONF', 'store.asgi_urls')
 
 application = get_asgi_application()
@@ -0,0 +1,14 @@
+"""
+URLs of the ASGI deployment (asgi.py): the async homepage and detail
+views, and every other view of store.urls.
+"""
+from django.urls import path
+from promotions.async_views import AsyncHomepageView
+from .async_views import AsyncPhoneVariantDetailView, AsyncAccessoryDetailView
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/homepage/', AsyncHomepageView.as_view(), name='homepage'),
+    path('api/phones/<slug:slug>/', AsyncPhoneVariantDetailView.as_view(), name='phone_detail'),
+    path('api/accessories/<slug:slug>/', AsyncAccessoryDetailView.as_view(), name='accessory_detail'),
+] + sync_urlpatterns
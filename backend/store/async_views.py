@@ -0,0 +1,72 @@
+"""
+Async versions of the product detail views, served by the ASGI deployment
+(store.asgi_urls). Blocking cache and ORM calls run in worker threads, so
+a process keeps serving other requests while they wait.
+"""
+from django.http import JsonResponse
+from django.views import View
+from .concurrency import run_sync
+from .responses import rendered_json_response
+from .services.cache_service import CatalogCacheService
+from .services.payload_service import CatalogPayloadService
+from .services.product_service import ProductService
+
+
+def not_found(message):
+    # Compact and unescaped, like DRF's JSONRenderer in the sync views
+    return JsonResponse({"error": message}, status=404, json_dumps_params={
+        'separators': (',', ':'),
+        'ensure_ascii': False
+    })
+
+
+class AsyncPhoneVariantDetailView(View):
+    """
+    PhoneVariantDetailAPIView, fetching the variants and related products
+    at the same time
+    """
+    async def get(self, request, slug):
+        def build():
+            product_data = ProductService.get_phone_details_by_slug(slug, concurrent=True)
+            if not product_data:
+                return None
+            return CatalogPayloadService.build_phone_detail(product_data, request)
+
+        try:
+            payload = await run_sync(lambda: CatalogCacheService.get_or_build(
+                CatalogCacheService.phone_detail_key(slug),
+                build,
+                metrics_name='phone_detail'
+            ))
+            if payload is None:
+                return not_found("Phone not found or has no active variants")
+            return rendered_json_response(request, payload)
+        except Exception as e:
+            # Any error is a 404, like in the sync view
+            return not_found(str(e))
+
+
+class AsyncAccessoryDetailView(View):
+    """
+    AccessoryDetailAPIView. Its related products need the accessory, so
+    its queries cannot overlap.
+    """
+    async def get(self, request, slug):
+        def build():
+            product_data = ProductService.get_accessory_details_by_slug(slug)
+            if not product_data:
+                return None
+            return CatalogPayloadService.build_accessory_detail(product_data, request)
+
+        try:
+            payload = await run_sync(lambda: CatalogCacheService.get_or_build(
+                CatalogCacheService.accessory_detail_key(slug),
+                build,
+                metrics_name='accessory_detail'
+            ))
+            if payload is None:
+                return not_found("Accessory not found or not active")
+            return rendered_json_response(request, payload)
+        except Exception as e:
+            # Any error is a 404, like in the sync view
+            return not_found(str(e))
@@ -0,0 +1,62 @@
+"""
+Running independent ORM calls at the same time, for the async views.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CONCURRENT_QUERY_WORKERS,
+                thread_name_prefix='catalog-query'
+            )
+        return _executor
+
+
+def _call(function):
+    try:
+        return function()
+    finally:
+        # These are not request threads, so Django would never close or
+        # return their connections; this honours CONN_MAX_AGE and pooling
+        close_old_connections()
+
+
+def run_concurrently(*functions):
+    """
+    Run functions at the same time on the query pool of
+    CONCURRENT_QUERY_WORKERS threads, each in a copy of the caller's
+    context so replica_reads() and the request timing apply
+
+    Returns:
+        list: Their results, in order
+
+    Raises:
+        Exception: The first exception raised by a function, in order
+    """
+    executor = get_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, _call, function)
+        for function in functions
+    ]
+    return [future.result() for future in futures]
+
+
+async def run_sync(function):
+    """
+    Await a blocking call (ORM, cache) made in a worker thread, so other
+    requests keep being served meanwhile. Unlike sync_to_async's default,
+    calls of different requests do not queue behind each other on one
+    thread.
+    """
+    return await sync_to_async(_call, thread_sensitive=False)(function)
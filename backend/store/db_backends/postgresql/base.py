@@ -0,0 +1,16 @@
+"""
+PostgreSQL backend that measures how long getting a connection takes:
+the handshake for a new connection, or the wait for a free connection and
+its health check when pooling (DB_POOL_MAX_SIZE).
+"""
+import time
+from django.db.backends.postgresql import base
+from store.services.connection_metrics_service import ConnectionMetricsService
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        ConnectionMetricsService.record(self.alias, time.perf_counter() - started)
+        return connection
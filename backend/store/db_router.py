@@ -0,0 +1,76 @@
+"""
+Routes reads to the read replicas in DATABASE_REPLICAS where that is safe.
+
+Reads go to the primary unless code opts in with replica_reads(), as
+ReplicaRoutingMiddleware does for public API GETs and the cache warmer
+does for its payloads. Within replica_reads(), reads go back to the
+primary after the first write and inside transactions, so code always
+sees its own writes. Requests from clients that just wrote run pinned to
+the primary from the start.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# None: primary only. Otherwise {'pinned': bool}, pinned after a write.
+_replica_state = ContextVar('replica_state', default=None)
+
+
+@contextmanager
+def replica_reads(pinned=False):
+    """
+    Send reads to a replica until the block writes
+
+    Args:
+        pinned (bool): Start pinned to the primary, as for a client that
+            has just written
+    """
+    token = _replica_state.set({'pinned': pinned})
+    try:
+        yield
+    finally:
+        _replica_state.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Send reads to the primary, also inside replica_reads()
+    """
+    token = _replica_state.set(None)
+    try:
+        yield
+    finally:
+        _replica_state.reset(token)
+
+
+def is_pinned():
+    """
+    Whether the current replica_reads() block has written or started pinned
+    """
+    state = _replica_state.get()
+    return state is not None and state['pinned']
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _replica_state.get()
+        if (state is None or state['pinned'] or not settings.DATABASE_REPLICAS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _replica_state.get()
+        if state is not None:
+            state['pinned'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
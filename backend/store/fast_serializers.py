@@ -0,0 +1,181 @@
+"""
+Serializers that produce the output of the DRF serializers straight from
+queryset.values() rows, for the cached list payloads. Each output field is
+a precompiled (name, column, converter) mapper, so a row costs one dict
+instead of a model instance and DRF's per-field machinery.
+
+The output must stay identical to the DRF serializer each one mirrors:
+change both together, and bump the fragment_name of a serializer whose
+output changes so cached fragments of the old shape are not reused.
+"""
+from decimal import Decimal
+from urllib.parse import urljoin
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+CENTS = Decimal('0.01')
+
+FRAGMENT_KEY_PREFIX = 'catalog_fragment'
+
+
+def decimal_string(value, request):
+    # DRF DecimalField(decimal_places=2) with COERCE_DECIMAL_TO_STRING
+    return f'{value.quantize(CENTS):f}'
+
+
+def file_url(value, request):
+    # DRF FileField/ImageField with UPLOADED_FILES_USE_URL, from the stored name
+    if not value:
+        return None
+    url = default_storage.url(value)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def media_url(value, request):
+    # The serializers' get_image_url
+    if not value:
+        return None
+    return urljoin(settings.MEDIA_URL, value)
+
+
+def datetime_string(value, request):
+    # DRF DateTimeField with the ISO 8601 format
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class ValuesSerializer:
+    """
+    Subclasses list their `fields` as (output name, values() column,
+    converter) in the DRF serializer's field order. Converters are called
+    as converter(value, request) for values that are not None; fields
+    without one are output as stored.
+
+    `version_columns` are the updatedAt columns of the rows an item is read
+    from; serialize_cached keys each item's fragment by them.
+    """
+    fields = ()
+    fragment_name = None
+    version_columns = ()
+
+    @classmethod
+    def columns(cls):
+        """
+        Columns to pass to queryset.values()
+        """
+        return list(dict.fromkeys(
+            [column for _, column, _ in cls.fields] + list(cls.version_columns)
+        ))
+
+    @classmethod
+    def fragment_key(cls, row, origin):
+        version = ':'.join(row[column].isoformat() for column in cls.version_columns)
+        return f'{FRAGMENT_KEY_PREFIX}:{cls.fragment_name}:{origin}:{row["id"]}:{version}'
+
+    @classmethod
+    def serialize(cls, rows, request=None):
+        """
+        Args:
+            rows (iterable): Dicts from queryset.values(*cls.columns())
+            request (HttpRequest, optional): For absolute file URLs, as the
+                DRF serializer's context
+
+        Returns:
+            list: One dict per row, equal to the DRF serializer's data
+        """
+        mapping = [(name, column) for name, column, _ in cls.fields]
+        converters = [(name, converter) for name, _, converter in cls.fields if converter is not None]
+        data = []
+        for row in rows:
+            item = {name: row[column] for name, column in mapping}
+            for name, converter in converters:
+                value = item[name]
+                if value is not None:
+                    item[name] = converter(value, request)
+            data.append(item)
+        return data
+
+    @classmethod
+    def serialize_cached(cls, rows, request=None):
+        """
+        serialize() through a cache of one fragment per row, keyed by the
+        row's id and version, so only rows changed since they were last
+        serialized are serialized again. Fragments are read and the new
+        ones stored with one cache round trip each.
+
+        Changes written without bumping the version columns (e.g.
+        QuerySet.update() without updatedAt) are not picked up until the
+        fragment expires.
+
+        Args:
+            rows (iterable): Dicts from queryset.values(*cls.columns())
+            request (HttpRequest, optional): As for serialize(); fragments
+                are kept per origin since file URLs are absolute
+
+        Returns:
+            list: Equal to serialize(rows, request)
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+        origin = request.build_absolute_uri('/').rstrip('/') if request is not None else ''
+        keys = [cls.fragment_key(row, origin) for row in rows]
+        fragments = cache.get_many(keys)
+        missing = {key: row for key, row in zip(keys, rows) if key not in fragments}
+        if missing:
+            fresh = dict(zip(missing, cls.serialize(missing.values(), request)))
+            cache.set_many(fresh, settings.CATALOG_FRAGMENT_CACHE_TIMEOUT)
+            fragments.update(fresh)
+        return [fragments[key] for key in keys]
+
+
+class PhoneVariantValuesSerializer(ValuesSerializer):
+    """
+    PhoneVariantSerializer
+    """
+    fragment_name = 'phone_variant.1'
+    version_columns = ('updatedAt', 'phone__updatedAt')
+    fields = (
+        ('id', 'id', None),
+        ('sku', 'sku', None),
+        ('color', 'color', None),
+        ('storage', 'storage', None),
+        ('price', 'price', decimal_string),
+        ('stock', 'stock', None),
+        ('image', 'image', file_url),
+        ('is_active', 'is_active', None),
+        ('is_new_arrival', 'is_new_arrival', None),
+        ('is_best_seller', 'is_best_seller', None),
+        ('name', 'phone__name', None),
+        ('brand', 'phone__brand', None),
+        ('slug', 'phone__slug', None),
+        ('image_url', 'image', media_url),
+        ('description', 'phone__description', None),
+    )
+
+
+class AccessoryValuesSerializer(ValuesSerializer):
+    """
+    AccessorySerializer
+    """
+    fragment_name = 'accessory.1'
+    version_columns = ('updatedAt',)
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('slug', 'slug', None),
+        ('description', 'description', None),
+        ('price', 'price', decimal_string),
+        ('stock', 'stock', None),
+        ('image', 'image', file_url),
+        ('is_active', 'is_active', None),
+        ('is_new_arrival', 'is_new_arrival', None),
+        ('is_best_seller', 'is_best_seller', None),
+        ('image_url', 'image', media_url),
+    )
@@ -0,0 +1,141 @@
+"""
+Management command to time the homepage and product detail endpoints as
+served by the WSGI deployment (store.urls) and the ASGI one
+(store.asgi_urls).
+
+Requests go through Django's WSGI and ASGI request handlers, the ones
+the test client uses, and the full middleware stack, in this process
+and without a server. So the numbers compare the sync and async views
+rather than gunicorn and uvicorn. --latency adds a delay to every query,
+as for a database across the network, which is where the async views'
+overlapping queries pay off.
+"""
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from store.models import Phones, Accessory
+
+
+class Command(BaseCommand):
+    help = 'Time the homepage and product detail endpoints under WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Cached requests per endpoint and deployment (default: 500)')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Requests in flight at a time (default: 16)')
+        parser.add_argument('--rebuilds', type=int, default=20,
+                            help='Sequential cache misses per endpoint and deployment (default: 20)')
+        parser.add_argument('--latency', type=float, default=0,
+                            help='Milliseconds added to every query (default: 0)')
+
+    def handle(self, *args, **options):
+        if min(options['requests'], options['concurrency'], options['rebuilds']) < 1 or options['latency'] < 0:
+            raise CommandError('--requests, --concurrency and --rebuilds must be positive')
+        paths = {'homepage': reverse('homepage')}
+        phone = Phones.objects.filter(variants__isnull=False).first()
+        if phone:
+            paths['phone detail'] = reverse('phone_detail', args=[phone.slug])
+        accessory = Accessory.objects.first()
+        if accessory:
+            paths['accessory detail'] = reverse('accessory_detail', args=[accessory.slug])
+
+        with override_settings(ALLOWED_HOSTS=['testserver']), self.query_latency(options['latency'] / 1000):
+            for name, path in paths.items():
+                self.stdout.write(self.style.SUCCESS(f'{name} ({path})'))
+                for deployment, get in (('WSGI', self.wsgi_get), ('ASGI', self.asgi_get)):
+                    status = get([path], 1)[0][0]
+                    rebuilds = []
+                    for _ in range(options['rebuilds']):
+                        cache.clear()
+                        rebuilds += get([path], 1)
+                    started = time.perf_counter()
+                    hits = get([path] * options['requests'], options['concurrency'])
+                    elapsed = time.perf_counter() - started
+                    hit_times = sorted(seconds for _, seconds in hits)
+                    self.stdout.write(
+                        f'  {deployment} ({status}): '
+                        f'miss {statistics.median(seconds for _, seconds in rebuilds) * 1000:.1f}ms, '
+                        f'hit {len(hits) / elapsed:.0f} requests/s, '
+                        f'p50 {hit_times[len(hit_times) // 2] * 1000:.1f}ms, '
+                        f'p95 {hit_times[int(len(hit_times) * 0.95)] * 1000:.1f}ms'
+                    )
+
+    @staticmethod
+    def wsgi_get(paths, concurrency):
+        """
+        GET paths on concurrency threads, like a threaded WSGI server
+
+        Returns:
+            list: (status code, seconds) per request
+        """
+        def get(path):
+            started = time.perf_counter()
+            try:
+                response = Client().get(path)
+            finally:
+                # What the server's request_finished handler does, which
+                # the test client leaves out
+                close_old_connections()
+            return response.status_code, time.perf_counter() - started
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            return list(executor.map(get, paths))
+
+    @staticmethod
+    def asgi_get(paths, concurrency):
+        """
+        GET paths with up to concurrency requests in flight on one event
+        loop, like an ASGI server's worker
+
+        Returns:
+            list: (status code, seconds) per request
+        """
+        async def get_all():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def get(path):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await AsyncClient().get(path)
+                    return response.status_code, time.perf_counter() - started
+
+            return await asyncio.gather(*(get(path) for path in paths))
+
+        with override_settings(ROOT_URLCONF='store.asgi_urls'):
+            return asyncio.run(get_all())
+
+    @staticmethod
+    @contextmanager
+    def query_latency(seconds):
+        """
+        Delay every query on the connections opened meanwhile, in any thread
+        """
+        def delay(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def add_delay(connection, **kwargs):
+            # Also sent when a closed connection reconnects
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        if not seconds:
+            yield
+            return
+        connections.close_all()
+        connection_created.connect(add_delay)
+        try:
+            yield
+        finally:
+            connection_created.disconnect(add_delay)
+            connections.close_all()
@@ -0,0 +1,91 @@
+"""
+Management command to time cache hits of the homepage view as it serves
+them now (the pre-rendered body, store.responses.rendered_json_response)
+against the cached dict rendered by DRF on every hit, as before, and the
+304 answer to a revalidation.
+
+Views are called directly with the current catalog's homepage payload,
+without middleware, so the numbers are the view's own cost per hit.
+"""
+import json
+import statistics
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from promotions.services.payload_service import PromotionPayloadService
+from store.responses import rendered_json_response
+from store.services.cache_service import CatalogCacheService
+
+DICT_KEY = 'benchmark_cache_hits:dict'
+RENDERED_KEY = 'benchmark_cache_hits:rendered'
+
+
+class DictHitView(APIView):
+    # Before: the serialized data was cached and rendered on each hit
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(CatalogCacheService.get_or_build(DICT_KEY, lambda: None))
+
+
+class RenderedHitView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return rendered_json_response(request, CatalogCacheService.get_or_build(RENDERED_KEY, lambda: None))
+
+
+class Command(BaseCommand):
+    help = 'Time homepage cache hits served pre-rendered against rendered by DRF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per measurement (default: 2000)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+        factory = RequestFactory()
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            payload = PromotionPayloadService.build_homepage(factory.get('/api/homepage/'))
+            CatalogCacheService.set(DICT_KEY, json.loads(payload['body']))
+            CatalogCacheService.set(RENDERED_KEY, payload)
+            self.stdout.write(f"Homepage body: {len(payload['body'])} bytes")
+            try:
+                timings = {
+                    'DRF-rendered dict (before)': (DictHitView.as_view(), {}),
+                    'pre-rendered body': (RenderedHitView.as_view(), {}),
+                    'If-None-Match, 304': (RenderedHitView.as_view(), {'HTTP_IF_NONE_MATCH': payload['etag']}),
+                }
+                baseline = None
+                for label, (view, headers) in timings.items():
+                    seconds = self.time(view, factory, headers, options['requests'])
+                    median = statistics.median(seconds)
+                    baseline = baseline or median
+                    self.stdout.write(
+                        f'  {label}: median {median * 1e6:.0f}us, '
+                        f'p95 {seconds[int(len(seconds) * 0.95)] * 1e6:.0f}us ({baseline / median:.1f}x)'
+                    )
+            finally:
+                cache.delete_many([DICT_KEY, RENDERED_KEY])
+
+    @staticmethod
+    def time(view, factory, headers, requests):
+        """
+        Returns:
+            list: Sorted seconds per request
+        """
+        seconds = []
+        for _ in range(requests):
+            request = factory.get('/api/homepage/', **headers)
+            started = time.perf_counter()
+            response = view(request)
+            if hasattr(response, 'render'):
+                response.render()
+            seconds.append(time.perf_counter() - started)
+        return sorted(seconds)
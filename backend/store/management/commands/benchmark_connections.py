@@ -0,0 +1,103 @@
+"""
+Management command to time requests' database connections with each of
+the connection settings store.settings chooses between: a new connection
+per request (DB_CONN_MAX_AGE=0, as under ASGI), persistent connections
+(DB_CONN_MAX_AGE) and a psycopg pool (DB_POOL_MAX_SIZE).
+
+Each thread plays a thread of a threaded WSGI server: around every
+request, which runs one query, it closes its connection if obsolete, as
+Django's request_started and request_finished handlers do, which returns
+a pooled connection to the pool. The connect times are the ones the
+backend records for DatabaseTimingMiddleware: opening a connection, or
+taking one from the pool.
+"""
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+from store.services.connection_metrics_service import request_connect_time
+
+
+class Command(BaseCommand):
+    help = 'Time requests getting database connections: new per request, persistent and pooled'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per connection setting (default: 2000)')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Concurrent requests, and the pool size (default: 8)')
+        parser.add_argument('--database', default='default',
+                            help='Database alias to connect to (default: default)')
+
+    def handle(self, *args, **options):
+        if min(options['requests'], options['threads']) < 1:
+            raise CommandError('--requests and --threads must be positive')
+        if options['database'] not in connections.settings:
+            raise CommandError(f"No database {options['database']!r}")
+        if connections[options['database']].vendor != 'postgresql':
+            raise CommandError('Connection pooling needs PostgreSQL')
+
+        base = dict(connections.settings[options['database']])
+        base_options = {key: value for key, value in base.get('OPTIONS', {}).items() if key != 'pool'}
+        settings_dicts = {
+            'new connection per request': {**base, 'CONN_MAX_AGE': 0, 'OPTIONS': base_options},
+            'persistent connections': {**base, 'CONN_MAX_AGE': 60, 'OPTIONS': base_options},
+            'pool': {**base, 'CONN_MAX_AGE': 0, 'OPTIONS': {
+                **base_options,
+                'pool': {'min_size': options['threads'], 'max_size': options['threads'], 'timeout': 10}
+            }},
+        }
+        baseline = None
+        for label, settings_dict in settings_dicts.items():
+            alias = f"{options['database']}_benchmark_connections"
+            started = time.perf_counter()
+            timings = self.run(settings_dict, alias, options['requests'], options['threads'])
+            elapsed = time.perf_counter() - started
+            seconds = sorted(request for request, _ in timings)
+            connect = sorted(connect for _, connect in timings)
+            median = statistics.median(seconds)
+            baseline = baseline or median
+            self.stdout.write(
+                f'  {label}: {len(timings) / elapsed:.0f} requests/s, '
+                f'p50 {median * 1000:.2f}ms, p95 {seconds[int(len(seconds) * 0.95)] * 1000:.2f}ms, '
+                f'connect p95 {connect[int(len(connect) * 0.95)] * 1000:.2f}ms, '
+                f'{sum(1 for value in connect if value)} connections ({baseline / median:.1f}x)'
+            )
+
+    @staticmethod
+    def run(settings_dict, alias, requests, threads):
+        """
+        Returns:
+            list: (seconds, seconds getting a connection) per request
+        """
+        backend = load_backend(settings_dict['ENGINE'])
+
+        def serve(count):
+            wrapper = backend.DatabaseWrapper(settings_dict, alias)
+            timings = []
+            try:
+                for _ in range(count):
+                    connect_time = [0.0]
+                    token = request_connect_time.set(connect_time)
+                    started = time.perf_counter()
+                    try:
+                        wrapper.close_if_unusable_or_obsolete()
+                        with wrapper.cursor() as cursor:
+                            cursor.execute('SELECT 1')
+                        wrapper.close_if_unusable_or_obsolete()
+                    finally:
+                        request_connect_time.reset(token)
+                    timings.append((time.perf_counter() - started, connect_time[0]))
+            finally:
+                wrapper.close()
+            return timings
+
+        counts = [requests // threads + (number < requests % threads) for number in range(threads)]
+        try:
+            with ThreadPoolExecutor(threads) as executor:
+                return [timing for thread in executor.map(serve, counts) for timing in thread]
+        finally:
+            # The pool is shared by the alias' wrappers in this process
+            backend.DatabaseWrapper(settings_dict, alias).close_pool()
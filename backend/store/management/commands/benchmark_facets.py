@@ -0,0 +1,128 @@
+"""
+Management command to measure the phone facet index (store.services.
+facet_service.FacetIndex): its memory and build time, and the latency of
+queries with the newest 20 ids and of single-row updates.
+
+Rows are generated in memory, so the database is not read. Query results
+and counts are checked against filtering the rows one by one.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from store.services.facet_service import FacetIndex, FacetService, price_bucket, price_bucket_labels
+
+BRANDS = ['Apple', 'Samsung', 'Google', 'OnePlus', 'Xiaomi', 'Sony', 'Motorola', 'Nokia', 'Oppo', 'Honor']
+COLORS = ['Black', 'White', 'Blue', 'Red', 'Green', 'Silver', 'Gold', 'Purple', 'Pink', 'Gray', 'Yellow', 'Orange']
+STORAGES = ['64GB', '128GB', '256GB', '512GB', '1TB']
+
+
+class Command(BaseCommand):
+    help = 'Measure the memory, build time, query and update latency of the phone facet index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, nargs='+', default=[100000],
+                            help='Numbers of phone variants to index (default: 100000)')
+        parser.add_argument('--queries', type=int, default=1000,
+                            help='Queries and updates per measurement (default: 1000)')
+
+    def handle(self, *args, **options):
+        if options['queries'] < 1 or min(options['count']) < 1:
+            raise CommandError('--count and --queries must be positive')
+        facets = FacetService.FACETS['phone']
+        ordered_values = {'price': price_bucket_labels()}
+        for count in options['count']:
+            rng = random.Random(0)
+            rows = [self.row(rng, product_id) for product_id in range(1, count + 1)]
+            self.stdout.write(self.style.SUCCESS(f'{count} phone variants'))
+
+            started = time.perf_counter()
+            index = FacetIndex.build(facets, rows, ordered_values)
+            elapsed = time.perf_counter() - started
+            # Traced separately, as tracing slows the build down
+            tracemalloc.start()
+            try:
+                traced = FacetIndex.build(facets, rows, ordered_values)
+                size, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            del traced
+            self.stdout.write(
+                f'  build: {elapsed * 1000:.0f}ms, index {size / 1024 / 1024:.1f}MB '
+                f'(peak while building {peak / 1024 / 1024:.1f}MB)'
+            )
+
+            filters = {
+                'unfiltered': lambda: {},
+                'one facet': lambda: {'brand': {rng.choice(BRANDS)}},
+                'four facets': lambda: {
+                    'brand': set(rng.sample(BRANDS, 2)),
+                    'color': {rng.choice(COLORS)},
+                    'storage': {rng.choice(STORAGES)},
+                    'price': {rng.choice(ordered_values['price'])},
+                },
+            }
+            for label, make_filters in filters.items():
+                cases = [make_filters() for _ in range(options['queries'])]
+                seconds = []
+                for case in cases:
+                    started = time.perf_counter()
+                    matches, _ = index.query(case)
+                    index.top_ids(matches, 20)
+                    seconds.append(time.perf_counter() - started)
+                self.check_query(index, rows, cases[0])
+                self.write_timings(f'query, {label}', seconds)
+
+            seconds = []
+            for _ in range(options['queries']):
+                product_id, is_active, values = self.row(rng, rng.randint(1, count))
+                rows[product_id - 1] = (product_id, is_active, values)
+                started = time.perf_counter()
+                index.set_row(product_id, is_active, values)
+                seconds.append(time.perf_counter() - started)
+            self.write_timings('single-row update', seconds)
+            self.check_query(index, rows, filters['four facets']())
+
+    @staticmethod
+    def row(rng, product_id):
+        values = (
+            rng.choice(BRANDS),
+            rng.choice(COLORS),
+            rng.choice(STORAGES),
+            price_bucket(Decimal(rng.randint(10000, 200000)).scaleb(-2))
+        )
+        return product_id, rng.random() < 0.9, values
+
+    def check_query(self, index, rows, filters):
+        """
+        Compare a query with filtering the rows one by one
+        """
+        matches, counts = index.query(filters)
+        facets = index.facets
+        expected_counts = {facet: {} for facet in facets}
+        expected_ids = []
+        for product_id, is_active, values in rows:
+            if not is_active:
+                continue
+            row = dict(zip(facets, values))
+            failed = [facet for facet, selected in filters.items() if row[facet] not in selected]
+            if not failed:
+                expected_ids.append(product_id)
+            for facet in facets:
+                # A value's count is the matches with this facet's filter replaced
+                if not [other for other in failed if other != facet]:
+                    expected_counts[facet][row[facet]] = expected_counts[facet].get(row[facet], 0) + 1
+        actual_counts = {facet: {value: n for value, n in values.items() if n} for facet, values in counts.items()}
+        if matches.bit_count() != len(expected_ids) or actual_counts != expected_counts:
+            raise CommandError(f'The index does not match the rows for {filters}')
+        if index.top_ids(matches, 20) != expected_ids[::-1][:20]:
+            raise CommandError(f'The newest ids do not match the rows for {filters}')
+
+    def write_timings(self, label, seconds):
+        seconds = sorted(seconds)
+        self.stdout.write(
+            f'  {label}: p50 {statistics.median(seconds) * 1e6:.0f}us, '
+            f'p95 {seconds[int(len(seconds) * 0.95)] * 1e6:.0f}us'
+        )
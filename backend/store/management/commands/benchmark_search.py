@@ -0,0 +1,71 @@
+"""
+Management command to time the search endpoint on the current catalog:
+queries of whole words from the product names, and queries whose last
+word is cut short, as typed in a search-as-you-type box.
+
+Requests go through the test client and the full middleware stack, in
+this process and without a server. On PostgreSQL the full-text search is
+timed, elsewhere the icontains fallback.
+"""
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from store.models import Phones, Accessory
+from store.services.search_service import SearchService
+
+
+class Command(BaseCommand):
+    help = 'Time the search endpoint with whole-word and prefix queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Requests per kind of query (default: 500)')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Results per product type (default: 20)')
+
+    def handle(self, *args, **options):
+        if min(options['requests'], options['limit']) < 1:
+            raise CommandError('--requests and --limit must be positive')
+        words = sorted({
+            term
+            for text in [*Phones.objects.values_list('brand', 'name'), *Accessory.objects.values_list('name')]
+            for term in SearchService.get_terms(' '.join(text))
+            if not term.isdigit()
+        })
+        if not words:
+            raise CommandError('No products to search')
+        backend = 'full-text search' if SearchService.is_supported() else 'icontains fallback'
+        self.stdout.write(f'{backend}, {len(words)} words from the product names')
+
+        rng = random.Random(0)
+        queries = {
+            'one word': [rng.choice(words) for _ in range(options['requests'])],
+            'two words': [f'{rng.choice(words)} {rng.choice(words)}' for _ in range(options['requests'])],
+            'prefix': [rng.choice(words)[:3] for _ in range(options['requests'])],
+            'word and prefix': [
+                f'{rng.choice(words)} {rng.choice(words)[:3]}' for _ in range(options['requests'])
+            ],
+        }
+        client = Client()
+        path = reverse('search')
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for label, texts in queries.items():
+                seconds = []
+                results = 0
+                for text in texts:
+                    started = time.perf_counter()
+                    response = client.get(path, {'q': text, 'limit': options['limit']})
+                    seconds.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f'{path}?q={text}: {response.status_code}')
+                    results += len(response.data['phones']) + len(response.data['accessories'])
+                seconds.sort()
+                self.stdout.write(
+                    f'  {label}: p50 {statistics.median(seconds) * 1000:.1f}ms, '
+                    f'p95 {seconds[int(len(seconds) * 0.95)] * 1000:.1f}ms, '
+                    f'max {seconds[-1] * 1000:.1f}ms, {results / len(texts):.1f} results per query'
+                )
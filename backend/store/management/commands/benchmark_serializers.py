@@ -0,0 +1,152 @@
+"""
+Management command to time the values() serializers of the cached list
+payloads (store.fast_serializers) against the DRF serializers they
+mirror.
+
+Rows are generated in memory, so only serialization is timed, not the
+queries. serialize_cached is timed cold and warm; its fragments are
+keyed by a fixed past updatedAt and deleted afterwards.
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Model
+from django.db.models.fields.files import FieldFile
+from django.test import RequestFactory
+from promotions.fast_serializers import FlashDealValuesSerializer
+from promotions.models import FlashDeal
+from promotions.serializers import FlashDealSerializer
+from store.fast_serializers import PhoneVariantValuesSerializer, AccessoryValuesSerializer
+from store.models import Phones, PhoneVariant, Accessory
+from store.serializers import PhoneVariantSerializer, AccessorySerializer
+
+VERSION = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = 'Time the values() serializers against the DRF serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, nargs='+', default=[1000, 10000],
+                            help='Numbers of rows to time (default: 1000 10000)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per measurement; the fastest is reported (default: 3)')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or min(options['count']) < 1:
+            raise CommandError('--count and --repeat must be positive')
+        request = RequestFactory().get('/')
+        for count in options['count']:
+            for name, drf_serializer, values_serializer, instances in (
+                ('phone variants', PhoneVariantSerializer, PhoneVariantValuesSerializer, self.phone_variants(count)),
+                ('accessories', AccessorySerializer, AccessoryValuesSerializer, self.accessories(count)),
+                ('flash deals', FlashDealSerializer, FlashDealValuesSerializer, self.flash_deals(count)),
+            ):
+                rows = [self.row(instance, values_serializer.columns()) for instance in instances]
+                keys = [values_serializer.fragment_key(row, 'http://testserver') for row in rows]
+                timings = {
+                    'DRF': lambda: drf_serializer(instances, many=True, context={'request': request}).data,
+                    'values()': lambda: values_serializer.serialize(rows, request),
+                    'values(), cold fragments': lambda: (
+                        cache.delete_many(keys), values_serializer.serialize_cached(rows, request)
+                    ),
+                    'values(), cached fragments': lambda: values_serializer.serialize_cached(rows, request),
+                }
+                self.stdout.write(self.style.SUCCESS(f'{count} {name}'))
+                baseline = None
+                try:
+                    for label, function in timings.items():
+                        elapsed = self.time(options['repeat'], function)
+                        baseline = baseline or elapsed
+                        self.stdout.write(f'  {label}: {elapsed * 1000:.1f}ms ({baseline / elapsed:.1f}x)')
+                finally:
+                    cache.delete_many(keys)
+
+    @staticmethod
+    def row(instance, columns):
+        """
+        What queryset.values(*columns) returns for a saved instance
+        """
+        row = {}
+        for column in columns:
+            value = instance
+            for name in column.split('__'):
+                value = getattr(value, name)
+            if isinstance(value, FieldFile):
+                value = value.name
+            elif isinstance(value, Model):
+                value = value.pk
+            row[column] = value
+        return row
+
+    @staticmethod
+    def phone_variants(count):
+        phones = [
+            Phones(id=number, name=f'Phone {number}', slug=f'phone-{number}', brand='Brand',
+                   description=None if number % 3 else 'A phone', updatedAt=VERSION)
+            for number in range(1, count // 4 + 2)
+        ]
+        return [
+            PhoneVariant(
+                id=number,
+                phone=phones[number % len(phones)],
+                sku=f'SKU-{number}',
+                color='Black',
+                storage='128GB',
+                price=Decimal(number % 100000).scaleb(-2),
+                stock=number % 50,
+                image='' if number % 2 else f'phones/{number}.jpg',
+                is_new_arrival=True,
+                updatedAt=VERSION
+            )
+            for number in range(1, count + 1)
+        ]
+
+    @staticmethod
+    def accessories(count):
+        return [
+            Accessory(
+                id=number,
+                name=f'Accessory {number}',
+                slug=f'accessory-{number}',
+                description=None if number % 3 else 'An accessory',
+                price=Decimal(number % 10000).scaleb(-2),
+                stock=number % 50,
+                image='' if number % 2 else f'accessories/{number}.jpg',
+                is_new_arrival=True,
+                updatedAt=VERSION
+            )
+            for number in range(1, count + 1)
+        ]
+
+    @staticmethod
+    def flash_deals(count):
+        return [
+            FlashDeal(
+                id=number,
+                name=f'Deal {number}',
+                slug=f'deal-{number}',
+                product_type='accessory',
+                original_price=Decimal('100.00'),
+                discount_percentage=Decimal('10.00'),
+                sale_price=Decimal('90.00'),
+                image='' if number % 2 else f'flash_deals/{number}.jpg',
+                start_date=VERSION,
+                end_date=VERSION + timedelta(days=number),
+                stock=number % 50,
+                updated_at=VERSION
+            )
+            for number in range(1, count + 1)
+        ]
+
+    @staticmethod
+    def time(repeat, function):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
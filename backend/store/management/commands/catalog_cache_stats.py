@@ -0,0 +1,28 @@
+"""
+Management command to show how catalog cache requests were served.
+"""
+from django.core.management.base import BaseCommand
+from store.services.cache_service import (
+    CatalogCacheService,
+    HOMEPAGE_KEY,
+    FLASH_DEALS_KEY,
+    NEW_ARRIVALS_KEY,
+    BEST_SELLERS_KEY
+)
+
+
+class Command(BaseCommand):
+    help = 'Show hit, rebuild and coalesced request counts for the catalog caches'
+
+    def handle(self, *args, **options):
+        names = [
+            HOMEPAGE_KEY, FLASH_DEALS_KEY, NEW_ARRIVALS_KEY, BEST_SELLERS_KEY,
+            'phone_detail', 'accessory_detail'
+        ]
+        metrics = CatalogCacheService.get_metrics(names)
+        for name, events in metrics.items():
+            coalesced = events['served_stale'] + events['waited']
+            self.stdout.write(self.style.SUCCESS(name))
+            for event, count in events.items():
+                self.stdout.write(f'  {event}: {count}')
+            self.stdout.write(f'  coalesced: {coalesced}')
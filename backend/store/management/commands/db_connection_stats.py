@@ -0,0 +1,22 @@
+"""
+Management command to show how long the web processes wait for database
+connections.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from store.services.connection_metrics_service import ConnectionMetricsService
+
+
+class Command(BaseCommand):
+    help = 'Show connection counts and wait times per database, as recorded by the web processes'
+
+    def handle(self, *args, **options):
+        metrics = ConnectionMetricsService.get_metrics(list(settings.DATABASES))
+        for alias, counts in metrics.items():
+            connections = counts['connections']
+            average_ms = counts['wait_us'] / connections / 1000 if connections else 0
+            self.stdout.write(self.style.SUCCESS(alias))
+            self.stdout.write(f'  connections: {connections}')
+            self.stdout.write(f'  average wait: {average_ms:.2f}ms')
+            self.stdout.write(f'  total wait: {counts["wait_us"] / 1_000_000:.1f}s')
+            self.stdout.write(f'  slow: {counts["slow"]}')
@@ -0,0 +1,34 @@
+"""
+Management command to release the stock held by expired cart reservations.
+"""
+import time
+from django.core.management.base import BaseCommand
+from store.services.inventory_service import InventoryService
+
+
+class Command(BaseCommand):
+    help = 'Release the stock of expired reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Reservations expired per batch (default: STOCK_RESERVATION_SWEEP_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sweeping')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds between sweeps in --loop mode (default: 30)')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                expired = InventoryService.expire_reservations(options['batch_size'])
+                total += expired
+                if expired:
+                    self.stdout.write(f'Expired {expired} reservations')
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Expired {total} reservations in total'))
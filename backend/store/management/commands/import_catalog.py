@@ -0,0 +1,95 @@
+"""
+Management command to bulk import phones, variants and accessories.
+"""
+import csv
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from store.services.catalog_import_service import CatalogImportService, CatalogImportError
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a supplier catalog from CSV or JSONL. Each row has a type '
+        '(phone or accessory), name, price and optionally description, stock, '
+        'is_active, is_new_arrival and is_best_seller. Phone rows also have '
+        'brand, color, storage and optionally sku; accessory rows optionally slug.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str,
+                            help='Path to the .csv or .jsonl file')
+        parser.add_argument('--format', type=str, choices=['csv', 'jsonl'],
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows written per transaction (default: 2000)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        totals = {'phones': 0, 'variants': 0, 'accessories': 0, 'skipped': 0}
+        brands = set()
+        started = time.monotonic()
+
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                rows = self.read_rows(f, file_format)
+                for number, chunk in enumerate(self.parsed_chunks(rows, options['chunk_size'], totals), 1):
+                    chunk_started = time.monotonic()
+                    summary = CatalogImportService.import_chunk(chunk)
+                    elapsed = time.monotonic() - chunk_started
+                    brands |= summary['brands']
+                    for key in ('phones', 'variants', 'accessories'):
+                        totals[key] += summary[key]
+                    self.stdout.write(
+                        f"Chunk {number}: {len(chunk)} rows in {elapsed:.2f}s "
+                        f"({len(chunk) / max(elapsed, 1e-6):.0f} rows/s)"
+                    )
+        except OSError as e:
+            raise CommandError(f'Could not read {path}: {e}')
+        finally:
+            CatalogImportService.invalidate_caches(brands, totals['accessories'] > 0)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['phones']} phones, {totals['variants']} variants and "
+            f"{totals['accessories']} accessories in {elapsed:.2f}s; "
+            f"skipped {totals['skipped']} invalid rows"
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            'Stripe products and prices were queued; run process_stripe_outbox to create them'
+        ))
+
+    def read_rows(self, f, file_format):
+        """
+        Yield raw rows without loading the whole file
+        """
+        if file_format == 'csv':
+            for row in csv.DictReader(f):
+                yield row
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {'_error': str(e)}
+
+    def parsed_chunks(self, rows, chunk_size, totals):
+        chunk = []
+        for number, row in enumerate(rows, 1):
+            try:
+                if '_error' in row:
+                    raise CatalogImportError(row['_error'])
+                chunk.append(CatalogImportService.parse_row(row))
+            except CatalogImportError as e:
+                totals['skipped'] += 1
+                self.stderr.write(f'Row {number}: {e}')
+                continue
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
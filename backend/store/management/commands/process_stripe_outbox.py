@@ -0,0 +1,42 @@
+"""
+Management command to push queued product changes to Stripe.
+"""
+import time
+from django.core.management.base import BaseCommand
+from store.services.stripe_sync_service import StripeSyncService
+
+
+class Command(BaseCommand):
+    help = 'Create the queued Stripe products and prices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Tasks claimed per batch (default: STRIPE_SYNC_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new tasks')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to wait when the outbox is empty in --loop mode (default: 5)')
+
+    def handle(self, *args, **options):
+        totals = {'done': 0, 'retried': 0, 'failed': 0}
+        try:
+            while True:
+                summary = StripeSyncService.process_batch(options['batch_size'])
+                for status, count in summary.items():
+                    totals[status] += count
+                if any(summary.values()):
+                    self.stdout.write(
+                        f"Batch: {summary['done']} done, {summary['retried']} retried, "
+                        f"{summary['failed']} failed"
+                    )
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stripe sync: {totals['done']} done, {totals['retried']} retried, "
+            f"{totals['failed']} failed"
+        ))
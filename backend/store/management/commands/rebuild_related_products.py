@@ -0,0 +1,25 @@
+"""
+Management command to recompute the related products of every phone and accessory.
+"""
+import time
+from django.core.management.base import BaseCommand
+from store.services.cache_service import CatalogCacheService
+from store.services.related_product_service import RelatedProductService
+from store.models import Phones
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the ranked related products of every phone and accessory. '
+        'Product changes keep them up to date; run this after the first deploy '
+        'or after changes made outside of save()/delete().'
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        RelatedProductService.rebuild()
+        CatalogCacheService.invalidate_brands(Phones.objects.values_list('brand', flat=True).distinct())
+        CatalogCacheService.invalidate_accessories()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt related products in {time.monotonic() - started:.2f}s'
+        ))
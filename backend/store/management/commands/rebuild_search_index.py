@@ -0,0 +1,38 @@
+"""
+Management command to rebuild the product search vectors.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from store.models import PhoneVariant, Accessory
+from store.services.search_service import SearchService
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the search vectors of all phone variants and accessories, '
+        'e.g. after the first deploy of search or a CATALOG_SEARCH_CONFIG change'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows updated per statement (default: 5000)')
+
+    def handle(self, *args, **options):
+        if not SearchService.is_supported():
+            self.stdout.write(self.style.WARNING(
+                'The database has no full-text search; search uses the icontains fallback'
+            ))
+            return
+
+        batch_size = options['batch_size']
+        for model, update in (
+            (PhoneVariant, SearchService.update_phone_variants),
+            (Accessory, SearchService.update_accessories),
+        ):
+            # Short id-range updates instead of one statement locking every row
+            last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+            for start in range(0, last_id, batch_size):
+                update(model.objects.filter(id__gt=start, id__lte=start + batch_size))
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt search vectors of {model._meta.verbose_name_plural}'
+            ))
@@ -0,0 +1,126 @@
+"""
+Management command to rebuild the cached catalog payloads ahead of expiry.
+"""
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from store.models import Phones, PhoneVariant, Accessory
+from store.services.cache_service import (
+    CatalogCacheService,
+    HOMEPAGE_KEY,
+    FLASH_DEALS_KEY,
+    NEW_ARRIVALS_KEY,
+    BEST_SELLERS_KEY
+)
+from store.services.payload_service import CatalogPayloadService
+from store.services.product_service import ProductService
+from store.utils import build_catalog_request
+from promotions.services.flash_deal_service import FlashDealService
+from promotions.services.payload_service import PromotionPayloadService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the homepage, list and top product detail caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=100,
+                            help='Number of phone and accessory detail pages to warm (default: 100)')
+        parser.add_argument('--all', action='store_true',
+                            help='Warm the detail pages of every active product')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of detail pages built per batch of queries (default: 500)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and rewarm every --interval seconds')
+        parser.add_argument('--interval', type=int, default=300,
+                            help='Seconds between runs in --loop mode (default: 300)')
+
+    def handle(self, *args, **options):
+        request = build_catalog_request()
+
+        while True:
+            started = time.monotonic()
+            with CatalogCacheService.build_reads():
+                counts = self.warm(request, options)
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'Warmed {counts["lists"]} list, {counts["phones"]} phone and '
+                f'{counts["accessories"]} accessory payloads in {elapsed:.2f}s'
+            ))
+            if not options['loop']:
+                return
+
+            # Wake up for the next deal boundary so deal payloads switch on time
+            delay = options['interval']
+            boundary = FlashDealService.get_next_boundary()
+            if boundary is not None:
+                delay = min(delay, max(1, (boundary - timezone.now()).total_seconds()))
+            try:
+                time.sleep(delay)
+            except KeyboardInterrupt:
+                return
+
+    def warm(self, request, options):
+        deal_timeout = PromotionPayloadService.get_cache_timeout()
+        CatalogCacheService.set_many({
+            HOMEPAGE_KEY: PromotionPayloadService.build_homepage(request),
+            FLASH_DEALS_KEY: PromotionPayloadService.build_flash_deals(request),
+        }, deal_timeout)
+        CatalogCacheService.set_many({
+            NEW_ARRIVALS_KEY: CatalogPayloadService.build_new_arrivals(request),
+            BEST_SELLERS_KEY: CatalogPayloadService.build_best_sellers(request),
+        })
+
+        limit = None if options['all'] else options['top']
+        chunk_size = options['chunk_size']
+
+        phones = 0
+        for slugs in self.chunked(self.get_phone_slugs(limit), chunk_size):
+            details = ProductService.get_phone_details_by_slugs(slugs)
+            CatalogCacheService.set_many({
+                CatalogCacheService.phone_detail_key(slug): CatalogPayloadService.build_phone_detail(product_data, request)
+                for slug, product_data in details.items()
+            })
+            phones += len(details)
+
+        accessories = 0
+        for slugs in self.chunked(self.get_accessory_slugs(limit), chunk_size):
+            details = ProductService.get_accessory_details_by_slugs(slugs)
+            CatalogCacheService.set_many({
+                CatalogCacheService.accessory_detail_key(slug): CatalogPayloadService.build_accessory_detail(product_data, request)
+                for slug, product_data in details.items()
+            })
+            accessories += len(details)
+
+        return {'lists': 4, 'phones': phones, 'accessories': accessories}
+
+    def get_phone_slugs(self, limit):
+        """
+        Slugs of phones with active variants, best sellers and new arrivals first
+        """
+        active = PhoneVariant.objects.filter(phone=OuterRef('pk'), is_active=True)
+        slugs = Phones.objects.filter(Exists(active)).annotate(
+            has_best_seller=Exists(active.filter(is_best_seller=True)),
+            has_new_arrival=Exists(active.filter(is_new_arrival=True))
+        ).order_by('-has_best_seller', '-has_new_arrival', '-createdAt').values_list('slug', flat=True)
+        if limit is not None:
+            slugs = slugs[:limit]
+        return slugs.iterator()
+
+    def get_accessory_slugs(self, limit):
+        """
+        Slugs of active accessories, best sellers and new arrivals first
+        """
+        slugs = Accessory.objects.filter(is_active=True).order_by(
+            '-is_best_seller', '-is_new_arrival', '-createdAt'
+        ).values_list('slug', flat=True)
+        if limit is not None:
+            slugs = slugs[:limit]
+        return slugs.iterator()
+
+    @staticmethod
+    def chunked(iterable, size):
+        iterator = iter(iterable)
+        while chunk := list(islice(iterator, size)):
+            yield chunk
@@ -0,0 +1,92 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .db_router import replica_reads
+from .services.connection_metrics_service import request_connect_time
+
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs in both sync and async mode, so it does
+    not force the async views under ASGI to run in a thread
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Serve safe API requests from the read replicas. A client that made a
+    write is pinned to the primary for DATABASE_REPLICA_PIN_SECONDS with a
+    cookie, so it does not read data older than its own write while the
+    replicas catch up. Other requests run pinned, which also keeps the
+    cache rebuilds they trigger on the primary (see
+    CatalogCacheService.build_reads).
+    """
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(pinned=not self.use_replica(request)):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        with replica_reads(pinned=not self.use_replica(request)):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def use_replica(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and request.path.startswith('/api/')
+            and PRIMARY_PIN_COOKIE not in request.COOKIES
+        )
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                '1',
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+class DatabaseTimingMiddleware(HybridMiddleware):
+    """
+    Report the time the request spent getting database connections as a
+    `Server-Timing: db-connect;dur=<ms>` header, so slow connects and pool
+    waits show up in the browser and in load tests
+    """
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        connect_time = [0.0]
+        token = request_connect_time.set(connect_time)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_connect_time.reset(token)
+        return self.process_response(response, connect_time)
+
+    async def __acall__(self, request):
+        connect_time = [0.0]
+        token = request_connect_time.set(connect_time)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_connect_time.reset(token)
+        return self.process_response(response, connect_time)
+
+    def process_response(self, response, connect_time):
+        response.headers['Server-Timing'] = f'db-connect;dur={connect_time[0] * 1000:.1f}'
+        return response
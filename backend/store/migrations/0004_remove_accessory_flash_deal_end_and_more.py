@@ -7,6 +7,8 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ('store', '0003_remove_flashdeal_one_product_type_only_and_more'),
+        # The flash deal fields are copied to promotions.FlashDeal before removal
+        ('promotions', '0002_transfer_flash_deals'),
     ]
 
     operations = [
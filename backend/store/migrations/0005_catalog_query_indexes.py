@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_remove_accessory_flash_deal_end_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessory',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_new_arrival', True)), fields=['-createdAt', '-id'], name='accessory_new_arrival_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessory',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_best_seller', True)), fields=['-createdAt', '-id'], name='accessory_best_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='accessory_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phones',
+            index=models.Index(fields=['brand'], name='phones_brand_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phonevariant',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_new_arrival', True)), fields=['-createdAt', '-id'], name='variant_new_arrival_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phonevariant',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_best_seller', True)), fields=['-createdAt', '-id'], name='variant_best_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phonevariant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['phone', 'id'], name='variant_active_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:37
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_catalog_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeSyncTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('phone_product', 'Phone product'), ('variant_price', 'Phone variant price'), ('accessory_product', 'Accessory product and price')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('idempotency_key', models.UUIDField(default=uuid.uuid4, editable=False)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Stripe Sync Tasks',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at', 'id'], name='stripesync_due_idx'), models.Index(fields=['kind', 'object_id'], name='stripesync_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_stripesynctask'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-createdAt', '-id'], name='accessory_active_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price', 'id'], name='accessory_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name', 'id'], name='accessory_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phonevariant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-createdAt', '-id'], name='variant_active_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phonevariant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price', 'id'], name='variant_active_price_idx'),
+        ),
+    ]
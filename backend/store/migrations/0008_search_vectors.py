@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_INDEXES = [
+    ('accessory', django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='accessory_search_idx')),
+    ('phonevariant', django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='variant_search_idx')),
+]
+
+
+def add_search_indexes(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL; other databases use the
+    # icontains fallback of SearchService
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model('store', model_name), index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model('store', model_name), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_catalog_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessory',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='phonevariant',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in SEARCH_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(add_search_indexes, remove_search_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_search_vectors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedAccessory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('accessory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_accessories', to='store.accessory')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to_accessories', to='store.accessory')),
+            ],
+            options={
+                'verbose_name_plural': 'Related Accessories',
+                'constraints': [models.UniqueConstraint(fields=('accessory', 'rank'), name='related_accessory_rank_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedPhoneVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('phone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_variants', to='store.phones')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to_phones', to='store.phonevariant')),
+            ],
+            options={
+                'verbose_name_plural': 'Related Phone Variants',
+                'constraints': [models.UniqueConstraint(fields=('phone', 'rank'), name='related_variant_rank_unique')],
+            },
+        ),
+    ]
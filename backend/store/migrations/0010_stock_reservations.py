@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:09
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_related_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessory',
+            name='reservedStock',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('product_type', models.CharField(choices=[('phone', 'Phone variant'), ('accessory', 'Accessory')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('held', 'Held'), ('committed', 'Committed'), ('released', 'Released'), ('expired', 'Expired')], default='held', max_length=10)),
+                ('expires_at', models.DateTimeField()),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Stock Reservations',
+                'indexes': [models.Index(condition=models.Q(('status', 'held')), fields=['expires_at', 'id'], name='reservation_held_expiry_idx')],
+            },
+        ),
+    ]
@@ -1,16 +1,24 @@
 from enum import unique
-import stripe
 from unicodedata import category
 import os
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.db.models.fields.files import ImageField
 from django.utils.text import slugify
 import uuid
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from .utils import save_kwargs_excluding, save_with_unique_slug
 
+class SearchableManager(models.Manager):
+    """
+    Leaves out the search vector, which only the database reads
+    """
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 class Phones(models.Model):
     name=models.CharField(max_length=200)
@@ -22,35 +30,30 @@ class Phones(models.Model):
     updatedAt = models.DateTimeField(auto_now=True)
     
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(f"{self.brand}-{self.name}")
-            self.slug = base_slug
-            n = 1
-            while Phones.objects.filter(slug=self.slug).exists():
-                self.slug = f"{base_slug}-{n}"
-                n += 1
-       
-        if not self.stripe_id:
-            try:
-                stripe_product = stripe.Product.create(
-                    name=self.name,
-                    description=self.description or f"{self.brand} {self.name}",
-                    metadata={
-                        "brand": self.brand,
-                        "product_id": str(self.id) if self.id else "pending",
-                    }
-                )
-                self.stripe_id = stripe_product.id
-            except Exception as e:
-                print(f"Error creating Stripe product: {e}")
-        
-        super().save(*args, **kwargs)
+        base_slug = None if self.slug else slugify(f"{self.brand}-{self.name}")
+
+        # The Stripe product is created by the outbox worker, see StripeSyncTask.
+        # Don't overwrite an id it stored after this instance was loaded.
+        if self.pk and not self.stripe_id:
+            self.stripe_id = Phones.objects.filter(pk=self.pk).values_list('stripe_id', flat=True).first()
+
+        def save_and_enqueue():
+            with transaction.atomic():
+                super(Phones, self).save(*args, **kwargs)
+                if not self.stripe_id:
+                    StripeSyncTask.enqueue(StripeSyncTask.PHONE_PRODUCT, self.id)
+
+        save_with_unique_slug(self, base_slug, save_and_enqueue)
     
     def __str__(self):
         return f"{self.brand} {self.name}"
     
     class Meta:
         verbose_name_plural = "Phones"
+        indexes = [
+            # Same-brand related products
+            models.Index(fields=['brand'], name='phones_brand_idx'),
+        ]
 
 
 class PhoneVariant(models.Model):
@@ -66,44 +69,74 @@ class PhoneVariant(models.Model):
     is_active = models.BooleanField(default=True)
     is_new_arrival = models.BooleanField(default=False)
     is_best_seller = models.BooleanField(default=False)
+    # Maintained by SearchService, PostgreSQL only
+    search_vector = SearchVectorField(null=True, editable=False)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
+
+    objects = SearchableManager()
     
     def save(self, *args, **kwargs):
+        # Changed by InventoryService only
+        kwargs = save_kwargs_excluding(self, kwargs, {'reservedStock'})
         if not self.sku:
-            brand_code = self.phone.brand[:3].upper()
-            model_code = self.phone.name[:4].upper()
-            color_code = self.color[:3].upper()
-            storage_code = self.storage.replace("GB", "").replace(" ", "")
-            random_suffix = uuid.uuid4().hex[:6].upper()
-            self.sku = f"{brand_code}-{model_code}-{color_code}-{storage_code}-{random_suffix}"
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        
-        if self.phone.stripe_id and (is_new or not self.stripe_price_id):
-            try:
-                price_in_cents = int(self.price * 100)
-                stripe_price = stripe.Price.create(
-                    product=self.phone.stripe_id,
-                    unit_amount=price_in_cents,
-                    currency='usd',
-                    metadata={
-                        'variant_id': str(self.id),
-                        'sku': self.sku,
-                        'color': self.color,
-                        'storage': self.storage
-                    }
-                )
-                self.__class__.objects.filter(id=self.id).update(stripe_price_id=stripe_price.id)
-                self.stripe_price_id = stripe_price.id
-            except Exception as e:
-                print(f"Error creating Stripe price: {e}")
+            self.sku = PhoneVariant.build_sku(self.phone, self.color, self.storage)
+
+        # The Stripe price is created by the outbox worker, see StripeSyncTask.
+        # Don't overwrite an id it stored after this instance was loaded.
+        if self.pk and not self.stripe_price_id:
+            self.stripe_price_id = PhoneVariant.objects.filter(pk=self.pk).values_list('stripe_price_id', flat=True).first()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.stripe_price_id:
+                StripeSyncTask.enqueue(StripeSyncTask.VARIANT_PRICE, self.id)
+
+    @staticmethod
+    def build_sku(phone, color, storage):
+        brand_code = phone.brand[:3].upper()
+        model_code = phone.name[:4].upper()
+        color_code = color[:3].upper()
+        storage_code = storage.replace("GB", "").replace(" ", "")
+        random_suffix = uuid.uuid4().hex[:6].upper()
+        return f"{brand_code}-{model_code}-{color_code}-{storage_code}-{random_suffix}"
 
     def __str__(self):
         return f"{self.phone.name} - {self.color} - {self.storage}"
 
     class Meta:
         verbose_name_plural = "Phone Variants"
+        indexes = [
+            # ProductService.get_new_arrivals / get_best_sellers
+            models.Index(
+                fields=['-createdAt', '-id'],
+                condition=models.Q(is_active=True, is_new_arrival=True),
+                name='variant_new_arrival_idx'
+            ),
+            models.Index(
+                fields=['-createdAt', '-id'],
+                condition=models.Q(is_active=True, is_best_seller=True),
+                name='variant_best_seller_idx'
+            ),
+            # Active variants of a phone, and related products of a brand
+            models.Index(
+                fields=['phone', 'id'],
+                condition=models.Q(is_active=True),
+                name='variant_active_phone_idx'
+            ),
+            # Catalog listing, see KeysetPagination
+            models.Index(
+                fields=['-createdAt', '-id'],
+                condition=models.Q(is_active=True),
+                name='variant_active_newest_idx'
+            ),
+            models.Index(
+                fields=['price', 'id'],
+                condition=models.Q(is_active=True),
+                name='variant_active_price_idx'
+            ),
+            # SearchService
+            GinIndex(fields=['search_vector'], name='variant_search_idx'),
+        ]
 
 
 class Accessory(models.Model):
@@ -112,52 +145,243 @@ class Accessory(models.Model):
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
+    reservedStock = models.IntegerField(default=0)
     image = ImageField(upload_to='accessories/', null=True, blank=True)
     stripe_id = models.CharField(max_length=100, null=True, blank=True)
     stripe_price_id = models.CharField(max_length=100, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     is_new_arrival = models.BooleanField(default=False)
     is_best_seller = models.BooleanField(default=False)
+    # Maintained by SearchService, PostgreSQL only
+    search_vector = SearchVectorField(null=True, editable=False)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
+    objects = SearchableManager()
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.name)
-            self.slug = base_slug
-            n = 1
-            while Accessory.objects.filter(slug=self.slug).exists():
-                self.slug = f"{base_slug}-{n}"
-                n += 1
-
-        if not self.stripe_id:
-            try: 
-                stripe_product = stripe.Product.create(
-                    name=self.name,
-                    description=self.description or self.name,
-                    metadata={
-                        "product_id": str(self.id) if self.id else "pending",
-                        "product_type": "accessory"
-                    }
-                )
-                self.stripe_id = stripe_product.id
-                if not self.stripe_price_id:
-                    price_in_cents = int(self.price*100)
-                    stripe_price = stripe.Price.create(
-                        product = self.stripe_id,
-                        unit_amount=price_in_cents,
-                        currency='cad',
-                         metadata={
-                            'accessory_id': str(self.id) if self.id else "pending"
-                        }
-                    )
-                    self.stripe_price_id = stripe_price.id
-            except Exception as e:
-                print(f"Error creating Stripe product/price for accessory: {e}")
-        super().save(*args, **kwargs)
+        # Changed by InventoryService only
+        kwargs = save_kwargs_excluding(self, kwargs, {'reservedStock'})
+        base_slug = None if self.slug else slugify(self.name)
+
+        # The Stripe product and price are created by the outbox worker, see StripeSyncTask.
+        # Don't overwrite ids it stored after this instance was loaded.
+        if self.pk and not (self.stripe_id and self.stripe_price_id):
+            stripe_ids = Accessory.objects.filter(pk=self.pk).values('stripe_id', 'stripe_price_id').first()
+            if stripe_ids:
+                self.stripe_id = self.stripe_id or stripe_ids['stripe_id']
+                self.stripe_price_id = self.stripe_price_id or stripe_ids['stripe_price_id']
+
+        def save_and_enqueue():
+            with transaction.atomic():
+                super(Accessory, self).save(*args, **kwargs)
+                if not self.stripe_id or not self.stripe_price_id:
+                    StripeSyncTask.enqueue(StripeSyncTask.ACCESSORY_PRODUCT, self.id)
+
+        save_with_unique_slug(self, base_slug, save_and_enqueue)
 
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name_plural = "Accessories"
+        indexes = [
+            # ProductService.get_new_arrivals / get_best_sellers
+            models.Index(
+                fields=['-createdAt', '-id'],
+                condition=models.Q(is_active=True, is_new_arrival=True),
+                name='accessory_new_arrival_idx'
+            ),
+            models.Index(
+                fields=['-createdAt', '-id'],
+                condition=models.Q(is_active=True, is_best_seller=True),
+                name='accessory_best_seller_idx'
+            ),
+            # Related accessories
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_active=True),
+                name='accessory_active_idx'
+            ),
+            # Catalog listing, see KeysetPagination
+            models.Index(
+                fields=['-createdAt', '-id'],
+                condition=models.Q(is_active=True),
+                name='accessory_active_newest_idx'
+            ),
+            models.Index(
+                fields=['price', 'id'],
+                condition=models.Q(is_active=True),
+                name='accessory_active_price_idx'
+            ),
+            models.Index(
+                fields=['name', 'id'],
+                condition=models.Q(is_active=True),
+                name='accessory_active_name_idx'
+            ),
+            # SearchService
+            GinIndex(fields=['search_vector'], name='accessory_search_idx'),
+        ]
+
+
+class RelatedPhoneVariant(models.Model):
+    """
+    Ranked related products of a phone: active variants of other phones of
+    the same brand, closest in price first. Maintained by
+    RelatedProductService.
+    """
+    phone = models.ForeignKey(Phones, on_delete=models.CASCADE, related_name='related_variants')
+    variant = models.ForeignKey(PhoneVariant, on_delete=models.CASCADE, related_name='related_to_phones')
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name_plural = "Related Phone Variants"
+        constraints = [
+            models.UniqueConstraint(fields=['phone', 'rank'], name='related_variant_rank_unique'),
+        ]
+
+
+class RelatedAccessory(models.Model):
+    """
+    Ranked related products of an accessory: the active accessories
+    closest in price. Maintained by RelatedProductService.
+    """
+    accessory = models.ForeignKey(Accessory, on_delete=models.CASCADE, related_name='related_accessories')
+    related = models.ForeignKey(Accessory, on_delete=models.CASCADE, related_name='related_to_accessories')
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name_plural = "Related Accessories"
+        constraints = [
+            models.UniqueConstraint(fields=['accessory', 'rank'], name='related_accessory_rank_unique'),
+        ]
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for a cart until it is committed (bought), released or
+    expires. While held, its quantity is counted in the product's
+    reservedStock. Maintained by InventoryService.
+    """
+    PHONE = 'phone'
+    ACCESSORY = 'accessory'
+    PRODUCT_TYPE_CHOICES = [
+        (PHONE, 'Phone variant'),
+        (ACCESSORY, 'Accessory'),
+    ]
+
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (COMMITTED, 'Committed'),
+        (RELEASED, 'Released'),
+        (EXPIRED, 'Expired'),
+    ]
+
+    reference = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    product_type = models.CharField(max_length=10, choices=PRODUCT_TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=HELD)
+    # Who holds it, e.g. 'user:12' or 'ip:203.0.113.5'; blank when unknown
+    client = models.CharField(max_length=100, blank=True, default='')
+    expires_at = models.DateTimeField()
+    createdAt = models.DateTimeField(auto_now_add=True)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.get_product_type_display()} #{self.object_id} ({self.status})"
+
+    class Meta:
+        verbose_name_plural = "Stock Reservations"
+        indexes = [
+            # Expired reservations swept by expire_stock_reservations
+            models.Index(
+                fields=['expires_at', 'id'],
+                condition=models.Q(status='held'),
+                name='reservation_held_expiry_idx'
+            ),
+            # Quantity a client holds, for STOCK_RESERVATION_MAX_HELD_PER_CLIENT
+            models.Index(
+                fields=['client'],
+                condition=models.Q(status='held'),
+                name='reservation_held_client_idx'
+            ),
+        ]
+
+
+class StripeSyncTask(models.Model):
+    """
+    Outbox of pending Stripe calls. Rows are written in the same transaction
+    as the product they belong to and processed by the process_stripe_outbox
+    command, so saving a product never waits on Stripe.
+    """
+    PHONE_PRODUCT = 'phone_product'
+    VARIANT_PRICE = 'variant_price'
+    ACCESSORY_PRODUCT = 'accessory_product'
+    KIND_CHOICES = [
+        (PHONE_PRODUCT, 'Phone product'),
+        (VARIANT_PRICE, 'Phone variant price'),
+        (ACCESSORY_PRODUCT, 'Accessory product and price'),
+    ]
+
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    idempotency_key = models.UUIDField(default=uuid.uuid4, editable=False)
+    last_error = models.TextField(blank=True, default='')
+    createdAt = models.DateTimeField(auto_now_add=True)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def enqueue(cls, kind, object_id):
+        """
+        Queue a Stripe sync for an object unless one is already pending
+        """
+        if not cls.objects.filter(kind=kind, object_id=object_id, status=cls.PENDING).exists():
+            cls.objects.create(kind=kind, object_id=object_id)
+
+    @classmethod
+    def enqueue_many(cls, kind, object_ids):
+        """
+        Bulk version of enqueue
+        """
+        object_ids = set(object_ids)
+        pending = set(cls.objects.filter(
+            kind=kind,
+            object_id__in=object_ids,
+            status=cls.PENDING
+        ).values_list('object_id', flat=True))
+        cls.objects.bulk_create([
+            cls(kind=kind, object_id=object_id)
+            for object_id in sorted(object_ids - pending)
+        ])
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} ({self.status})"
+
+    class Meta:
+        verbose_name_plural = "Stripe Sync Tasks"
+        indexes = [
+            # Due tasks claimed by the outbox worker
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                condition=models.Q(status='pending'),
+                name='stripesync_due_idx'
+            ),
+            models.Index(fields=['kind', 'object_id'], name='stripesync_object_idx'),
+        ]
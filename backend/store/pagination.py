@@ -0,0 +1,131 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a (sort field, id) key. Each page is fetched with
+    `WHERE (field, id) > (last field, last id) ORDER BY field, id LIMIT n`,
+    so deep pages cost the same as the first one and no COUNT(*) is run.
+
+    The view defines the sorts it supports as `sort_fields`, a dict of
+    sort name -> (field, descending), and `default_sort`. Sort fields must
+    not be nullable; they may follow relations, e.g. 'phone__name'.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    sort_query_param = 'sort'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.sort_fields = view.sort_fields
+        self.sort = request.query_params.get(self.sort_query_param, view.default_sort)
+        if self.sort not in self.sort_fields:
+            raise ValidationError({
+                self.sort_query_param: f"Must be one of: {', '.join(self.sort_fields)}"
+            })
+        self.field, descending = self.sort_fields[self.sort]
+
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = cursor is not None and cursor['reverse']
+        # Previous pages are read backwards from the cursor and flipped
+        if descending != reverse:
+            ordering, lookup = (f'-{self.field}', '-id'), 'lt'
+        else:
+            ordering, lookup = (self.field, 'id'), 'gt'
+
+        if cursor is not None:
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': cursor['value']}) |
+                Q(**{self.field: cursor['value'], f'id__{lookup}': cursor['id']})
+            )
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Nothing left after the cursor (e.g. rows were deleted); start over
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        value = reduce(getattr, self.field.split('__'), row)
+        position = {
+            's': self.sort,
+            'v': value.isoformat() if hasattr(value, 'isoformat') else str(value),
+            'id': row.id,
+            'r': int(reverse)
+        }
+        cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        """
+        Returns:
+            dict: {'value', 'id', 'reverse'}, or None for the first page
+
+        Raises:
+            NotFound: If the cursor is malformed or belongs to another sort
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if position['s'] != self.sort:
+                raise ValueError
+            return {
+                'value': self.get_field(model).to_python(position['v']),
+                'id': int(position['id']),
+                'reverse': bool(position['r'])
+            }
+        except (binascii.Error, ValueError, KeyError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_field(self, model):
+        *relations, name = self.field.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name)
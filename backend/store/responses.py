@@ -0,0 +1,25 @@
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+
+def rendered_json_response(request, payload):
+    """
+    Serve a payload from CatalogCacheService.render as-is, answering
+    If-None-Match revalidations with 304 Not Modified
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # Weak comparison, as for GET requests in Django's ConditionalGetMiddleware
+        etags = [etag.removeprefix('W/') for etag in parse_etags(if_none_match)]
+        if '*' in etags or payload['etag'] in etags:
+            response = HttpResponseNotModified()
+            response['ETag'] = payload['etag']
+            patch_cache_control(response, public=True, no_cache=True)
+            return response
+
+    response = HttpResponse(payload['body'], content_type='application/json')
+    response['ETag'] = payload['etag']
+    # Clients and CDNs may store the body but must revalidate it on each use
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
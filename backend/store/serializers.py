@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Phones, PhoneVariant, Accessory
+from .models import Phones, PhoneVariant, Accessory, StockReservation
 from urllib.parse import urljoin
 from django.conf import settings
 
@@ -49,6 +49,20 @@ class AccessorySerializer(serializers.ModelSerializer):
         return None
 
 
+class StockReservationRequestSerializer(serializers.Serializer):
+    product_type = serializers.ChoiceField(choices=StockReservation.PRODUCT_TYPE_CHOICES)
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=settings.STOCK_RESERVATION_MAX_QUANTITY)
+
+
+class StockReservationSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(source='object_id', read_only=True)
+
+    class Meta:
+        model = StockReservation
+        fields = ['reference', 'product_type', 'product_id', 'quantity', 'status', 'expires_at']
+
+
 class HomepageSectionSerializer(serializers.Serializer):
     phones = PhoneVariantSerializer(many=True, read_only=True)
     accessories = AccessorySerializer(many=True, read_only=True)
@@ -0,0 +1,314 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from ..db_router import is_pinned, primary_reads, replica_reads
+from ..models import Phones, Accessory, RelatedAccessory
+
+HOMEPAGE_KEY = 'homepage_data'
+NEW_ARRIVALS_KEY = 'new_arrivals'
+BEST_SELLERS_KEY = 'best_sellers'
+FLASH_DEALS_KEY = 'flash_deals'
+
+# Payloads that embed phone variant / accessory data
+PRODUCT_LIST_KEYS = (HOMEPAGE_KEY, NEW_ARRIVALS_KEY, BEST_SELLERS_KEY)
+# Payloads that embed flash deal data
+FLASH_DEAL_KEYS = (HOMEPAGE_KEY, FLASH_DEALS_KEY)
+
+# Set for DATABASE_REPLICA_PIN_SECONDS after a purge, while the replicas
+# may not have the change yet
+RECENT_PURGE_KEY = 'catalog_cache:recent_purge'
+
+METRICS_KEY_PREFIX = 'catalog_cache_metrics'
+# hit: fresh entry served
+# miss: entry rebuilt by this request
+# early_refresh: entry rebuilt before it expired (soft TTL)
+# served_stale: served the previous entry while another request rebuilt it
+# waited: waited for another request to rebuild a missing entry
+METRIC_EVENTS = ('hit', 'miss', 'early_refresh', 'served_stale', 'waited')
+
+
+class CatalogCacheService:
+    # Metric counts not yet added to the shared counters, see record_metric
+    _metrics_lock = threading.Lock()
+    _pending_metrics = {}
+    _metrics_flushed_at = time.monotonic()
+
+    @staticmethod
+    def get_timeout():
+        """
+        Default lifetime of a cached catalog payload in seconds
+        """
+        return settings.CATALOG_CACHE_TIMEOUT
+
+    @staticmethod
+    def phone_detail_key(slug):
+        return f'phone_detail_{slug}'
+
+    @staticmethod
+    def accessory_detail_key(slug):
+        return f'accessory_detail_{slug}'
+
+    @staticmethod
+    def render(data):
+        """
+        Render a payload to the JSON body served to clients, so cache hits do
+        not pay for rendering again
+
+        Returns:
+            dict: {'body': bytes, 'etag': str}
+        """
+        body = JSONRenderer().render(data)
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        return {'body': body, 'etag': etag}
+
+    @staticmethod
+    def get_or_build(key, build, timeout=None, metrics_name=None):
+        """
+        Get a cached payload, rebuilding it in at most one request at a time.
+
+        Entries are refreshed early once CATALOG_CACHE_EARLY_REFRESH of their
+        lifetime has passed: the request that takes the rebuild lock rebuilds
+        the entry while concurrent requests keep getting the current one. When
+        the entry is missing, concurrent requests wait for the rebuild instead
+        of all running the queries themselves.
+
+        Args:
+            key (str): The cache key
+            build (callable): Returns the payload, or None if there is nothing
+                to cache (e.g. the product does not exist)
+            timeout (int or callable, optional): Lifetime in seconds, or a
+                callable evaluated just before build(). Defaults to get_timeout()
+            metrics_name (str, optional): Name to record metrics under,
+                defaults to the key
+
+        Returns:
+            The cached or freshly built payload
+        """
+        metrics_name = metrics_name or key
+        entry = cache.get(key)
+        if entry is not None and time.time() < entry['refresh_at']:
+            CatalogCacheService.record_metric(metrics_name, 'hit')
+            return entry['value']
+
+        lock_key = f'{key}:lock'
+        lock_timeout = settings.CATALOG_CACHE_LOCK_TIMEOUT
+        locked = cache.add(lock_key, 1, lock_timeout)
+        if not locked:
+            # Another request is rebuilding this entry
+            if entry is not None:
+                CatalogCacheService.record_metric(metrics_name, 'served_stale')
+                return entry['value']
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(settings.CATALOG_CACHE_LOCK_POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    CatalogCacheService.record_metric(metrics_name, 'waited')
+                    return entry['value']
+                if cache.get(lock_key) is None:
+                    break
+            # The rebuild failed or is taking too long; build it ourselves
+
+        try:
+            with CatalogCacheService.build_reads():
+                if timeout is None:
+                    lifetime = CatalogCacheService.get_timeout()
+                elif callable(timeout):
+                    lifetime = timeout()
+                else:
+                    lifetime = timeout
+                value = build()
+            if value is not None:
+                CatalogCacheService.set(key, value, lifetime)
+            event = 'miss' if entry is None else 'early_refresh'
+            CatalogCacheService.record_metric(metrics_name, event)
+            return value
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+    @staticmethod
+    def build_reads():
+        """
+        Database routing for building payloads: the read replicas, unless
+        the current request is pinned to the primary after a write, or a
+        purge happened so recently that they may not have the change yet
+        and would put the old rows back in the cache
+        """
+        if is_pinned() or cache.get(RECENT_PURGE_KEY):
+            return primary_reads()
+        return replica_reads()
+
+    @staticmethod
+    def set(key, value, timeout=None):
+        """
+        Store a payload in the format read by get_or_build, e.g. from the
+        cache warmer
+        """
+        if timeout is None:
+            timeout = CatalogCacheService.get_timeout()
+        refresh_at = time.time() + timeout * settings.CATALOG_CACHE_EARLY_REFRESH
+        cache.set(key, {'value': value, 'refresh_at': refresh_at}, timeout)
+
+    @staticmethod
+    def set_many(values, timeout=None):
+        """
+        Store several payloads with the same timeout in one cache round trip
+        
+        Args:
+            values (dict): key -> payload
+        """
+        if timeout is None:
+            timeout = CatalogCacheService.get_timeout()
+        refresh_at = time.time() + timeout * settings.CATALOG_CACHE_EARLY_REFRESH
+        cache.set_many(
+            {key: {'value': value, 'refresh_at': refresh_at} for key, value in values.items()},
+            timeout
+        )
+
+    @staticmethod
+    def record_metric(name, event):
+        """
+        Count a cache event. Each process adds up its own counts and adds
+        them to the shared cache counters at most every
+        CATALOG_CACHE_METRICS_INTERVAL seconds, so a cache hit does not
+        cost extra cache round trips.
+        """
+        metric_key = f'{METRICS_KEY_PREFIX}:{name}:{event}'
+        with CatalogCacheService._metrics_lock:
+            pending = CatalogCacheService._pending_metrics
+            pending[metric_key] = pending.get(metric_key, 0) + 1
+            now = time.monotonic()
+            if now - CatalogCacheService._metrics_flushed_at < settings.CATALOG_CACHE_METRICS_INTERVAL:
+                return
+            CatalogCacheService._pending_metrics = {}
+            CatalogCacheService._metrics_flushed_at = now
+        CatalogCacheService.flush_metrics(pending)
+
+    @staticmethod
+    def flush_metrics(pending):
+        """
+        Add counts to the shared counters
+
+        Args:
+            pending (dict): metric key -> count
+        """
+        for metric_key, count in pending.items():
+            # add() is a no-op when the counter exists, incr() is atomic
+            cache.add(metric_key, 0, None)
+            try:
+                cache.incr(metric_key, count)
+            except ValueError:
+                # Evicted between add() and incr()
+                pass
+
+    @staticmethod
+    def get_metrics(names):
+        """
+        Get the recorded cache events for the given metric names
+
+        Returns:
+            dict: {name: {event: count}}
+        """
+        metric_keys = {
+            (name, event): f'{METRICS_KEY_PREFIX}:{name}:{event}'
+            for name in names
+            for event in METRIC_EVENTS
+        }
+        counts = cache.get_many(metric_keys.values())
+        metrics = {name: {} for name in names}
+        for (name, event), metric_key in metric_keys.items():
+            metrics[name][event] = counts.get(metric_key, 0)
+        return metrics
+
+    @staticmethod
+    def purge(keys):
+        """
+        Delete the given cache keys once the current transaction commits,
+        so a concurrent request cannot re-cache the old rows in between
+        """
+        keys = list(dict.fromkeys(keys))
+        if keys:
+            def delete():
+                cache.delete_many(keys)
+                if settings.DATABASE_REPLICAS:
+                    cache.set(RECENT_PURGE_KEY, 1, settings.DATABASE_REPLICA_PIN_SECONDS)
+            transaction.on_commit(delete)
+        return keys
+
+    @staticmethod
+    def invalidate_phone(phone, previous_brand=None):
+        """
+        Purge the payloads that show this phone: its own detail page, the
+        detail pages of same-brand phones (related products) and the lists
+
+        Args:
+            previous_brand (str, optional): The brand the phone had before
+                this save, whose detail pages listed it too
+        """
+        brands = {phone.brand, previous_brand} - {None}
+        return CatalogCacheService.invalidate_brands(brands, extra_slugs=[phone.slug])
+
+    @staticmethod
+    def invalidate_brands(brands, extra_slugs=()):
+        """
+        Purge the detail pages of every phone of the given brands and the lists,
+        e.g. after a bulk import that bypassed the model signals
+        """
+        slugs = Phones.objects.filter(brand__in=brands).values_list('slug', flat=True)
+        keys = [CatalogCacheService.phone_detail_key(slug) for slug in slugs]
+        keys.extend(CatalogCacheService.phone_detail_key(slug) for slug in extra_slugs)
+        keys.extend(PRODUCT_LIST_KEYS)
+        return CatalogCacheService.purge(keys)
+
+    @staticmethod
+    def invalidate_phone_variant(variant):
+        """
+        Purge the payloads that show this variant
+        """
+        try:
+            phone = variant.phone
+        except Phones.DoesNotExist:
+            # Deleted together with its phone, which purges the same keys
+            return []
+        return CatalogCacheService.invalidate_phone(phone)
+
+    @staticmethod
+    def invalidate_accessory(accessory, related_changed=()):
+        """
+        Purge the payloads that show this accessory: its detail page, the
+        detail pages listing it as a related product and the lists
+
+        Args:
+            related_changed (iterable, optional): Ids of accessories whose
+                related products changed with it, e.g. the ones that no
+                longer list it, see RelatedProductService.refresh_for_accessory
+        """
+        owner_ids = set(related_changed)
+        owner_ids.update(RelatedAccessory.objects.filter(related_id=accessory.id).values_list('accessory_id', flat=True))
+        slugs = Accessory.objects.filter(id__in=owner_ids).values_list('slug', flat=True)
+        keys = [CatalogCacheService.accessory_detail_key(slug) for slug in [accessory.slug, *slugs]]
+        keys.extend(PRODUCT_LIST_KEYS)
+        return CatalogCacheService.purge(keys)
+
+    @staticmethod
+    def invalidate_accessories(extra_slugs=()):
+        """
+        Purge every accessory detail page and the lists
+        """
+        slugs = Accessory.objects.values_list('slug', flat=True)
+        keys = [CatalogCacheService.accessory_detail_key(slug) for slug in slugs]
+        keys.extend(CatalogCacheService.accessory_detail_key(slug) for slug in extra_slugs)
+        keys.extend(PRODUCT_LIST_KEYS)
+        return CatalogCacheService.purge(keys)
+
+    @staticmethod
+    def invalidate_flash_deals():
+        """
+        Purge the payloads that show flash deals
+        """
+        return CatalogCacheService.purge(FLASH_DEAL_KEYS)
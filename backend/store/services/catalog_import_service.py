@@ -0,0 +1,240 @@
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils.text import slugify
+from ..models import Phones, PhoneVariant, Accessory, StripeSyncTask
+from .cache_service import CatalogCacheService
+from .search_service import SearchService
+from .facet_service import FacetService
+from .related_product_service import RelatedProductService
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+
+class CatalogImportError(ValueError):
+    pass
+
+
+class CatalogImportService:
+    """
+    Upserts catalog rows in bulk. Phones are identified by the slug of their
+    brand and name, variants by SKU (or by phone, colour and storage when the
+    row has no SKU) and accessories by slug.
+    """
+    @staticmethod
+    def parse_bool(value, default):
+        if value is None or value == '':
+            return default
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in TRUE_VALUES
+
+    @staticmethod
+    def parse_row(row):
+        """
+        Normalize a CSV/JSONL row
+
+        Raises:
+            CatalogImportError: If the row is missing required values
+        """
+        product_type = (row.get('type') or '').strip().lower()
+        if product_type not in ('phone', 'accessory'):
+            raise CatalogImportError(f"type must be 'phone' or 'accessory', got {row.get('type')!r}")
+
+        required = ['name', 'price']
+        if product_type == 'phone':
+            required += ['brand', 'color', 'storage']
+        missing = [field for field in required if not str(row.get(field) or '').strip()]
+        if missing:
+            raise CatalogImportError(f"missing {', '.join(missing)}")
+
+        try:
+            price = Decimal(str(row['price'])).quantize(Decimal('0.01'))
+            stock = int(row.get('stock') or 0)
+        except (InvalidOperation, ValueError) as e:
+            raise CatalogImportError(f"invalid price or stock: {e}")
+
+        parsed = {
+            'type': product_type,
+            'name': str(row['name']).strip(),
+            'description': row.get('description') or None,
+            'price': price,
+            'stock': stock,
+            'is_active': CatalogImportService.parse_bool(row.get('is_active'), True),
+            'is_new_arrival': CatalogImportService.parse_bool(row.get('is_new_arrival'), False),
+            'is_best_seller': CatalogImportService.parse_bool(row.get('is_best_seller'), False),
+        }
+        if product_type == 'phone':
+            parsed.update({
+                'brand': str(row['brand']).strip(),
+                'color': str(row['color']).strip(),
+                'storage': str(row['storage']).strip(),
+                'sku': (row.get('sku') or '').strip() or None,
+            })
+        else:
+            parsed['slug'] = (row.get('slug') or '').strip() or slugify(parsed['name'])
+        return parsed
+
+    @staticmethod
+    def import_chunk(rows):
+        """
+        Upsert one chunk of parsed rows in a single transaction
+
+        Stripe products and prices are not created here; the new objects are
+        queued for the Stripe outbox worker instead.
+
+        Returns:
+            dict: Number of phones, variants and accessories written, and the
+                brands touched. bulk_create does not send post_save, so pass the
+                brands to invalidate_caches once the import is done.
+        """
+        phone_rows = [row for row in rows if row['type'] == 'phone']
+        accessory_rows = [row for row in rows if row['type'] == 'accessory']
+
+        with transaction.atomic():
+            summary = {'phones': 0, 'variants': 0, 'accessories': 0, 'brands': set()}
+            if phone_rows:
+                brands, phones, variant_count = CatalogImportService.import_phone_rows(phone_rows)
+                summary['brands'] = brands
+                summary['phones'] = phones
+                summary['variants'] = variant_count
+            if accessory_rows:
+                summary['accessories'] = CatalogImportService.import_accessory_rows(accessory_rows)
+        return summary
+
+    @staticmethod
+    def import_phone_rows(rows):
+        # One phone per brand + name; later rows win
+        phones_by_slug = {}
+        for row in rows:
+            slug = slugify(f"{row['brand']}-{row['name']}")
+            row['phone_slug'] = slug
+            phone = phones_by_slug.setdefault(slug, Phones(slug=slug, brand=row['brand'], name=row['name']))
+            if row['description']:
+                phone.description = row['description']
+
+        existing_descriptions = dict(
+            Phones.objects.filter(slug__in=phones_by_slug.keys()).values_list('slug', 'description')
+        )
+        for slug, phone in phones_by_slug.items():
+            if phone.description is None and slug in existing_descriptions:
+                phone.description = existing_descriptions[slug]
+
+        Phones.objects.bulk_create(
+            phones_by_slug.values(),
+            update_conflicts=True,
+            unique_fields=['slug'],
+            update_fields=['name', 'brand', 'description', 'updatedAt']
+        )
+        phones = {
+            phone.slug: phone
+            for phone in Phones.objects.filter(slug__in=phones_by_slug.keys())
+        }
+
+        # Reuse the SKU of an existing variant with the same colour and storage
+        existing_skus = {
+            (variant['phone_id'], variant['color'], variant['storage']): variant['sku']
+            for variant in PhoneVariant.objects.filter(
+                phone_id__in=[phone.id for phone in phones.values()]
+            ).values('phone_id', 'color', 'storage', 'sku')
+        }
+
+        variants_by_sku = {}
+        for row in rows:
+            phone = phones[row['phone_slug']]
+            sku = row['sku'] or existing_skus.get((phone.id, row['color'], row['storage']))
+            if sku is None:
+                sku = PhoneVariant.build_sku(phone, row['color'], row['storage'])
+                existing_skus[(phone.id, row['color'], row['storage'])] = sku
+            variants_by_sku[sku] = PhoneVariant(
+                phone=phone,
+                sku=sku,
+                color=row['color'],
+                storage=row['storage'],
+                price=row['price'],
+                stock=row['stock'],
+                is_active=row['is_active'],
+                is_new_arrival=row['is_new_arrival'],
+                is_best_seller=row['is_best_seller']
+            )
+
+        PhoneVariant.objects.bulk_create(
+            variants_by_sku.values(),
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=[
+                'phone', 'color', 'storage', 'price', 'stock', 'is_active',
+                'is_new_arrival', 'is_best_seller', 'updatedAt'
+            ]
+        )
+
+        # bulk_create does not send post_save
+        SearchService.update_phone_variants(PhoneVariant.objects.filter(sku__in=variants_by_sku.keys()))
+
+        StripeSyncTask.enqueue_many(
+            StripeSyncTask.PHONE_PRODUCT,
+            Phones.objects.filter(slug__in=phones.keys(), stripe_id__isnull=True).values_list('id', flat=True)
+        )
+        StripeSyncTask.enqueue_many(
+            StripeSyncTask.VARIANT_PRICE,
+            PhoneVariant.objects.filter(
+                sku__in=variants_by_sku.keys(),
+                stripe_price_id__isnull=True
+            ).values_list('id', flat=True)
+        )
+        brands = {phone.brand for phone in phones.values()}
+        return brands, len(phones), len(variants_by_sku)
+
+    @staticmethod
+    def import_accessory_rows(rows):
+        accessories_by_slug = {}
+        for row in rows:
+            accessories_by_slug[row['slug']] = Accessory(
+                slug=row['slug'],
+                name=row['name'],
+                description=row['description'],
+                price=row['price'],
+                stock=row['stock'],
+                is_active=row['is_active'],
+                is_new_arrival=row['is_new_arrival'],
+                is_best_seller=row['is_best_seller']
+            )
+
+        Accessory.objects.bulk_create(
+            accessories_by_slug.values(),
+            update_conflicts=True,
+            unique_fields=['slug'],
+            update_fields=[
+                'name', 'description', 'price', 'stock', 'is_active',
+                'is_new_arrival', 'is_best_seller', 'updatedAt'
+            ]
+        )
+
+        SearchService.update_accessories(Accessory.objects.filter(slug__in=accessories_by_slug.keys()))
+
+        StripeSyncTask.enqueue_many(
+            StripeSyncTask.ACCESSORY_PRODUCT,
+            Accessory.objects.filter(
+                slug__in=accessories_by_slug.keys(),
+                stripe_price_id__isnull=True
+            ).values_list('id', flat=True)
+        )
+        return len(accessories_by_slug)
+
+    @staticmethod
+    def invalidate_caches(brands, accessories):
+        """
+        Refresh the related products and purge the cached payloads affected
+        by an import
+        
+        Args:
+            brands (set): Phone brands that were imported
+            accessories (bool): Whether any accessories were imported
+        """
+        if brands:
+            RelatedProductService.refresh_brands(brands)
+            CatalogCacheService.invalidate_brands(brands)
+            FacetService.record_changes('phone')
+        if accessories:
+            RelatedProductService.rebuild_accessories()
+            CatalogCacheService.invalidate_accessories()
+            FacetService.record_changes('accessory')
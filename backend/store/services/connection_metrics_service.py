@@ -0,0 +1,83 @@
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+
+CONNECTION_METRICS_KEY_PREFIX = 'db_connection_metrics'
+# connections: connections opened or taken from the pool
+# wait_us: total time spent getting them, in microseconds
+# slow: connections that took longer than SLOW_CONNECTION_SECONDS
+CONNECTION_METRIC_EVENTS = ('connections', 'wait_us', 'slow')
+SLOW_CONNECTION_SECONDS = 0.1
+
+# [seconds] spent getting connections by the current request, including in
+# the threads it runs queries on; set by DatabaseTimingMiddleware
+request_connect_time = ContextVar('request_connect_time', default=None)
+
+
+class ConnectionMetricsService:
+    """
+    Counts how long getting database connections takes, across processes.
+
+    Each process adds up its own numbers and adds them to the shared cache
+    counters at most every DB_CONNECTION_METRICS_INTERVAL seconds, so
+    recording a connection does not cost a cache round trip.
+    """
+    _lock = threading.Lock()
+    _pending = {}
+    _flushed_at = time.monotonic()
+
+    @staticmethod
+    def record(alias, seconds):
+        request_time = request_connect_time.get()
+        if request_time is not None:
+            request_time[0] += seconds
+        with ConnectionMetricsService._lock:
+            counts = ConnectionMetricsService._pending.setdefault(
+                alias, dict.fromkeys(CONNECTION_METRIC_EVENTS, 0)
+            )
+            counts['connections'] += 1
+            counts['wait_us'] += round(seconds * 1_000_000)
+            counts['slow'] += seconds > SLOW_CONNECTION_SECONDS
+            now = time.monotonic()
+            if now - ConnectionMetricsService._flushed_at < settings.DB_CONNECTION_METRICS_INTERVAL:
+                return
+            pending = ConnectionMetricsService._pending
+            ConnectionMetricsService._pending = {}
+            ConnectionMetricsService._flushed_at = now
+        ConnectionMetricsService.flush(pending)
+
+    @staticmethod
+    def flush(pending):
+        for alias, counts in pending.items():
+            for event, count in counts.items():
+                if not count:
+                    continue
+                metric_key = f'{CONNECTION_METRICS_KEY_PREFIX}:{alias}:{event}'
+                # add() is a no-op when the counter exists, incr() is atomic
+                cache.add(metric_key, 0, None)
+                try:
+                    cache.incr(metric_key, count)
+                except ValueError:
+                    # Evicted between add() and incr()
+                    pass
+
+    @staticmethod
+    def get_metrics(aliases):
+        """
+        Get the recorded connection counts for the given database aliases
+
+        Returns:
+            dict: {alias: {'connections', 'wait_us', 'slow'}}
+        """
+        metric_keys = {
+            (alias, event): f'{CONNECTION_METRICS_KEY_PREFIX}:{alias}:{event}'
+            for alias in aliases
+            for event in CONNECTION_METRIC_EVENTS
+        }
+        counts = cache.get_many(metric_keys.values())
+        metrics = {alias: {} for alias in aliases}
+        for (alias, event), metric_key in metric_keys.items():
+            metrics[alias][event] = counts.get(metric_key, 0)
+        return metrics
@@ -0,0 +1,409 @@
+import bisect
+import random
+import threading
+import time
+from array import array
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from ..models import PhoneVariant, Accessory
+
+FACETS_VERSION_KEY = 'catalog_facets:version'
+FACETS_CHANGE_KEY_PREFIX = 'catalog_facets:change'
+# How long a change stays readable by processes that have not synced yet
+FACETS_CHANGE_TIMEOUT = 60 * 60 * 24
+# Processes further behind than this rebuild their snapshot instead
+MAX_PENDING_CHANGES = 500
+# Changes touching more rows are applied as a rebuild
+MAX_CHANGE_IDS = 1000
+
+
+def price_bucket(price):
+    """
+    Label of the CATALOG_FACET_PRICE_BUCKETS bucket a price falls in,
+    e.g. '250-500' or '1500+'
+    """
+    edges = settings.CATALOG_FACET_PRICE_BUCKETS
+    index = bisect.bisect_right(edges, price) - 1
+    if index < 0:
+        return f'0-{edges[0]}'
+    if index == len(edges) - 1:
+        return f'{edges[-1]}+'
+    return f'{edges[index]}-{edges[index + 1]}'
+
+
+def price_bucket_labels():
+    edges = settings.CATALOG_FACET_PRICE_BUCKETS
+    labels = [f'0-{edges[0]}'] if edges[0] > 0 else []
+    labels += [f'{low}-{high}' for low, high in zip(edges, edges[1:])]
+    return labels + [f'{edges[-1]}+']
+
+
+class FacetIndex:
+    """
+    Snapshot of the facet values of one product type.
+
+    Rows are stored in slots in id order: `ids` holds the id of each slot
+    and `codes[facet]` the code of its value. For each facet value there is
+    a bitmap, a Python int with bit i set when slot i is active and has that
+    value, and `active` has the bits of all active rows. Filtering and
+    counting are then ANDs and bit_count() over machine words.
+    """
+    __slots__ = ('facets', 'ids', 'codes', 'values', 'value_codes', 'bitmaps', 'active', 'ordered', 'totals')
+
+    def __init__(self, facets, ordered_values=None):
+        """
+        Args:
+            facets (tuple): Facet names, in the order of each row's values
+            ordered_values (dict, optional): facet -> all its values, in the
+                order counts are reported in. Other facets are reported
+                sorted by value.
+        """
+        self.facets = facets
+        self.ids = array('q')
+        self.codes = {facet: array('I') for facet in facets}
+        self.values = {facet: [] for facet in facets}
+        self.value_codes = {facet: {} for facet in facets}
+        self.bitmaps = {facet: [] for facet in facets}
+        self.active = 0
+        # Unfiltered counts per facet value, until the next change
+        self.totals = None
+        self.ordered = set()
+        for facet, values in (ordered_values or {}).items():
+            self.ordered.add(facet)
+            for value in values:
+                self._get_code(facet, value)
+
+    @classmethod
+    def build(cls, facets, rows, ordered_values=None):
+        """
+        Build an index from (id, is_active, values) rows sorted by id
+        """
+        index = cls(facets, ordered_values)
+        slots_by_code = {facet: {} for facet in facets}
+        active_slots = []
+        for slot, (product_id, is_active, values) in enumerate(rows):
+            index.ids.append(product_id)
+            if is_active:
+                active_slots.append(slot)
+            for facet, value in zip(facets, values):
+                code = index._get_code(facet, value)
+                index.codes[facet].append(code)
+                if is_active:
+                    slots_by_code[facet].setdefault(code, []).append(slot)
+
+        # Setting bits one at a time on an int copies it each time, so each
+        # bitmap is filled in a bytearray and converted once
+        size = len(index.ids)
+        index.active = cls._bitmap(active_slots, size)
+        for facet in facets:
+            for code, slots in slots_by_code[facet].items():
+                index.bitmaps[facet][code] = cls._bitmap(slots, size)
+        return index
+
+    @staticmethod
+    def _bitmap(slots, size):
+        buffer = bytearray(size // 8 + 1)
+        for slot in slots:
+            buffer[slot >> 3] |= 1 << (slot & 7)
+        return int.from_bytes(buffer, 'little')
+
+    def _get_code(self, facet, value):
+        value_codes = self.value_codes[facet]
+        code = value_codes.get(value)
+        if code is None:
+            code = value_codes[value] = len(self.values[facet])
+            self.values[facet].append(value)
+            self.bitmaps[facet].append(0)
+        return code
+
+    def get_slot(self, product_id):
+        slot = bisect.bisect_left(self.ids, product_id)
+        if slot < len(self.ids) and self.ids[slot] == product_id:
+            return slot
+        return None
+
+    def set_row(self, product_id, is_active, values):
+        """
+        Add or update a row
+
+        Returns:
+            bool: False if the row is new but its id is lower than the last
+                one, so it cannot be added in id order
+        """
+        slot = self.get_slot(product_id)
+        is_new = slot is None
+        if is_new:
+            if self.ids and product_id < self.ids[-1]:
+                return False
+            slot = len(self.ids)
+            self.ids.append(product_id)
+        else:
+            self._clear_slot(slot)
+        self.totals = None
+        bit = 1 << slot
+        for facet, value in zip(self.facets, values):
+            code = self._get_code(facet, value)
+            if is_new:
+                self.codes[facet].append(code)
+            else:
+                self.codes[facet][slot] = code
+            if is_active:
+                self.bitmaps[facet][code] |= bit
+        if is_active:
+            self.active |= bit
+        return True
+
+    def remove_row(self, product_id):
+        slot = self.get_slot(product_id)
+        if slot is not None:
+            self._clear_slot(slot)
+
+    def _clear_slot(self, slot):
+        bit = 1 << slot
+        if self.active & bit:
+            self.totals = None
+            self.active &= ~bit
+            for facet in self.facets:
+                self.bitmaps[facet][self.codes[facet][slot]] &= ~bit
+
+    def query(self, filters):
+        """
+        Args:
+            filters (dict): facet -> set of values. A row matches when, for
+                every facet, its value is one of the given values.
+
+        Returns:
+            tuple: (bitmap of the matching active rows, counts), where
+                counts[facet][value] is the number of matches with that
+                facet's filter replaced by value, so selecting another value
+                shows how many results it would give
+        """
+        masks = {}
+        for facet, selected in filters.items():
+            mask = 0
+            for value in selected:
+                code = self.value_codes[facet].get(value)
+                if code is not None:
+                    mask |= self.bitmaps[facet][code]
+            masks[facet] = mask
+
+        matches = self.active
+        for mask in masks.values():
+            matches &= mask
+
+        if self.totals is None:
+            self.totals = {
+                facet: [bitmap.bit_count() for bitmap in self.bitmaps[facet]]
+                for facet in self.facets
+            }
+
+        counts = {}
+        for facet in self.facets:
+            base = None
+            for other, mask in masks.items():
+                if other != facet:
+                    base = mask if base is None else base & mask
+            if base is None:
+                facet_counts = list(zip(self.values[facet], self.totals[facet]))
+            else:
+                facet_counts = [
+                    (value, (base & bitmap).bit_count() if total else 0)
+                    for value, bitmap, total in zip(self.values[facet], self.bitmaps[facet], self.totals[facet])
+                ]
+            if facet not in self.ordered:
+                # Only values some active row has, sorted
+                facet_counts = sorted(
+                    (value, count) for (value, count), total in zip(facet_counts, self.totals[facet]) if total
+                )
+            counts[facet] = dict(facet_counts)
+        return matches, counts
+
+    def top_ids(self, bitmap, limit):
+        """
+        Ids of the highest slots set in bitmap, i.e. the newest rows first
+        """
+        ids = []
+        while bitmap and len(ids) < limit:
+            slot = bitmap.bit_length() - 1
+            ids.append(self.ids[slot])
+            bitmap ^= 1 << slot
+        return ids
+
+
+class FacetService:
+    """
+    Per-process facet indexes of the catalog, one per product type.
+
+    Model changes are recorded in the shared cache as a version counter
+    plus one entry per change. Before answering a query, each process
+    (at most every CATALOG_FACETS_SYNC_INTERVAL seconds) reloads the rows
+    changed since its snapshot, or rebuilds the snapshot when it is too far
+    behind or a change has been evicted.
+    """
+    FACETS = {
+        'phone': ('brand', 'color', 'storage', 'price'),
+        'accessory': ('price',),
+    }
+
+    _lock = threading.Lock()
+    _indexes = {}
+    _version = None
+    _synced_at = None
+
+    @staticmethod
+    def get_rows(product_type, ids=None):
+        """
+        Yield (id, is_active, values) rows sorted by id, optionally only
+        for the given ids
+        """
+        if product_type == 'phone':
+            queryset = PhoneVariant.objects.values_list(
+                'id', 'is_active', 'phone__brand', 'color', 'storage', 'price'
+            )
+        else:
+            queryset = Accessory.objects.values_list('id', 'is_active', 'price')
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        for product_id, is_active, *values, price in queryset.order_by('id').iterator(chunk_size=5000):
+            yield product_id, is_active, (*values, price_bucket(price))
+
+    @staticmethod
+    def build_index(product_type):
+        return FacetIndex.build(
+            FacetService.FACETS[product_type],
+            FacetService.get_rows(product_type),
+            ordered_values={'price': price_bucket_labels()}
+        )
+
+    @staticmethod
+    def query(product_type, filters, limit=20):
+        """
+        Filter the active products of a type and count the facet values
+
+        Args:
+            product_type (str): 'phone' or 'accessory'
+            filters (dict): facet -> list of values; unknown facets are ignored
+            limit (int): How many ids to return
+
+        Returns:
+            dict: {'count', 'facets': {facet: {value: count}}, 'ids': newest first}
+        """
+        facets = FacetService.FACETS[product_type]
+        filters = {facet: set(values) for facet, values in filters.items() if facet in facets and values}
+        with FacetService._lock:
+            FacetService.sync()
+            index = FacetService._indexes[product_type]
+            matches, counts = index.query(filters)
+            return {
+                'count': matches.bit_count(),
+                'facets': counts,
+                'ids': index.top_ids(matches, limit)
+            }
+
+    @staticmethod
+    def sync():
+        """
+        Bring this process's indexes up to date. Called with the lock held.
+        """
+        now = time.monotonic()
+        if (FacetService._synced_at is not None
+                and now - FacetService._synced_at < settings.CATALOG_FACETS_SYNC_INTERVAL):
+            return
+        FacetService._synced_at = now
+
+        # Read the version before the rows, so changes committed while
+        # building are applied again on the next sync rather than missed
+        version = cache.get(FACETS_VERSION_KEY)
+        if version is None:
+            # Evicted: start a new sequence, so processes rebuild once
+            # instead of on every sync until the next change
+            FacetService.seed_version()
+            version = cache.get(FACETS_VERSION_KEY)
+        current = FacetService._version
+        if FacetService._indexes and version == current:
+            return
+        if (not FacetService._indexes or version is None or current is None
+                or not 0 < version - current <= MAX_PENDING_CHANGES):
+            FacetService.rebuild(version)
+            return
+
+        keys = [f'{FACETS_CHANGE_KEY_PREFIX}:{number}' for number in range(current + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            FacetService.rebuild(version)
+            return
+
+        changed_ids = {product_type: set() for product_type in FacetService.FACETS}
+        for product_type, ids in changes.values():
+            if ids is None:
+                changed_ids[product_type] = None
+            elif changed_ids[product_type] is not None:
+                changed_ids[product_type].update(ids)
+        for product_type, ids in changed_ids.items():
+            if ids is None or not FacetService.apply_changes(product_type, ids):
+                FacetService._indexes[product_type] = FacetService.build_index(product_type)
+        FacetService._version = version
+
+    @staticmethod
+    def seed_version():
+        """
+        Create the version counter if it is missing. A new counter starts at
+        a random number, so processes holding a version of the evicted one
+        see a jump and rebuild, and its change keys do not collide with
+        leftovers of the evicted one.
+        """
+        cache.add(FACETS_VERSION_KEY, random.getrandbits(52), None)
+
+    @staticmethod
+    def rebuild(version):
+        FacetService._indexes = {
+            product_type: FacetService.build_index(product_type)
+            for product_type in FacetService.FACETS
+        }
+        FacetService._version = version
+
+    @staticmethod
+    def apply_changes(product_type, ids):
+        """
+        Reload the given rows into the index
+
+        Returns:
+            bool: False if the index has to be rebuilt instead
+        """
+        index = FacetService._indexes[product_type]
+        found = set()
+        for product_id, is_active, values in FacetService.get_rows(product_type, ids):
+            found.add(product_id)
+            if not index.set_row(product_id, is_active, values):
+                return False
+        for product_id in ids - found:
+            index.remove_row(product_id)
+        return True
+
+    @staticmethod
+    def record_changes(product_type, ids=None):
+        """
+        Tell every process that rows changed, once the current transaction
+        commits
+
+        Args:
+            product_type (str): 'phone' or 'accessory'
+            ids (iterable, optional): Changed ids; None if the changes are
+                unknown or too many, which makes every process rebuild
+        """
+        ids = None if ids is None else list(ids)
+        if ids is not None and len(ids) > MAX_CHANGE_IDS:
+            ids = None
+
+        def publish():
+            FacetService.seed_version()
+            try:
+                version = cache.incr(FACETS_VERSION_KEY)
+            except ValueError:
+                # Evicted; the next sync of every process seeds a new
+                # version and rebuilds
+                return
+            cache.set(f'{FACETS_CHANGE_KEY_PREFIX}:{version}', (product_type, ids), FACETS_CHANGE_TIMEOUT)
+
+        transaction.on_commit(publish)
@@ -0,0 +1,59 @@
+"""
+In-process stand-in for the parts of the Stripe API used by the outbox
+worker, for local development and offline load tests of the sync pipeline.
+Enable it with STRIPE_BACKEND=fake.
+"""
+import itertools
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeStripeError(Exception):
+    pass
+
+
+class _FakeResource:
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
+
+    def create(self, idempotency_key=None, **params):
+        return self.client.create(self.prefix, idempotency_key, params)
+
+
+class FakeStripe:
+    """
+    Mimics stripe.Product.create / stripe.Price.create, including replaying
+    the original object for a repeated idempotency key
+
+    Args:
+        latency (float): Seconds each call sleeps, to model network round trips
+        failure_rate (float): Fraction of calls that raise FakeStripeError
+    """
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.objects = {}
+        self.calls = 0
+        self._idempotent = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.Product = _FakeResource(self, 'prod')
+        self.Price = _FakeResource(self, 'price')
+
+    def create(self, prefix, idempotency_key, params):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if idempotency_key in self._idempotent:
+                return self._idempotent[idempotency_key]
+            if self.failure_rate and random.random() < self.failure_rate:
+                raise FakeStripeError(f"Simulated failure creating {prefix}")
+            obj = SimpleNamespace(id=f"{prefix}_fake_{next(self._ids)}", **params)
+            self.objects[obj.id] = obj
+            if idempotency_key is not None:
+                self._idempotent[idempotency_key] = obj
+            return obj
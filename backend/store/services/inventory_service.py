@@ -0,0 +1,203 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+from ..models import PhoneVariant, Accessory, StockReservation
+from .cache_service import CatalogCacheService
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+class ReservationLimitExceeded(Exception):
+    """
+    The client already holds STOCK_RESERVATION_MAX_HELD_PER_CLIENT
+    """
+
+
+class InventoryService:
+    """
+    Holds stock for carts. A product can still be reserved up to
+    stock - reservedStock; every change to reservedStock is a single
+    conditional UPDATE such as
+
+        UPDATE ... SET reservedStock = reservedStock + n
+        WHERE id = ... AND stock >= reservedStock + n
+
+    so concurrent reservers never oversell, and no row is locked while
+    application code runs: the product row is locked by the last statement
+    of each transaction, until its commit.
+    """
+    MODELS = {
+        StockReservation.PHONE: PhoneVariant,
+        StockReservation.ACCESSORY: Accessory,
+    }
+
+    @staticmethod
+    def get_model(product_type):
+        try:
+            return InventoryService.MODELS[product_type]
+        except KeyError:
+            raise ValueError("product_type must be 'phone' or 'accessory'")
+
+    @staticmethod
+    def reserve(product_type, product_id, quantity, timeout=None, client=''):
+        """
+        Hold stock of an active product
+
+        Args:
+            product_type (str): 'phone' or 'accessory'
+            product_id (int): PhoneVariant or Accessory id
+            quantity (int): How many to hold
+            timeout (int, optional): Seconds until the reservation expires,
+                defaults to STOCK_RESERVATION_TIMEOUT
+            client (str, optional): Who holds it, e.g. 'ip:203.0.113.5'. A
+                client holds at most STOCK_RESERVATION_MAX_HELD_PER_CLIENT
+                at a time; concurrent requests of one client may pass the
+                check together, which the request rate limit bounds.
+
+        Returns:
+            StockReservation: The held reservation
+
+        Raises:
+            InsufficientStock: If the product is inactive, missing or has
+                fewer than quantity available
+            ReservationLimitExceeded: If the client would hold too much
+        """
+        model = InventoryService.get_model(product_type)
+        if quantity < 1:
+            raise ValueError("quantity must be positive")
+        if timeout is None:
+            timeout = settings.STOCK_RESERVATION_TIMEOUT
+
+        now = timezone.now()
+        with transaction.atomic():
+            if client:
+                held = StockReservation.objects.filter(
+                    client=client,
+                    status=StockReservation.HELD,
+                    expires_at__gt=now
+                ).aggregate(total=Sum('quantity'))['total'] or 0
+                if held + quantity > settings.STOCK_RESERVATION_MAX_HELD_PER_CLIENT:
+                    raise ReservationLimitExceeded(f"{client} already holds {held}")
+            reservation = StockReservation.objects.create(
+                product_type=product_type,
+                object_id=product_id,
+                quantity=quantity,
+                client=client,
+                expires_at=now + timedelta(seconds=timeout)
+            )
+            reserved = model.objects.filter(
+                pk=product_id,
+                is_active=True,
+                stock__gte=F('reservedStock') + quantity
+            ).update(reservedStock=F('reservedStock') + quantity)
+            if not reserved:
+                # Rolls back the reservation row
+                raise InsufficientStock(f"Not enough stock to reserve {quantity} of {product_type} {product_id}")
+        return reservation
+
+    @staticmethod
+    def release(reference):
+        """
+        Give held stock back, e.g. when an item leaves the cart
+
+        Returns:
+            bool: False if the reservation is unknown or no longer held
+        """
+        return InventoryService._finish(reference, StockReservation.RELEASED)
+
+    @staticmethod
+    def commit(reference):
+        """
+        Turn held stock into a sale: stock and reservedStock both drop by
+        the reserved quantity
+
+        Returns:
+            bool: False if the reservation is unknown or no longer held, e.g.
+                because it expired
+        """
+        return InventoryService._finish(reference, StockReservation.COMMITTED)
+
+    @staticmethod
+    def _finish(reference, status):
+        reservation = StockReservation.objects.filter(reference=reference).first()
+        if reservation is None or reservation.status != StockReservation.HELD:
+            return False
+
+        model = InventoryService.get_model(reservation.product_type)
+        quantity = reservation.quantity
+        changes = {'reservedStock': F('reservedStock') - quantity}
+        if status == StockReservation.COMMITTED:
+            changes['stock'] = F('stock') - quantity
+            # stock is serialized: a new version drops the cached fragment
+            changes['updatedAt'] = timezone.now()
+        with transaction.atomic():
+            # Only one of commit, release and the sweep gets the reservation
+            claimed = StockReservation.objects.filter(
+                pk=reservation.pk,
+                status=StockReservation.HELD
+            ).update(status=status, updatedAt=timezone.now())
+            if not claimed:
+                return False
+            model.objects.filter(pk=reservation.object_id).update(**changes)
+            if status == StockReservation.COMMITTED:
+                InventoryService.invalidate_product(reservation.product_type, reservation.object_id)
+        return True
+
+    @staticmethod
+    def invalidate_product(product_type, product_id):
+        """
+        Purge the payloads showing a product whose stock changed, once the
+        transaction commits. The UPDATEs here skip the model signals that
+        would; reservedStock is not serialized, so only sales need this.
+        """
+        if product_type == StockReservation.PHONE:
+            variant = PhoneVariant.objects.select_related('phone').filter(pk=product_id).first()
+            if variant is not None:
+                CatalogCacheService.invalidate_phone_variant(variant)
+        else:
+            accessory = Accessory.objects.filter(pk=product_id).first()
+            if accessory is not None:
+                CatalogCacheService.invalidate_accessory(accessory)
+
+    @staticmethod
+    def expire_reservations(batch_size=None):
+        """
+        Release every held reservation past its expiry, batch_size at a
+        time. Each batch is one claim UPDATE plus one UPDATE per product
+        type. Reservations locked by a concurrent commit or release are
+        skipped and left to it.
+
+        Returns:
+            int: How many reservations expired
+        """
+        batch_size = batch_size or settings.STOCK_RESERVATION_SWEEP_BATCH_SIZE
+        now = timezone.now()
+        expired = 0
+        while True:
+            with transaction.atomic():
+                batch = list(StockReservation.objects.select_for_update(skip_locked=True).filter(
+                    status=StockReservation.HELD,
+                    expires_at__lte=now
+                ).order_by('expires_at', 'id').values_list('id', 'product_type', 'object_id', 'quantity')[:batch_size])
+                if not batch:
+                    return expired
+                StockReservation.objects.filter(
+                    id__in=[row[0] for row in batch]
+                ).update(status=StockReservation.EXPIRED, updatedAt=now)
+
+                quantities = defaultdict(lambda: defaultdict(int))
+                for _, product_type, product_id, quantity in batch:
+                    quantities[product_type][product_id] += quantity
+                for product_type, by_product in quantities.items():
+                    InventoryService.get_model(product_type).objects.filter(pk__in=by_product).update(
+                        reservedStock=F('reservedStock') - Case(
+                            *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in by_product.items()],
+                            output_field=IntegerField()
+                        )
+                    )
+            expired += len(batch)
@@ -0,0 +1,81 @@
+from ..serializers import (
+    PhoneSerializer,
+    PhoneVariantSerializer,
+    AccessorySerializer
+)
+from ..fast_serializers import PhoneVariantValuesSerializer, AccessoryValuesSerializer
+from .product_service import ProductService
+from .cache_service import CatalogCacheService
+
+
+class CatalogPayloadService:
+    """
+    Builds the rendered catalog payloads cached by the store views and the
+    cache warmer
+    """
+    @staticmethod
+    def build_new_arrivals(request):
+        new_arrivals = ProductService.get_new_arrivals()
+        return CatalogCacheService.render({
+            'products': CatalogPayloadService.serialize_products(new_arrivals, request)
+        })
+
+    @staticmethod
+    def build_best_sellers(request):
+        best_sellers = ProductService.get_best_sellers()
+        return CatalogCacheService.render({
+            'products': CatalogPayloadService.serialize_products(best_sellers, request)
+        })
+
+    @staticmethod
+    def serialize_products(products, request):
+        """
+        Serialize {'phones', 'accessories'} querysets, phones first, from
+        values() rows through the per-row fragment cache (see
+        store.fast_serializers)
+        """
+        return PhoneVariantValuesSerializer.serialize_cached(
+            products['phones'].values(*PhoneVariantValuesSerializer.columns()),
+            request
+        ) + AccessoryValuesSerializer.serialize_cached(
+            products['accessories'].values(*AccessoryValuesSerializer.columns()),
+            request
+        )
+
+    @staticmethod
+    def build_phone_detail(product_data, request):
+        """
+        Args:
+            product_data (dict): As returned by ProductService.get_phone_details_by_slug
+        """
+        return CatalogCacheService.render({
+            'phone': PhoneSerializer(product_data['phone'], context={'request': request}).data,
+            'variants': PhoneVariantSerializer(
+                product_data['variants'],
+                many=True,
+                context={'request': request}
+            ).data,
+            'related_products': PhoneVariantSerializer(
+                product_data['related_products'],
+                many=True,
+                context={'request': request}
+            ).data
+        })
+
+    @staticmethod
+    def build_accessory_detail(product_data, request):
+        """
+        Args:
+            product_data (dict): As returned by ProductService.get_accessory_details_by_slug
+        """
+        return CatalogCacheService.render({
+            'accessory': AccessorySerializer(
+                product_data['accessory'],
+                context={'request': request}
+            ).data,
+            'related_products': AccessorySerializer(
+                product_data['related_products'],
+                many=True,
+                context={'request': request}
+            ).data
+        })
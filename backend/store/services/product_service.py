@@ -1,5 +1,7 @@
-from django.db.models import Q
-from ..models import PhoneVariant, Accessory, Phones
+from django.db.models import Q, Subquery
+from ..concurrency import run_concurrently
+from ..models import PhoneVariant, Accessory, Phones, RelatedPhoneVariant, RelatedAccessory
+from .related_product_service import RelatedProductService, RELATED_PRODUCTS_LIMIT
 
 class ProductService:
     @staticmethod
@@ -10,12 +12,12 @@ class ProductService:
         phone_new_arrivals = PhoneVariant.objects.filter(
             is_new_arrival=True, 
             is_active=True
-        ).select_related('phone')[:limit]
+        ).select_related('phone').order_by('-createdAt', '-id')[:limit]
         
         accessory_new_arrivals = Accessory.objects.filter(
             is_new_arrival=True, 
             is_active=True
-        )[:limit]
+        ).order_by('-createdAt', '-id')[:limit]
         
         return {
             'phones': phone_new_arrivals,
@@ -30,18 +32,135 @@ class ProductService:
         phone_best_sellers = PhoneVariant.objects.filter(
             is_best_seller=True, 
             is_active=True
-        ).select_related('phone')[:limit]
+        ).select_related('phone').order_by('-createdAt', '-id')[:limit]
         
         accessory_best_sellers = Accessory.objects.filter(
             is_best_seller=True, 
             is_active=True
-        )[:limit]
+        ).order_by('-createdAt', '-id')[:limit]
         
         return {
             'phones': phone_best_sellers,
             'accessories': accessory_best_sellers
         }
     
+    @staticmethod
+    def get_homepage_sections(limit=8):
+        """
+        Get new arrivals and best sellers (both phones and accessories) in
+        one query per model instead of one query per section.
+
+        Each model is fetched with `pk IN (top new arrival ids) OR pk IN (top
+        best seller ids)`, where both subqueries are LIMITed scans of the
+        partial indexes used by get_new_arrivals and get_best_sellers.
+        
+        Returns:
+            dict: {'new_arrivals': {'phones', 'accessories'},
+                   'best_sellers': {'phones', 'accessories'}} with the same
+                   rows and order as get_new_arrivals / get_best_sellers
+        """
+        phones = ProductService.get_homepage_section_rows('phones', limit)
+        accessories = ProductService.get_homepage_section_rows('accessories', limit)
+        return ProductService.group_homepage_sections(phones, accessories)
+
+    @staticmethod
+    def get_homepage_section_rows(product_type, limit=8, fields=None):
+        """
+        The get_homepage_sections query of one model, so callers can run
+        both at the same time
+
+        Args:
+            product_type (str): 'phones' or 'accessories'
+            fields (list, optional): Return values() dicts of these fields,
+                which must include is_new_arrival and is_best_seller,
+                instead of model instances
+
+        Returns:
+            dict: {'new_arrivals', 'best_sellers'}
+        """
+        if product_type == 'phones':
+            return ProductService._get_section_rows(PhoneVariant.objects.select_related('phone'), limit, fields)
+        return ProductService._get_section_rows(Accessory.objects.all(), limit, fields)
+
+    @staticmethod
+    def group_homepage_sections(phones, accessories):
+        """
+        Combine get_homepage_section_rows results as get_homepage_sections returns them
+        """
+        return {
+            'new_arrivals': {
+                'phones': phones['new_arrivals'],
+                'accessories': accessories['new_arrivals']
+            },
+            'best_sellers': {
+                'phones': phones['best_sellers'],
+                'accessories': accessories['best_sellers']
+            }
+        }
+
+    @staticmethod
+    def _get_section_rows(queryset, limit, fields=None):
+        model = queryset.model
+        ordering = ('-createdAt', '-id')
+        new_ids = model.objects.filter(
+            is_new_arrival=True,
+            is_active=True
+        ).order_by(*ordering).values('id')[:limit]
+        best_ids = model.objects.filter(
+            is_best_seller=True,
+            is_active=True
+        ).order_by(*ordering).values('id')[:limit]
+        rows = queryset.filter(
+            Q(pk__in=Subquery(new_ids)) | Q(pk__in=Subquery(best_ids))
+        ).order_by(*ordering)
+        if fields is None:
+            rows, flag = list(rows), getattr
+        else:
+            rows, flag = list(rows.values(*fields)), dict.__getitem__
+        # A row outside a section's top `limit` can only be here through the
+        # other section, and it sorts after that section's top `limit` rows
+        return {
+            'new_arrivals': [row for row in rows if flag(row, 'is_new_arrival')][:limit],
+            'best_sellers': [row for row in rows if flag(row, 'is_best_seller')][:limit]
+        }
+
+    @staticmethod
+    def get_phone_variants(brand=None, active=True, min_price=None, max_price=None):
+        """
+        Get phone variants for the catalog listing, unordered
+        
+        Args:
+            brand (str, optional): Only variants of phones of this brand
+            active (bool, optional): Only active (True) or inactive (False)
+                variants; None for both
+            min_price (Decimal, optional): Lowest price
+            max_price (Decimal, optional): Highest price
+        """
+        variants = ProductService._filter_listing(
+            PhoneVariant.objects.select_related('phone'),
+            active, min_price, max_price
+        )
+        if brand:
+            variants = variants.filter(phone__brand__iexact=brand)
+        return variants
+
+    @staticmethod
+    def get_accessories(active=True, min_price=None, max_price=None):
+        """
+        Get accessories for the catalog listing, unordered
+        """
+        return ProductService._filter_listing(Accessory.objects.all(), active, min_price, max_price)
+
+    @staticmethod
+    def _filter_listing(queryset, active, min_price, max_price):
+        if active is not None:
+            queryset = queryset.filter(is_active=active)
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+        return queryset
+
     @staticmethod
     def get_phone_by_slug(slug):
         """
@@ -49,7 +168,10 @@ class ProductService:
         """
         try:
             phone = Phones.objects.get(slug=slug)
-            variants = PhoneVariant.objects.filter(phone=phone, is_active=True)
+            variants = PhoneVariant.objects.filter(
+                phone=phone,
+                is_active=True
+            ).select_related('phone').order_by('id')
             return phone, variants
         except Phones.DoesNotExist:
             return None, None
@@ -65,20 +187,157 @@ class ProductService:
             return None
     
     @staticmethod
-    def get_related_products(product, limit=4):
+    def get_phone_details_by_slug(slug, concurrent=False):
+        """
+        Get a phone with its active variants and related products,
+        or None if the phone does not exist or has no active variants
+
+        Args:
+            concurrent (bool): Fetch the variants and related products at
+                the same time, see store.concurrency
+        """
+        phone, variants = ProductService.get_phone_by_slug(slug)
+        if concurrent and phone is not None:
+            variants, related_products = run_concurrently(
+                lambda: list(variants),
+                lambda: ProductService.get_related_products(phone)
+            )
+            if not variants:
+                return None
+            return {
+                'phone': phone,
+                'variants': variants,
+                'related_products': related_products
+            }
+        if phone is None or not variants:
+            return None
+        return {
+            'phone': phone,
+            'variants': variants,
+            'related_products': ProductService.get_related_products(phone)
+        }
+
+    @staticmethod
+    def get_accessory_details_by_slug(slug):
+        """
+        Get an active accessory with its related products, or None
+        """
+        accessory = ProductService.get_accessory_by_slug(slug)
+        if accessory is None:
+            return None
+        return {
+            'accessory': accessory,
+            'related_products': ProductService.get_related_products(accessory)
+        }
+
+    @staticmethod
+    def get_phone_details_by_slugs(slugs, related_limit=RELATED_PRODUCTS_LIMIT):
+        """
+        Bulk version of get_phone_details_by_slug using a fixed number of
+        queries for any number of slugs (plus one per phone whose related
+        products have not been computed yet)
+        
+        Returns:
+            dict: slug -> details, only for phones with active variants
+        """
+        phones = {phone.id: phone for phone in Phones.objects.filter(slug__in=slugs)}
+        if not phones:
+            return {}
+
+        variants_by_phone = {}
+        variants = PhoneVariant.objects.filter(
+            phone_id__in=phones.keys(),
+            is_active=True
+        ).select_related('phone').order_by('id')
+        for variant in variants:
+            variants_by_phone.setdefault(variant.phone_id, []).append(variant)
+        if not variants_by_phone:
+            return {}
+
+        related = ProductService._get_related_lists(
+            RelatedPhoneVariant.objects.filter(
+                phone_id__in=variants_by_phone.keys(),
+                variant__is_active=True
+            ).select_related('variant__phone'),
+            'phone_id', 'variant', related_limit
+        )
+
+        details = {}
+        for phone_id, phone_variants in variants_by_phone.items():
+            phone = phones[phone_id]
+            details[phone.slug] = {
+                'phone': phone,
+                'variants': phone_variants,
+                'related_products': related.get(phone_id) or ProductService.get_related_products(phone, related_limit)
+            }
+        return details
+
+    @staticmethod
+    def get_accessory_details_by_slugs(slugs, related_limit=RELATED_PRODUCTS_LIMIT):
+        """
+        Bulk version of get_accessory_details_by_slug using two queries for
+        any number of slugs (plus some per accessory whose related products
+        have not been computed yet)
+        
+        Returns:
+            dict: slug -> details, only for active accessories
+        """
+        accessories = list(Accessory.objects.filter(slug__in=slugs, is_active=True))
+        if not accessories:
+            return {}
+
+        related = ProductService._get_related_lists(
+            RelatedAccessory.objects.filter(
+                accessory_id__in=[accessory.id for accessory in accessories],
+                related__is_active=True
+            ).select_related('related'),
+            'accessory_id', 'related', related_limit
+        )
+        return {
+            accessory.slug: {
+                'accessory': accessory,
+                'related_products': (
+                    related.get(accessory.id) or ProductService.get_related_products(accessory, related_limit)
+                )
+            }
+            for accessory in accessories
+        }
+
+    @staticmethod
+    def _get_related_lists(rows, owner_field, related_field, limit):
+        lists = {}
+        for row in rows.order_by(owner_field, 'rank'):
+            products = lists.setdefault(getattr(row, owner_field), [])
+            if len(products) < limit:
+                products.append(getattr(row, related_field))
+        return lists
+
+    @staticmethod
+    def get_related_products(product, limit=RELATED_PRODUCTS_LIMIT):
         """
-        Get related products based on product type
+        Get the ranked related products of a phone or accessory, see
+        RelatedProductService. Products whose list has not been computed yet
+        (e.g. before rebuild_related_products has run) get it computed on
+        the fly.
         """
         if isinstance(product, Phones):
-            # Get phones of the same brand
-            return PhoneVariant.objects.filter(
-                Q(phone__brand=product.brand) & ~Q(phone=product),
+            related = list(PhoneVariant.objects.filter(
+                related_to_phones__phone=product,
                 is_active=True
-            ).select_related('phone')[:limit]
+            ).select_related('phone').order_by('related_to_phones__rank')[:limit])
+            if not related:
+                ids = RelatedProductService.compute_brand(product.brand).get(product.id, [])[:limit]
+                variants = PhoneVariant.objects.select_related('phone').in_bulk(ids)
+                related = [variants[variant_id] for variant_id in ids]
+            return related
         elif isinstance(product, Accessory):
-            # Get other accessories
-            return Accessory.objects.filter(
-                ~Q(id=product.id),
+            related = list(Accessory.objects.filter(
+                related_to_accessories__accessory=product,
                 is_active=True
-            )[:limit]
+            ).order_by('related_to_accessories__rank')[:limit])
+            if not related:
+                ids = RelatedProductService.compute_accessories([product.id]).get(product.id, [])[:limit]
+                accessories = Accessory.objects.in_bulk(ids)
+                related = [accessories[accessory_id] for accessory_id in ids]
+            return related
         return []
@@ -0,0 +1,250 @@
+import bisect
+from django.db import transaction
+from django.db.models import Q
+from ..models import Phones, PhoneVariant, Accessory, RelatedPhoneVariant, RelatedAccessory
+
+RELATED_PRODUCTS_LIMIT = 4
+
+
+class RelatedProductService:
+    """
+    Maintains the ranked related products read by the detail pages.
+
+    Phones are related to the active variants of other phones of the same
+    brand, ranked by how close their price is to the phone's lowest price,
+    one variant per phone unless there are too few other phones.
+    Accessories are related to their k nearest active accessories by price.
+
+    Changes are applied incrementally: a phone change recomputes its brand
+    and writes only the lists that changed, an accessory change recomputes
+    only the accessories that list it or are within k positions of it in
+    price order (in one dimension, nothing further away can have it among
+    its k nearest).
+    """
+    @staticmethod
+    def rank_phone_variants(phone_id, reference_price, variants, limit=RELATED_PRODUCTS_LIMIT):
+        """
+        Args:
+            phone_id (int): The phone the list is for
+            reference_price (Decimal): The phone's lowest active variant price
+            variants (list): (price, id, phone_id) of the brand's active
+                variants, sorted
+
+        Returns:
+            list: Related variant ids, walking outwards from the reference
+                price and taking the closer side first (ties by id)
+        """
+        left = bisect.bisect_left(variants, (reference_price,)) - 1
+        right = left + 1
+        ranked, seen_phones, extra = [], {phone_id}, []
+        while len(ranked) < limit and (left >= 0 or right < len(variants)):
+            take_left = right >= len(variants) or (
+                left >= 0 and (reference_price - variants[left][0], variants[left][1]) <
+                (variants[right][0] - reference_price, variants[right][1])
+            )
+            if take_left:
+                _, variant_id, variant_phone_id = variants[left]
+                left -= 1
+            else:
+                _, variant_id, variant_phone_id = variants[right]
+                right += 1
+            if variant_phone_id not in seen_phones:
+                seen_phones.add(variant_phone_id)
+                ranked.append(variant_id)
+            elif variant_phone_id != phone_id:
+                extra.append(variant_id)
+        # Fewer other phones than `limit`: fill up with their other variants
+        return (ranked + extra)[:limit]
+
+    @staticmethod
+    def nearest_by_price(rows, position, limit=RELATED_PRODUCTS_LIMIT):
+        """
+        Args:
+            rows (list): (price, id) sorted ascending
+            position (int): Index of the row to find neighbours for
+
+        Returns:
+            list: Ids of the `limit` rows closest in price, walking outwards
+                from the row and taking the closer side first (ties by id),
+                so they are all within `limit` positions of it
+        """
+        price = rows[position][0]
+        left, right = position - 1, position + 1
+        nearest = []
+        while len(nearest) < limit and (left >= 0 or right < len(rows)):
+            take_left = right >= len(rows) or (
+                left >= 0 and (price - rows[left][0], rows[left][1]) < (rows[right][0] - price, rows[right][1])
+            )
+            if take_left:
+                nearest.append(rows[left][1])
+                left -= 1
+            else:
+                nearest.append(rows[right][1])
+                right += 1
+        return nearest
+
+    @staticmethod
+    def compute_brand(brand):
+        """
+        Returns:
+            dict: phone id -> related variant ids, for every phone of the brand
+        """
+        variants = sorted(PhoneVariant.objects.filter(
+            phone__brand=brand,
+            is_active=True
+        ).values_list('price', 'id', 'phone_id'))
+        reference_prices = {}
+        for price, _, phone_id in variants:
+            if phone_id not in reference_prices or price < reference_prices[phone_id]:
+                reference_prices[phone_id] = price
+        return {
+            phone_id: RelatedProductService.rank_phone_variants(
+                phone_id,
+                reference_prices.get(phone_id),
+                variants
+            ) if phone_id in reference_prices else []
+            for phone_id in Phones.objects.filter(brand=brand).values_list('id', flat=True)
+        }
+
+    @staticmethod
+    def refresh_brands(brands):
+        """
+        Recompute the related variants of every phone of the given brands,
+        rewriting only the lists that changed
+        """
+        for brand in set(brands):
+            RelatedProductService.save_lists(
+                RelatedPhoneVariant, 'phone_id', 'variant_id',
+                RelatedProductService.compute_brand(brand)
+            )
+
+    @staticmethod
+    def refresh_for_phone(phone, previous_brand=None):
+        """
+        Recompute after a phone was saved: its brand, its previous brand if
+        it changed, and the brands of the phones listing its variants
+        """
+        brands = set(Phones.objects.filter(
+            related_variants__variant__phone=phone
+        ).values_list('brand', flat=True))
+        brands.add(phone.brand)
+        if previous_brand is not None:
+            brands.add(previous_brand)
+        RelatedProductService.refresh_brands(brands)
+
+    @staticmethod
+    def refresh_for_phone_variant(variant):
+        try:
+            phone = variant.phone
+        except Phones.DoesNotExist:
+            # Deleted together with its phone, which refreshes the brand
+            return
+        RelatedProductService.refresh_brands([phone.brand])
+
+    @staticmethod
+    def price_neighbours(price, accessory_id, limit=RELATED_PRODUCTS_LIMIT):
+        """
+        Returns:
+            list: (price, id) of the `limit` active accessories on each side
+                of (price, accessory_id) in (price, id) order, sorted
+        """
+        accessories = Accessory.objects.filter(is_active=True)
+        below = accessories.filter(
+            Q(price__lt=price) | Q(price=price, id__lt=accessory_id)
+        ).order_by('-price', '-id').values_list('price', 'id')[:limit]
+        above = accessories.filter(
+            Q(price__gt=price) | Q(price=price, id__gt=accessory_id)
+        ).order_by('price', 'id').values_list('price', 'id')[:limit]
+        return sorted(below) + list(above)
+
+    @staticmethod
+    def compute_accessories(accessory_ids):
+        """
+        Returns:
+            dict: accessory id -> related accessory ids
+        """
+        lists = {}
+        accessories = Accessory.objects.filter(id__in=accessory_ids).values_list('id', 'price', 'is_active')
+        for accessory_id, price, is_active in accessories:
+            if not is_active:
+                lists[accessory_id] = []
+                continue
+            rows = RelatedProductService.price_neighbours(price, accessory_id)
+            rows.append((price, accessory_id))
+            rows.sort()
+            lists[accessory_id] = RelatedProductService.nearest_by_price(rows, rows.index((price, accessory_id)))
+        return lists
+
+    @staticmethod
+    def refresh_for_accessory(accessory, deleted=False):
+        """
+        Recompute the accessories affected by a saved or deleted accessory:
+        itself, the ones listing it and the ones within k positions of its
+        price
+
+        Returns:
+            list: Ids of the accessories whose list changed
+        """
+        affected = {row[1] for row in RelatedProductService.price_neighbours(accessory.price, accessory.id)}
+        if not deleted:
+            affected.add(accessory.id)
+            affected.update(RelatedAccessory.objects.filter(related=accessory).values_list('accessory_id', flat=True))
+        return RelatedProductService.save_lists(
+            RelatedAccessory, 'accessory_id', 'related_id',
+            RelatedProductService.compute_accessories(affected)
+        )
+
+    @staticmethod
+    def rebuild():
+        """
+        Recompute every list, e.g. after deploying or a bulk import
+        """
+        brands = Phones.objects.values_list('brand', flat=True).distinct()
+        RelatedProductService.refresh_brands(list(brands))
+        RelatedProductService.rebuild_accessories()
+
+    @staticmethod
+    def rebuild_accessories():
+        rows = sorted(Accessory.objects.filter(is_active=True).values_list('price', 'id'))
+        lists = {
+            accessory_id: RelatedProductService.nearest_by_price(rows, position)
+            for position, (_, accessory_id) in enumerate(rows)
+        }
+        inactive = Accessory.objects.filter(is_active=False).values_list('id', flat=True)
+        lists.update((accessory_id, []) for accessory_id in inactive)
+        RelatedProductService.save_lists(RelatedAccessory, 'accessory_id', 'related_id', lists)
+
+    @staticmethod
+    def save_lists(model, owner_field, related_field, lists, batch_size=1000):
+        """
+        Store the given lists, writing only the owners whose list changed
+
+        Args:
+            model: RelatedPhoneVariant or RelatedAccessory
+            owner_field (str): e.g. 'phone_id'
+            related_field (str): e.g. 'variant_id'
+            lists (dict): owner id -> related ids, best first
+
+        Returns:
+            list: The owners whose list changed
+        """
+        owner_ids = list(lists)
+        written = []
+        for start in range(0, len(owner_ids), batch_size):
+            batch = owner_ids[start:start + batch_size]
+            current = {}
+            rows = model.objects.filter(**{f'{owner_field}__in': batch}).order_by(owner_field, 'rank')
+            for owner_id, related_id in rows.values_list(owner_field, related_field):
+                current.setdefault(owner_id, []).append(related_id)
+            changed = [owner_id for owner_id in batch if current.get(owner_id, []) != lists[owner_id]]
+            if not changed:
+                continue
+            written.extend(changed)
+            with transaction.atomic():
+                model.objects.filter(**{f'{owner_field}__in': changed}).delete()
+                model.objects.bulk_create([
+                    model(**{owner_field: owner_id, related_field: related_id, 'rank': rank})
+                    for owner_id in changed
+                    for rank, related_id in enumerate(lists[owner_id])
+                ])
+        return written
@@ -0,0 +1,129 @@
+import re
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery
+from ..models import Phones, PhoneVariant, Accessory
+
+SEARCH_TERM_RE = re.compile(r'\w+')
+MAX_SEARCH_TERMS = 8
+
+
+class SearchService:
+    """
+    Product search. On PostgreSQL, PhoneVariant.search_vector and
+    Accessory.search_vector are ranked with ts_rank through their GIN
+    indexes; other databases (SQLite in local development) fall back to
+    icontains matching.
+
+    The vectors are refreshed by the store signals and by bulk writers such
+    as the catalog import; rebuild_search_index refreshes all of them.
+    """
+    @staticmethod
+    def is_supported():
+        """
+        Whether the database has full-text search (PostgreSQL)
+        """
+        return connection.vendor == 'postgresql'
+
+    @staticmethod
+    def get_terms(query):
+        return SEARCH_TERM_RE.findall(query.lower())[:MAX_SEARCH_TERMS]
+
+    @staticmethod
+    def phone_variant_vector():
+        config = settings.CATALOG_SEARCH_CONFIG
+        phone = Phones.objects.filter(pk=OuterRef('phone_id'))
+        # Joined columns are not allowed in UPDATE, so the phone's columns
+        # are read with subqueries
+        return (
+            SearchVector(Subquery(phone.values('brand')), weight='A', config=config) +
+            SearchVector(Subquery(phone.values('name')), weight='A', config=config) +
+            SearchVector('color', 'storage', weight='B', config=config) +
+            SearchVector('sku', weight='C', config=config) +
+            SearchVector(Subquery(phone.values('description')), weight='D', config=config)
+        )
+
+    @staticmethod
+    def accessory_vector():
+        config = settings.CATALOG_SEARCH_CONFIG
+        return (
+            SearchVector('name', weight='A', config=config) +
+            SearchVector('description', weight='D', config=config)
+        )
+
+    @staticmethod
+    def update_phone_variants(variants):
+        """
+        Refresh the search vectors of the given phone variants
+
+        Args:
+            variants: A PhoneVariant queryset
+        """
+        if SearchService.is_supported():
+            variants.update(search_vector=SearchService.phone_variant_vector())
+
+    @staticmethod
+    def update_accessories(accessories):
+        """
+        Refresh the search vectors of the given accessories
+
+        Args:
+            accessories: An Accessory queryset
+        """
+        if SearchService.is_supported():
+            accessories.update(search_vector=SearchService.accessory_vector())
+
+    @staticmethod
+    def search(query, limit=20):
+        """
+        Search active phone variants and accessories
+
+        Args:
+            query (str): What the customer typed; every word must match,
+                the last one as a prefix
+            limit (int): Maximum results per product type
+
+        Returns:
+            dict: {'phones': [PhoneVariant], 'accessories': [Accessory]}, best
+                matches first
+        """
+        terms = SearchService.get_terms(query)
+        if not terms:
+            return {'phones': [], 'accessories': []}
+
+        phones = PhoneVariant.objects.filter(is_active=True).select_related('phone')
+        accessories = Accessory.objects.filter(is_active=True)
+        if SearchService.is_supported():
+            # Terms are \w+ words, so they are safe in a raw tsquery
+            search_query = SearchQuery(
+                ' & '.join(terms[:-1] + [f'{terms[-1]}:*']),
+                search_type='raw',
+                config=settings.CATALOG_SEARCH_CONFIG
+            )
+            phones = phones.filter(search_vector=search_query).annotate(
+                rank=SearchRank(F('search_vector'), search_query)
+            ).order_by('-rank', 'id')
+            accessories = accessories.filter(search_vector=search_query).annotate(
+                rank=SearchRank(F('search_vector'), search_query)
+            ).order_by('-rank', 'id')
+        else:
+            phone_fields = ['phone__brand', 'phone__name', 'color', 'storage', 'sku', 'phone__description']
+            accessory_fields = ['name', 'description']
+            for term in terms:
+                phones = phones.filter(SearchService._any_contains(phone_fields, term))
+                accessories = accessories.filter(SearchService._any_contains(accessory_fields, term))
+            phones = phones.order_by('id')
+            accessories = accessories.order_by('id')
+
+        return {
+            'phones': list(phones[:limit]),
+            'accessories': list(accessories[:limit])
+        }
+
+    @staticmethod
+    def _any_contains(fields, term):
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__icontains': term})
+        return condition
@@ -0,0 +1,206 @@
+import logging
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import Phones, PhoneVariant, Accessory, StripeSyncTask
+
+logger = logging.getLogger(__name__)
+
+_fake_stripe = None
+
+
+class StripeNotReady(Exception):
+    """
+    The task depends on another Stripe object that has not been created yet
+    """
+
+
+class StripeDependencyFailed(Exception):
+    """
+    The task depends on a Stripe object whose own task has failed, so it
+    would wait forever
+    """
+
+
+class StripeSyncService:
+    @staticmethod
+    def get_client():
+        """
+        Get the Stripe API client configured by STRIPE_BACKEND
+        """
+        global _fake_stripe
+        if settings.STRIPE_BACKEND == 'fake':
+            if _fake_stripe is None:
+                from .fake_stripe import FakeStripe
+                _fake_stripe = FakeStripe(
+                    latency=settings.STRIPE_FAKE_LATENCY,
+                    failure_rate=settings.STRIPE_FAKE_FAILURE_RATE
+                )
+            return _fake_stripe
+
+        import stripe
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        return stripe
+
+    @staticmethod
+    def claim_batch(batch_size):
+        """
+        Claim up to batch_size due tasks. Claimed tasks are leased by moving
+        next_attempt_at forward, so concurrent workers skip them and a task
+        whose worker died becomes due again once the lease runs out.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            tasks = list(
+                StripeSyncTask.objects.select_for_update(skip_locked=True).filter(
+                    status=StripeSyncTask.PENDING,
+                    next_attempt_at__lte=now
+                ).order_by('next_attempt_at', 'id')[:batch_size]
+            )
+            if tasks:
+                StripeSyncTask.objects.filter(id__in=[task.id for task in tasks]).update(
+                    next_attempt_at=now + timedelta(seconds=settings.STRIPE_SYNC_LEASE_SECONDS)
+                )
+        return tasks
+
+    @staticmethod
+    def process_batch(batch_size=None):
+        """
+        Run one batch of due tasks
+        
+        Returns:
+            dict: Number of tasks that succeeded, were retried and failed
+        """
+        batch_size = batch_size or settings.STRIPE_SYNC_BATCH_SIZE
+        tasks = StripeSyncService.claim_batch(batch_size)
+        # Create products before the prices that reference them
+        tasks.sort(key=lambda task: task.kind == StripeSyncTask.VARIANT_PRICE)
+        client = StripeSyncService.get_client()
+
+        summary = {'done': 0, 'retried': 0, 'failed': 0}
+        for task in tasks:
+            try:
+                StripeSyncService.run_task(client, task)
+            except Exception as e:
+                status = StripeSyncService.schedule_retry(task, e)
+                summary['failed' if status == StripeSyncTask.FAILED else 'retried'] += 1
+            else:
+                StripeSyncTask.objects.filter(id=task.id).update(
+                    status=StripeSyncTask.DONE,
+                    attempts=task.attempts + 1,
+                    last_error='',
+                    updatedAt=timezone.now()
+                )
+                summary['done'] += 1
+        return summary
+
+    @staticmethod
+    def schedule_retry(task, error):
+        """
+        Reschedule a task with exponential backoff, or give up on it after
+        STRIPE_SYNC_MAX_ATTEMPTS, after waiting STRIPE_SYNC_MAX_WAIT on
+        another task, or when that task has failed
+        """
+        attempts = task.attempts + 1
+        gave_up = isinstance(error, StripeDependencyFailed)
+        if isinstance(error, StripeNotReady):
+            # Waiting on another task is not a failed attempt
+            attempts = task.attempts
+            gave_up = timezone.now() - task.createdAt >= timedelta(seconds=settings.STRIPE_SYNC_MAX_WAIT)
+        if gave_up or attempts >= settings.STRIPE_SYNC_MAX_ATTEMPTS:
+            status = StripeSyncTask.FAILED
+            logger.error("Giving up on Stripe sync task %s: %s", task.id, error)
+        else:
+            status = StripeSyncTask.PENDING
+        delay = min(
+            settings.STRIPE_SYNC_BACKOFF_BASE * 2 ** attempts,
+            settings.STRIPE_SYNC_BACKOFF_MAX
+        )
+        delay *= random.uniform(0.5, 1.0)
+        StripeSyncTask.objects.filter(id=task.id).update(
+            status=status,
+            attempts=attempts,
+            next_attempt_at=timezone.now() + timedelta(seconds=delay),
+            last_error=str(error),
+            updatedAt=timezone.now()
+        )
+        return status
+
+    @staticmethod
+    def run_task(client, task):
+        # Each Stripe call gets its own key derived from the task, so a retry
+        # after a timeout returns the object created by the first attempt
+        key = str(task.idempotency_key)
+
+        if task.kind == StripeSyncTask.PHONE_PRODUCT:
+            phone = Phones.objects.filter(id=task.object_id).first()
+            if phone is None or phone.stripe_id:
+                return
+            stripe_product = client.Product.create(
+                name=phone.name,
+                description=phone.description or f"{phone.brand} {phone.name}",
+                metadata={
+                    "brand": phone.brand,
+                    "product_id": str(phone.id),
+                },
+                idempotency_key=f"{key}-product"
+            )
+            Phones.objects.filter(id=phone.id).update(stripe_id=stripe_product.id)
+
+        elif task.kind == StripeSyncTask.VARIANT_PRICE:
+            variant = PhoneVariant.objects.filter(id=task.object_id).select_related('phone').first()
+            if variant is None or variant.stripe_price_id:
+                return
+            if not variant.phone.stripe_id:
+                waiting = StripeSyncTask.objects.filter(
+                    kind=StripeSyncTask.PHONE_PRODUCT,
+                    object_id=variant.phone_id,
+                    status=StripeSyncTask.PENDING
+                ).exists()
+                # Read again in case the product's task finished meanwhile
+                if not waiting and not Phones.objects.filter(id=variant.phone_id).values_list('stripe_id', flat=True).first():
+                    raise StripeDependencyFailed(f"Phone {variant.phone_id} has no Stripe product and no pending task")
+                raise StripeNotReady(f"Phone {variant.phone_id} has no Stripe product yet")
+            stripe_price = client.Price.create(
+                product=variant.phone.stripe_id,
+                unit_amount=int(variant.price * 100),
+                currency='usd',
+                metadata={
+                    'variant_id': str(variant.id),
+                    'sku': variant.sku,
+                    'color': variant.color,
+                    'storage': variant.storage
+                },
+                idempotency_key=f"{key}-price"
+            )
+            PhoneVariant.objects.filter(id=variant.id).update(stripe_price_id=stripe_price.id)
+
+        elif task.kind == StripeSyncTask.ACCESSORY_PRODUCT:
+            accessory = Accessory.objects.filter(id=task.object_id).first()
+            if accessory is None:
+                return
+            if not accessory.stripe_id:
+                stripe_product = client.Product.create(
+                    name=accessory.name,
+                    description=accessory.description or accessory.name,
+                    metadata={
+                        "product_id": str(accessory.id),
+                        "product_type": "accessory"
+                    },
+                    idempotency_key=f"{key}-product"
+                )
+                accessory.stripe_id = stripe_product.id
+                Accessory.objects.filter(id=accessory.id).update(stripe_id=accessory.stripe_id)
+            if not accessory.stripe_price_id:
+                stripe_price = client.Price.create(
+                    product=accessory.stripe_id,
+                    unit_amount=int(accessory.price * 100),
+                    currency='cad',
+                    metadata={
+                        'accessory_id': str(accessory.id)
+                    },
+                    idempotency_key=f"{key}-price"
+                )
+                Accessory.objects.filter(id=accessory.id).update(stripe_price_id=stripe_price.id)
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'store.middleware.DatabaseTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,9 +50,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'store.middleware.ReplicaRoutingMiddleware',
 ]
 
-ROOT_URLCONF = 'store.urls'
+# asgi.py serves store.asgi_urls, with the async homepage and detail views
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'store.urls')
 
 TEMPLATES = [
     {
@@ -76,15 +79,66 @@ WSGI_APPLICATION = 'store.wsgi.application'
 
 DATABASES = {
    'default': {
-       'ENGINE': 'django.db.backends.postgresql',
+       # django.db.backends.postgresql, timing how long getting a connection
+       # takes, see store.middleware.DatabaseTimingMiddleware
+       'ENGINE': 'store.db_backends.postgresql',
        'NAME': os.getenv('DB_NAME'),
        'USER': os.getenv('DB_USER'),
        'PASSWORD': os.getenv('DB_PASSWORD'),
        'HOST': os.getenv('DB_HOST'),
        'PORT': os.getenv('DB_PORT'),
+       # Connections are checked before being reused
+       'CONN_HEALTH_CHECKS': True,
    }
 }
 
+# With DB_POOL_MAX_SIZE set, each worker process takes connections from a
+# psycopg pool of up to that many (needs psycopg[pool]); keep workers x
+# DB_POOL_MAX_SIZE under the server's max_connections. Otherwise each
+# thread keeps its connection open for DB_CONN_MAX_AGE seconds. asgi.py
+# defaults DB_CONN_MAX_AGE to 0, as connections are not reused under ASGI.
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+if DB_POOL_MAX_SIZE:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': min(int(os.getenv('DB_POOL_MIN_SIZE', 2)), DB_POOL_MAX_SIZE),
+            'max_size': DB_POOL_MAX_SIZE,
+            # Seconds to wait for a free connection before failing
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+# Read replicas for public API reads and the cache warmer, as a
+# comma-separated list of host[:port] using the primary's credentials.
+# See store.db_router.
+for number, replica in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['store.db_router.ReplicaRouter']
+
+# How long reads go to the primary after a write: for the client that made
+# it, and for cache rebuilds after a purge. Should exceed the usual
+# replication lag (seconds).
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+
+# Threads per process running the independent queries of the async views
+# at the same time (store.concurrency). Each can hold a connection, so keep
+# it within DB_POOL_MAX_SIZE when pooling.
+CONCURRENT_QUERY_WORKERS = int(os.getenv('CONCURRENT_QUERY_WORKERS', 8))
+
+# How often each process adds its connection wait times to the shared
+# counters read by db_connection_stats (seconds)
+DB_CONNECTION_METRICS_INTERVAL = int(os.getenv('DB_CONNECTION_METRICS_INTERVAL', 10))
+
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
@@ -144,16 +198,108 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_THROTTLE_RATES': {
+        # Stock reservation requests per client
+        'stock_reservations': os.getenv('STOCK_RESERVATION_RATE', '30/min'),
+    },
 }
 
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Shared cache used by every worker. Set REDIS_URL in production so that all
+# gunicorn workers read the same catalog payloads; without it we fall back to
+# the in-process LocMemCache, which is what local development and tests use.
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'store'),
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            # Room for a fragment per product besides the payloads (the
+            # default of 300 would cull them on every list rebuild)
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+# Default lifetime of the cached catalog payloads (seconds). Entries are
+# purged on product and flash deal changes, and payloads containing flash
+# deals expire at the next deal start/end, so this only bounds staleness
+# for changes made outside of save()/delete().
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 60 * 60 * 6))
+
+# Fraction of an entry's lifetime after which one request rebuilds it while
+# the others keep being served the current entry.
+CATALOG_CACHE_EARLY_REFRESH = float(os.getenv('CATALOG_CACHE_EARLY_REFRESH', 0.8))
+
+# Lifetime of the per-row fragments the list payloads are assembled from
+# (seconds). Fragments are keyed by the row's updatedAt, so an edit makes
+# a new key and this only bounds the memory held by unused ones.
+CATALOG_FRAGMENT_CACHE_TIMEOUT = int(os.getenv('CATALOG_FRAGMENT_CACHE_TIMEOUT', CATALOG_CACHE_TIMEOUT))
+
+# How long a rebuild may hold the lock, and how often requests waiting on a
+# missing entry check whether it has been rebuilt (seconds).
+CATALOG_CACHE_LOCK_TIMEOUT = 10
+CATALOG_CACHE_LOCK_POLL_INTERVAL = 0.05
+
+# How often each process adds its cache hit/rebuild counts to the shared
+# counters read by catalog_cache_stats (seconds)
+CATALOG_CACHE_METRICS_INTERVAL = int(os.getenv('CATALOG_CACHE_METRICS_INTERVAL', 10))
+
+# Public origin of the API. The cache warmer builds payloads outside of a
+# request, and absolute media URLs in them use this origin.
+CATALOG_BASE_URL = os.getenv('CATALOG_BASE_URL', 'http://localhost:8000')
+
+# Price buckets of the catalog facets (lower bounds), and how often each
+# process checks the cache for product changes to apply to its facet index
+# (seconds).
+CATALOG_FACET_PRICE_BUCKETS = [0, 100, 250, 500, 750, 1000, 1500]
+CATALOG_FACETS_SYNC_INTERVAL = float(os.getenv('CATALOG_FACETS_SYNC_INTERVAL', 1))
+
+# Text search configuration of the product search vectors. Changing it
+# requires running rebuild_search_index.
+CATALOG_SEARCH_CONFIG = os.getenv('CATALOG_SEARCH_CONFIG', 'english')
+
+# Cart stock reservations (InventoryService): how long they are held
+# (seconds) and the largest quantity one reservation may hold. Expired
+# ones are released by expire_stock_reservations.
+STOCK_RESERVATION_TIMEOUT = int(os.getenv('STOCK_RESERVATION_TIMEOUT', 15 * 60))
+STOCK_RESERVATION_MAX_QUANTITY = 10
+STOCK_RESERVATION_SWEEP_BATCH_SIZE = 1000
+# Total quantity one client (a user, or an IP address for anonymous
+# clients) may hold at a time, so no client can hold a product's whole
+# stock. Reservation requests are also rate limited per client, see
+# REST_FRAMEWORK's 'stock_reservations' throttle rate.
+STOCK_RESERVATION_MAX_HELD_PER_CLIENT = int(os.getenv('STOCK_RESERVATION_MAX_HELD_PER_CLIENT', 20))
 
 
 # Stripe settings
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
+
+# 'stripe' for the real API, 'fake' for the in-process stand-in used for
+# local development and offline load tests of the outbox worker.
+STRIPE_BACKEND = os.getenv('STRIPE_BACKEND', 'stripe')
+
+# Seconds each fake Stripe call takes and the fraction of calls that fail,
+# to load test the outbox worker offline (STRIPE_BACKEND=fake only)
+STRIPE_FAKE_LATENCY = float(os.getenv('STRIPE_FAKE_LATENCY', 0))
+STRIPE_FAKE_FAILURE_RATE = float(os.getenv('STRIPE_FAKE_FAILURE_RATE', 0))
+
+# Outbox worker (process_stripe_outbox). Failed calls are retried with
+# exponential backoff between STRIPE_SYNC_BACKOFF_BASE and
+# STRIPE_SYNC_BACKOFF_MAX seconds. A price waiting on its product's task
+# does not use up attempts, but gives up STRIPE_SYNC_MAX_WAIT seconds after
+# it was queued, or as soon as the product's task has failed.
+STRIPE_SYNC_BATCH_SIZE = 100
+STRIPE_SYNC_LEASE_SECONDS = 300
+STRIPE_SYNC_MAX_ATTEMPTS = 8
+STRIPE_SYNC_BACKOFF_BASE = 5
+STRIPE_SYNC_BACKOFF_MAX = 60 * 60
+STRIPE_SYNC_MAX_WAIT = 60 * 60 * 24
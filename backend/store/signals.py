@@ -0,0 +1,95 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import Phones, PhoneVariant, Accessory, RelatedAccessory
+from .services.cache_service import CatalogCacheService
+from .services.search_service import SearchService
+from .services.facet_service import FacetService
+from .services.related_product_service import RelatedProductService
+
+
+@receiver(pre_save, sender=Phones)
+def phone_saving(sender, instance, **kwargs):
+    # The stored brand, so a phone moving to another brand is also removed
+    # from its old brand's pages
+    instance._previous_brand = Phones.objects.filter(pk=instance.pk).values_list(
+        'brand', flat=True
+    ).first() if instance.pk else None
+
+
+@receiver([post_save, post_delete], sender=Phones)
+def phone_changed(sender, instance, **kwargs):
+    CatalogCacheService.invalidate_phone(instance, getattr(instance, '_previous_brand', None))
+
+
+@receiver([post_save, post_delete], sender=PhoneVariant)
+def phone_variant_changed(sender, instance, **kwargs):
+    CatalogCacheService.invalidate_phone_variant(instance)
+
+
+@receiver(post_save, sender=Phones)
+def phone_saved(sender, instance, **kwargs):
+    # The variants' search vectors include the phone's name, brand and description
+    SearchService.update_phone_variants(PhoneVariant.objects.filter(phone=instance))
+
+
+@receiver(post_save, sender=PhoneVariant)
+def phone_variant_saved(sender, instance, **kwargs):
+    SearchService.update_phone_variants(PhoneVariant.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Accessory)
+def accessory_saved(sender, instance, **kwargs):
+    SearchService.update_accessories(Accessory.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Phones)
+def phone_facets_changed(sender, instance, **kwargs):
+    # Variants are faceted by their phone's brand
+    FacetService.record_changes('phone', instance.variants.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=PhoneVariant)
+def phone_variant_facets_changed(sender, instance, **kwargs):
+    FacetService.record_changes('phone', [instance.id])
+
+
+@receiver([post_save, post_delete], sender=Accessory)
+def accessory_facets_changed(sender, instance, **kwargs):
+    FacetService.record_changes('accessory', [instance.id])
+
+
+@receiver(post_save, sender=Phones)
+def phone_related_products_changed(sender, instance, **kwargs):
+    RelatedProductService.refresh_for_phone(instance, getattr(instance, '_previous_brand', None))
+
+
+@receiver(post_delete, sender=Phones)
+def phone_related_products_deleted(sender, instance, **kwargs):
+    RelatedProductService.refresh_brands([instance.brand])
+
+
+@receiver([post_save, post_delete], sender=PhoneVariant)
+def phone_variant_related_products_changed(sender, instance, **kwargs):
+    RelatedProductService.refresh_for_phone_variant(instance)
+
+
+@receiver(pre_delete, sender=Accessory)
+def accessory_deleting(sender, instance, **kwargs):
+    # The accessories listing it, whose rows are deleted with it
+    instance._listed_by = list(RelatedAccessory.objects.filter(related=instance).values_list(
+        'accessory_id', flat=True
+    ))
+
+
+# The payloads are purged after the related products are refreshed, so the
+# pages of the accessories that list it now or no longer list it are too
+@receiver(post_save, sender=Accessory)
+def accessory_related_products_changed(sender, instance, **kwargs):
+    changed = RelatedProductService.refresh_for_accessory(instance)
+    CatalogCacheService.invalidate_accessory(instance, changed)
+
+
+@receiver(post_delete, sender=Accessory)
+def accessory_related_products_deleted(sender, instance, **kwargs):
+    changed = RelatedProductService.refresh_for_accessory(instance, deleted=True)
+    CatalogCacheService.invalidate_accessory(instance, changed + getattr(instance, '_listed_by', []))
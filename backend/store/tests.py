@@ -0,0 +1,795 @@
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from io import StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.throttling import ScopedRateThrottle
+from .db_router import replica_reads
+from .fast_serializers import PhoneVariantValuesSerializer, AccessoryValuesSerializer
+from .middleware import PRIMARY_PIN_COOKIE, DatabaseTimingMiddleware
+from .models import Phones, PhoneVariant, Accessory, RelatedAccessory, StockReservation, StripeSyncTask
+from .services import stripe_sync_service
+from .services.cache_service import CatalogCacheService, NEW_ARRIVALS_KEY
+from .services.connection_metrics_service import ConnectionMetricsService
+from .services.facet_service import FacetService, FACETS_VERSION_KEY
+from .services.inventory_service import InventoryService, InsufficientStock
+from .services.product_service import ProductService
+from .services.search_service import SearchService
+from .services.stripe_sync_service import StripeSyncService
+from .serializers import PhoneVariantSerializer, AccessorySerializer
+from .utils import build_catalog_request
+
+
+class QueryPlanAssertions:
+    """
+    EXPLAIN checks for PostgreSQL and SQLite
+    """
+    @staticmethod
+    def analyze():
+        # Planner statistics for the seeded rows
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertIndexScan(self, queryset, table, indexes):
+        """
+        Assert the plan reads `table` through one of `indexes` and does not
+        sort
+        """
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+            self.assertNotRegex(plan, r'(?m)^\s*(->\s+)?(Incremental )?Sort ')
+            used = [index for index in indexes if f' {index} ' in f'{plan} ']
+        else:
+            self.assertNotIn('TEMP B-TREE', plan)
+            used = [index for index in indexes if f'{table} USING INDEX {index}' in plan]
+        self.assertTrue(used, f'No index of {indexes} in the plan:\n{plan}')
+
+
+@override_settings(CATALOG_CACHE_LOCK_POLL_INTERVAL=0.01, CATALOG_CACHE_METRICS_INTERVAL=0)
+class CatalogCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        CatalogCacheService._pending_metrics = {}
+
+    def metrics(self):
+        return {event: count for event, count in CatalogCacheService.get_metrics(['test'])['test'].items() if count}
+
+    def test_one_concurrent_builder(self):
+        builds = []
+        barrier = threading.Barrier(10)
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return 'built'
+
+        def get(_):
+            barrier.wait()
+            return CatalogCacheService.get_or_build('test', build, metrics_name='test')
+
+        with ThreadPoolExecutor(10) as executor:
+            values = list(executor.map(get, range(10)))
+        self.assertEqual(values, ['built'] * 10)
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(self.metrics(), {'miss': 1, 'waited': 9})
+
+    @override_settings(CATALOG_CACHE_EARLY_REFRESH=0)
+    def test_early_refresh(self):
+        CatalogCacheService.set('test', 'old', 60)
+
+        # Another request is rebuilding it: served the current entry
+        cache.add('test:lock', 1)
+        self.assertEqual(CatalogCacheService.get_or_build('test', lambda: 'new', metrics_name='test'), 'old')
+        cache.delete('test:lock')
+
+        self.assertEqual(CatalogCacheService.get_or_build('test', lambda: 'new', metrics_name='test'), 'new')
+        self.assertEqual(self.metrics(), {'served_stale': 1, 'early_refresh': 1})
+
+    def test_fresh_entry_is_not_rebuilt(self):
+        CatalogCacheService.set('test', 'cached', 60)
+        self.assertEqual(CatalogCacheService.get_or_build('test', lambda: 'new', metrics_name='test'), 'cached')
+        self.assertEqual(self.metrics(), {'hit': 1})
+
+    @override_settings(CATALOG_CACHE_METRICS_INTERVAL=60)
+    def test_metrics_are_flushed_per_interval(self):
+        CatalogCacheService._metrics_flushed_at = time.monotonic()
+        CatalogCacheService.set('test', 'cached', 60)
+        with mock.patch.object(cache, 'incr', wraps=cache.incr) as incr:
+            for _ in range(5):
+                CatalogCacheService.get_or_build('test', lambda: 'new', metrics_name='test')
+            self.assertEqual(self.metrics(), {})
+            self.assertEqual(incr.call_count, 0)
+
+            CatalogCacheService._metrics_flushed_at -= 60
+            CatalogCacheService.get_or_build('test', lambda: 'new', metrics_name='test')
+        self.assertEqual(self.metrics(), {'hit': 6})
+        self.assertEqual(incr.call_count, 1)
+
+
+class RenderedResponseTests(TestCase):
+    """
+    Cached payloads are served with an ETag of their body, and requests
+    that already have the body get 304 Not Modified
+    """
+    def setUp(self):
+        cache.clear()
+        self.accessory = Accessory.objects.create(name='Case', price=Decimal('20.00'), is_new_arrival=True)
+
+    def test_etag_and_not_modified(self):
+        path = reverse('new_arrivals')
+        first = self.client.get(path)
+        second = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        etag = first['ETag']
+        self.assertEqual(second['ETag'], etag)
+        self.assertEqual(first['Cache-Control'], 'public, no-cache')
+
+        for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+        # A change makes a new body and ETag
+        self.accessory.price = Decimal('25.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.accessory.save()
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class CatalogInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_brand_change_purges_both_brands(self):
+        moved = Phones.objects.create(name='One', brand='Apple')
+        old_neighbour = Phones.objects.create(name='Two', brand='Apple')
+        new_neighbour = Phones.objects.create(name='Three', brand='Samsung')
+        keys = [CatalogCacheService.phone_detail_key(phone.slug) for phone in (moved, old_neighbour, new_neighbour)]
+        cache.set_many({key: 'cached' for key in keys})
+
+        moved.brand = 'Samsung'
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.save()
+
+        self.assertEqual(cache.get_many(keys), {})
+
+
+    def test_accessory_change_purges_affected_pages_only(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            accessories = [
+                Accessory.objects.create(name=f'Accessory {number}', price=Decimal(10 * number))
+                for number in range(1, 21)
+            ]
+        keys = {accessory.id: CatalogCacheService.accessory_detail_key(accessory.slug) for accessory in accessories}
+        listing = lambda accessory: set(RelatedAccessory.objects.filter(related=accessory).values_list('accessory_id', flat=True))
+
+        def purged(change):
+            cache.set_many({key: 'cached' for key in keys.values()})
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            cached = cache.get_many(keys.values())
+            return {accessory_id for accessory_id, key in keys.items() if key not in cached}
+
+        # Moves from between 90 and 110 to between 150 and 160
+        moved = accessories[9]
+        listed_before = listing(moved)
+        moved.price = Decimal('155')
+        affected = purged(moved.save)
+        self.assertTrue({moved.id} | listed_before | listing(moved) <= affected)
+        self.assertNotIn(accessories[0].id, affected)
+        self.assertNotIn(accessories[-1].id, affected)
+
+        deleted = accessories[2]
+        listed_before = listing(deleted)
+        affected = purged(deleted.delete)
+        self.assertTrue(listed_before <= affected)
+        self.assertNotIn(accessories[-1].id, affected)
+
+
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """
+    The catalog list queries use the indexes added for them on a large
+    catalog where few products are flagged
+    """
+    @classmethod
+    def setUpTestData(cls):
+        phones = Phones.objects.bulk_create([
+            Phones(name=f'Phone {number}', slug=f'brand-{number % 50}-phone-{number}', brand=f'Brand {number % 50}')
+            for number in range(2000)
+        ])
+        PhoneVariant.objects.bulk_create([
+            PhoneVariant(
+                phone=phone,
+                sku=f'SKU-{phone.id}-{number}',
+                color='Black',
+                storage=f'{number}GB',
+                price=Decimal(100 + number),
+                is_active=number != 9,
+                is_new_arrival=number == 0 and phone.id % 10 == 0,
+                is_best_seller=number == 1 and phone.id % 10 == 0
+            )
+            for phone in phones
+            for number in range(10)
+        ])
+        Accessory.objects.bulk_create([
+            Accessory(
+                name=f'Accessory {number}',
+                slug=f'accessory-{number}',
+                price=Decimal(10 + number % 90),
+                is_active=number % 10 != 9,
+                is_new_arrival=number % 50 == 0,
+                is_best_seller=number % 50 == 1
+            )
+            for number in range(20000)
+        ])
+        cls.analyze()
+
+    def test_new_arrivals(self):
+        products = ProductService.get_new_arrivals()
+        self.assertIndexScan(
+            products['phones'], 'store_phonevariant',
+            ['variant_new_arrival_idx', 'variant_active_newest_idx']
+        )
+        self.assertIndexScan(
+            products['accessories'], 'store_accessory',
+            ['accessory_new_arrival_idx', 'accessory_active_newest_idx']
+        )
+
+    def test_best_sellers(self):
+        products = ProductService.get_best_sellers()
+        self.assertIndexScan(
+            products['phones'], 'store_phonevariant',
+            ['variant_best_seller_idx', 'variant_active_newest_idx']
+        )
+        self.assertIndexScan(
+            products['accessories'], 'store_accessory',
+            ['accessory_best_seller_idx', 'accessory_active_newest_idx']
+        )
+
+    def test_same_brand_phones(self):
+        self.assertIndexScan(Phones.objects.filter(brand='Brand 7'), 'store_phones', ['phones_brand_idx'])
+
+
+@override_settings(STRIPE_BACKEND='fake')
+class StripeSyncTests(TestCase):
+    def setUp(self):
+        stripe_sync_service._fake_stripe = None
+        self.addCleanup(setattr, stripe_sync_service, '_fake_stripe', None)
+        self.phone = Phones.objects.create(name='One', brand='Apple')
+        self.variant = PhoneVariant.objects.create(phone=self.phone, color='Black', storage='128GB', price=Decimal('500.00'))
+        self.product_task = StripeSyncTask.objects.get(kind=StripeSyncTask.PHONE_PRODUCT, object_id=self.phone.id)
+        self.price_task = StripeSyncTask.objects.get(kind=StripeSyncTask.VARIANT_PRICE, object_id=self.variant.id)
+
+    def test_price_waits_for_pending_product(self):
+        # The product's task is not due yet
+        StripeSyncTask.objects.filter(id=self.product_task.id).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(StripeSyncService.process_batch(), {'done': 0, 'retried': 1, 'failed': 0})
+        self.price_task.refresh_from_db()
+        self.assertEqual((self.price_task.status, self.price_task.attempts), (StripeSyncTask.PENDING, 0))
+
+    def test_price_fails_with_its_product(self):
+        StripeSyncTask.objects.filter(id=self.product_task.id).update(status=StripeSyncTask.FAILED)
+
+        with self.assertLogs(stripe_sync_service.logger, 'ERROR'):
+            self.assertEqual(StripeSyncService.process_batch(), {'done': 0, 'retried': 0, 'failed': 1})
+        self.price_task.refresh_from_db()
+        self.assertEqual(self.price_task.status, StripeSyncTask.FAILED)
+
+    @override_settings(STRIPE_SYNC_MAX_WAIT=0)
+    def test_price_gives_up_waiting(self):
+        StripeSyncTask.objects.filter(id=self.product_task.id).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        with self.assertLogs(stripe_sync_service.logger, 'ERROR'):
+            self.assertEqual(StripeSyncService.process_batch(), {'done': 0, 'retried': 0, 'failed': 1})
+        self.price_task.refresh_from_db()
+        self.assertEqual(self.price_task.status, StripeSyncTask.FAILED)
+
+    def test_product_then_price(self):
+        self.assertEqual(StripeSyncService.process_batch(), {'done': 2, 'retried': 0, 'failed': 0})
+        self.variant.refresh_from_db()
+        self.assertTrue(self.variant.stripe_price_id)
+
+    @override_settings(STRIPE_FAKE_LATENCY=0.01, STRIPE_FAKE_FAILURE_RATE=1)
+    def test_fake_client_settings(self):
+        client = StripeSyncService.get_client()
+        self.assertEqual((client.latency, client.failure_rate), (0.01, 1))
+        self.assertEqual(StripeSyncService.process_batch(), {'done': 0, 'retried': 2, 'failed': 0})
+
+
+@override_settings(CATALOG_FACETS_SYNC_INTERVAL=0)
+class FacetSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for name, value in (('_indexes', {}), ('_version', None), ('_synced_at', None)):
+            self.addCleanup(setattr, FacetService, name, getattr(FacetService, name))
+            setattr(FacetService, name, value)
+        phone = Phones.objects.create(name='One', brand='Apple')
+        with self.captureOnCommitCallbacks(execute=True):
+            PhoneVariant.objects.create(phone=phone, color='Black', storage='128GB', price=Decimal('500.00'))
+
+    def test_evicted_version_rebuilds_once(self):
+        FacetService.query('phone', {})
+        cache.delete(FACETS_VERSION_KEY)
+
+        with mock.patch.object(FacetService, 'rebuild', wraps=FacetService.rebuild) as rebuild:
+            for _ in range(3):
+                self.assertEqual(FacetService.query('phone', {'brand': ['Apple']})['count'], 1)
+        self.assertEqual(rebuild.call_count, 1)
+
+    def test_changes_after_eviction_are_applied(self):
+        FacetService.query('phone', {})
+        cache.delete(FACETS_VERSION_KEY)
+        FacetService.query('phone', {})
+
+        phone = Phones.objects.create(name='Two', brand='Samsung')
+        with self.captureOnCommitCallbacks(execute=True):
+            PhoneVariant.objects.create(phone=phone, color='White', storage='256GB', price=Decimal('400.00'))
+        with mock.patch.object(FacetService, 'rebuild', wraps=FacetService.rebuild) as rebuild:
+            self.assertEqual(FacetService.query('phone', {'brand': ['Samsung']})['count'], 1)
+        rebuild.assert_not_called()
+
+
+class SearchServiceTests(TestCase):
+    """
+    Full-text search on PostgreSQL, the icontains fallback on other
+    databases
+    """
+    def setUp(self):
+        iphone = Phones.objects.create(name='iPhone 15', brand='Apple', description='A phone')
+        galaxy = Phones.objects.create(name='Galaxy S24', brand='Samsung', description='A phone')
+        self.black = PhoneVariant.objects.create(
+            phone=iphone, sku='SKU-1', color='Black', storage='128GB', price=Decimal('800.00')
+        )
+        self.blue = PhoneVariant.objects.create(
+            phone=iphone, sku='SKU-2', color='Blue', storage='256GB', price=Decimal('900.00')
+        )
+        PhoneVariant.objects.create(
+            phone=iphone, sku='SKU-3', color='Red', storage='128GB', price=Decimal('800.00'), is_active=False
+        )
+        self.galaxy = PhoneVariant.objects.create(
+            phone=galaxy, sku='SKU-4', color='Black', storage='256GB', price=Decimal('700.00')
+        )
+        self.charger = Accessory.objects.create(
+            name='Charger', description='Comes with a travel case', price=Decimal('20.00')
+        )
+        self.case = Accessory.objects.create(name='iPhone Case', description='Fits the iPhone 15', price=Decimal('15.00'))
+        Accessory.objects.create(name='Leather Case', price=Decimal('30.00'), is_active=False)
+
+    def search(self, query):
+        return {
+            product_type: {product.id for product in products}
+            for product_type, products in SearchService.search(query).items()
+        }
+
+    def test_every_term_matches(self):
+        self.assertEqual(self.search('iphone black'), {'phones': {self.black.id}, 'accessories': set()})
+        self.assertEqual(self.search('Samsung 256GB'), {'phones': {self.galaxy.id}, 'accessories': set()})
+
+    def test_last_term_is_a_prefix(self):
+        self.assertEqual(self.search('bla'), {'phones': {self.black.id, self.galaxy.id}, 'accessories': set()})
+        self.assertEqual(self.search('iphone ca'), {'phones': set(), 'accessories': {self.case.id}})
+        self.assertEqual(self.search('galaxy b'), {'phones': {self.galaxy.id}, 'accessories': set()})
+
+    def test_inactive_products_are_left_out(self):
+        self.assertEqual(self.search('red'), {'phones': set(), 'accessories': set()})
+        self.assertEqual(self.search('leather'), {'phones': set(), 'accessories': set()})
+
+    def test_query_without_words(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(SearchService.search(' ?! '), {'phones': [], 'accessories': []})
+
+    def test_limit(self):
+        self.assertEqual(len(SearchService.search('black', limit=1)['phones']), 1)
+
+    def test_fallback(self):
+        with mock.patch.object(SearchService, 'is_supported', return_value=False):
+            self.assertEqual(self.search('iphone b'), {'phones': {self.black.id, self.blue.id}, 'accessories': set()})
+            self.assertEqual(self.search('case'), {'phones': set(), 'accessories': {self.charger.id, self.case.id}})
+            self.assertEqual(
+                [accessory.id for accessory in SearchService.search('case')['accessories']],
+                [self.charger.id, self.case.id]
+            )
+
+    @skipUnless(connection.vendor == 'postgresql', 'ranks with full-text search')
+    def test_name_matches_rank_first(self):
+        # Charger only mentions a case in its description
+        self.assertEqual(
+            [accessory.id for accessory in SearchService.search('case')['accessories']],
+            [self.case.id, self.charger.id]
+        )
+        self.assertEqual(
+            [accessory.id for accessory in SearchService.search('ca')['accessories']],
+            [self.case.id, self.charger.id]
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'stems with full-text search')
+    def test_stemming(self):
+        self.assertEqual(self.search('chargers'), {'phones': set(), 'accessories': {self.charger.id}})
+
+    def test_view(self):
+        response = self.client.get(reverse('search'), {'q': 'iphone black', 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['query'], 'iphone black')
+        self.assertEqual([phone['id'] for phone in response.data['phones']], [self.black.id])
+        self.assertEqual(response.data['accessories'], [])
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'case', 'limit': 'all'}).status_code, 400)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'needs DB_REPLICA_HOSTS')
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Run with DB_REPLICA_HOSTS set, e.g. to the primary's host: the test
+    replica mirrors the test database, and queries are told apart by the
+    connection they run on
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        self.replica = settings.DATABASE_REPLICAS[0]
+        settings_override = override_settings(DATABASE_REPLICAS=[self.replica])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Accessory.objects.create(name='Case', price=Decimal('20.00'), is_new_arrival=True)
+        # Including the recent purge marker
+        cache.clear()
+
+    @contextmanager
+    def count_queries(self):
+        """
+        Yields {'primary': n, 'replica': n}, filled in when the block exits
+        """
+        counts = {}
+        with ExitStack() as stack:
+            primary = stack.enter_context(CaptureQueriesContext(connections['default']))
+            replica = stack.enter_context(CaptureQueriesContext(connections[self.replica]))
+            yield counts
+        counts.update(primary=len(primary), replica=len(replica))
+
+    def test_reads_use_primary_by_default(self):
+        with self.count_queries() as counts:
+            Accessory.objects.count()
+        self.assertEqual(counts, {'primary': 1, 'replica': 0})
+
+    def test_replica_reads_until_write(self):
+        with self.count_queries() as counts, replica_reads():
+            Accessory.objects.count()
+            Accessory.objects.create(name='Charger', price=Decimal('30.00'))
+            Accessory.objects.count()
+        self.assertEqual(counts['replica'], 1)
+        self.assertGreaterEqual(counts['primary'], 2)
+
+    def test_transactions_read_primary(self):
+        with self.count_queries() as counts, replica_reads(), transaction.atomic():
+            Accessory.objects.count()
+        self.assertEqual(counts['replica'], 0)
+
+    def test_write_pins_client_with_cookie(self):
+        with self.count_queries() as counts:
+            self.client.get(reverse('new_arrivals'))
+        self.assertEqual(counts['primary'], 0)
+        self.assertGreater(counts['replica'], 0)
+
+        response = self.client.delete(reverse('stock_reservation', args=['00000000-0000-0000-0000-000000000000']))
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        # The rebuild after a purge reads the primary even if the purge
+        # marker was evicted
+        cache.delete(NEW_ARRIVALS_KEY)
+        with self.count_queries() as counts:
+            self.client.get(reverse('new_arrivals'))
+        self.assertGreater(counts['primary'], 0)
+        self.assertEqual(counts['replica'], 0)
+
+    def test_build_reads_after_purge(self):
+        with replica_reads():
+            with self.count_queries() as counts, CatalogCacheService.build_reads():
+                Accessory.objects.count()
+            self.assertEqual(counts, {'primary': 0, 'replica': 1})
+
+            CatalogCacheService.invalidate_accessories()
+            with self.count_queries() as counts, CatalogCacheService.build_reads():
+                Accessory.objects.count()
+            self.assertEqual(counts, {'primary': 1, 'replica': 0})
+
+
+@override_settings(DB_CONNECTION_METRICS_INTERVAL=60)
+class ConnectionMetricsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        ConnectionMetricsService._pending = {}
+        ConnectionMetricsService._flushed_at = time.monotonic()
+
+    def test_metrics_are_flushed_per_interval(self):
+        with mock.patch.object(cache, 'incr', wraps=cache.incr) as incr:
+            ConnectionMetricsService.record('test', 0.002)
+            ConnectionMetricsService.record('test', 0.25)
+            self.assertEqual(ConnectionMetricsService.get_metrics(['test'])['test'], {
+                'connections': 0, 'wait_us': 0, 'slow': 0
+            })
+            self.assertEqual(incr.call_count, 0)
+
+            ConnectionMetricsService._flushed_at -= 60
+            ConnectionMetricsService.record('test', 0.001)
+        self.assertEqual(ConnectionMetricsService.get_metrics(['test'])['test'], {
+            'connections': 3, 'wait_us': 253000, 'slow': 1
+        })
+        # One per event, not per connection
+        self.assertEqual(incr.call_count, 3)
+        self.assertEqual(ConnectionMetricsService._pending, {})
+
+    def test_server_timing_header(self):
+        def get_response(request):
+            ConnectionMetricsService.record('test', 0.0125)
+            ConnectionMetricsService.record('test', 0.0025)
+            return HttpResponse()
+
+        response = DatabaseTimingMiddleware(get_response)(RequestFactory().get('/'))
+        self.assertEqual(response['Server-Timing'], 'db-connect;dur=15.0')
+        # Connections outside a request are not added to it
+        ConnectionMetricsService.record('test', 1)
+        self.assertEqual(response['Server-Timing'], 'db-connect;dur=15.0')
+
+    async def test_server_timing_header_async(self):
+        async def get_response(request):
+            ConnectionMetricsService.record('test', 0.004)
+            return HttpResponse()
+
+        response = await DatabaseTimingMiddleware(get_response)(RequestFactory().get('/'))
+        self.assertEqual(response['Server-Timing'], 'db-connect;dur=4.0')
+
+    @skipUnless(connection.vendor == 'postgresql', 'times the PostgreSQL backend')
+    def test_backend_records_connections(self):
+        connection.close()
+        connection.ensure_connection()
+        self.assertEqual(ConnectionMetricsService._pending[connection.alias]['connections'], 1)
+
+
+@override_settings(CATALOG_BASE_URL='https://shop.example', ALLOWED_HOSTS=['shop.example'])
+class CatalogRequestTests(TestCase):
+    def test_absolute_urls_use_public_origin(self):
+        request = build_catalog_request()
+        self.assertTrue(request.is_secure())
+        self.assertEqual(request.build_absolute_uri('/media/a.jpg'), 'https://shop.example/media/a.jpg')
+
+    def test_warmed_payloads_use_public_origin(self):
+        cache.clear()
+        Accessory.objects.create(name='Case', price=Decimal('20.00'), image='accessories/case.jpg', is_new_arrival=True)
+        call_command('warm_catalog_cache', '--top', '1', stdout=StringIO())
+        self.assertIn(
+            b'https://shop.example/media/accessories/case.jpg',
+            CatalogCacheService.get_or_build(NEW_ARRIVALS_KEY, lambda: None)['body']
+        )
+
+
+@override_settings(STOCK_RESERVATION_MAX_HELD_PER_CLIENT=20)
+class StockReservationViewTests(TestCase):
+    def setUp(self):
+        # Throttle history
+        cache.clear()
+        self.accessory = Accessory.objects.create(name='Case', price=Decimal('20.00'), stock=100)
+
+    def reserve(self, quantity):
+        return self.client.post(reverse('stock_reservations'), {
+            'product_type': 'accessory',
+            'product_id': self.accessory.id,
+            'quantity': quantity
+        })
+
+    def test_held_quantity_is_capped_per_client(self):
+        self.assertEqual(self.reserve(10).status_code, 201)
+        self.assertEqual(self.reserve(10).status_code, 201)
+        self.assertEqual(self.reserve(1).status_code, 409)
+        self.assertEqual(
+            list(StockReservation.objects.values_list('client', flat=True).distinct()),
+            ['ip:127.0.0.1']
+        )
+
+        # Released stock counts no more
+        reference = StockReservation.objects.first().reference
+        self.client.delete(reverse('stock_reservation', args=[reference]))
+        self.assertEqual(self.reserve(10).status_code, 201)
+
+    def test_sale_purges_cached_payloads(self):
+        keys = [NEW_ARRIVALS_KEY, CatalogCacheService.accessory_detail_key(self.accessory.slug)]
+        reference = self.reserve(2).json()['reference']
+        cache.set_many({key: 'cached' for key in keys})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(InventoryService.commit(reference))
+        self.assertEqual(cache.get_many(keys), {})
+
+    def test_requests_are_throttled(self):
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'stock_reservations': '3/min'}):
+            statuses = [self.reserve(1).status_code for _ in range(4)]
+        self.assertEqual(statuses, [201, 201, 201, 429])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs concurrent writers')
+class StockReservationConcurrencyTests(TransactionTestCase):
+    """
+    Hundreds of reservers racing for the same units never oversell, and
+    concurrent commits and releases of the same reservations are applied
+    once
+    """
+    STOCK = 50
+    RESERVERS = 300
+    THREADS = 50
+
+    def run_concurrently(self, function, arguments):
+        def run(argument):
+            try:
+                return function(argument)
+            finally:
+                connections.close_all()
+        with ThreadPoolExecutor(self.THREADS) as executor:
+            return list(executor.map(run, arguments))
+
+    def test_no_oversell(self):
+        accessory = Accessory.objects.create(name='Case', price=Decimal('20.00'), stock=self.STOCK)
+
+        def reserve(_):
+            try:
+                return InventoryService.reserve('accessory', accessory.id, 1).reference
+            except InsufficientStock:
+                return None
+
+        references = [reference for reference in self.run_concurrently(reserve, range(self.RESERVERS)) if reference]
+        accessory.refresh_from_db()
+        self.assertEqual(len(references), self.STOCK)
+        self.assertEqual(accessory.reservedStock, self.STOCK)
+        self.assertEqual(StockReservation.objects.filter(status=StockReservation.HELD).count(), self.STOCK)
+
+        # Commit and release race for every reservation: one of them wins
+        actions = [(InventoryService.commit, reference) for reference in references]
+        actions += [(InventoryService.release, reference) for reference in references]
+        results = self.run_concurrently(lambda action: action[0](action[1]), actions)
+        self.assertEqual(sum(results), self.STOCK)
+
+        committed = StockReservation.objects.filter(status=StockReservation.COMMITTED).count()
+        released = StockReservation.objects.filter(status=StockReservation.RELEASED).count()
+        accessory.refresh_from_db()
+        self.assertEqual(committed + released, self.STOCK)
+        self.assertEqual(accessory.reservedStock, 0)
+        self.assertEqual(accessory.stock, self.STOCK - committed)
+
+
+class AsyncDetailViewTests(TransactionTestCase):
+    """
+    The async detail views of the ASGI deployment answer exactly like the
+    sync ones, including the 404s for missing products and errors
+    """
+    # With DB_REPLICA_HOSTS set, ReplicaRoutingMiddleware sends these GETs
+    # to a replica, and test cases refuse queries on aliases missing here
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        phone = Phones.objects.create(name='One', brand='Apple')
+        PhoneVariant.objects.create(phone=phone, sku='ONE-128', color='Black', storage='128GB', price=Decimal('500.00'))
+        accessory = Accessory.objects.create(name='Case', price=Decimal('20.00'))
+        self.paths = {
+            'phone': [reverse('phone_detail', args=[phone.slug]), reverse('phone_detail', args=['missing'])],
+            'accessory': [reverse('accessory_detail', args=[accessory.slug]), reverse('accessory_detail', args=['missing'])],
+        }
+        self.failures = {
+            'phone': mock.patch.object(ProductService, 'get_phone_details_by_slug', side_effect=ValueError('Panne réseau')),
+            'accessory': mock.patch.object(ProductService, 'get_accessory_details_by_slug', side_effect=ValueError('Panne réseau')),
+        }
+
+    def get_both(self, path):
+        cache.clear()
+        sync_response = self.client.get(path)
+        cache.clear()
+        with override_settings(ROOT_URLCONF='store.asgi_urls'):
+            async_response = async_to_sync(AsyncClient().get)(path)
+        return sync_response, async_response
+
+    def assertSameResponse(self, path):
+        sync_response, async_response = self.get_both(path)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response['Content-Type'], sync_response['Content-Type'])
+        self.assertEqual(async_response.content, sync_response.content)
+        return sync_response
+
+    def test_responses_match(self):
+        for product_type, (found, missing) in self.paths.items():
+            with self.subTest(product_type=product_type):
+                self.assertEqual(self.assertSameResponse(found).status_code, 200)
+                self.assertEqual(self.assertSameResponse(missing).status_code, 404)
+                with self.failures[product_type]:
+                    response = self.assertSameResponse(found)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'error': 'Panne réseau'})
+
+
+class FastSerializerContract:
+    """
+    Checks that a values() serializer renders exactly what its DRF
+    serializer renders, with and without a request, in UTC and another
+    time zone, and through its fragment cache
+    """
+    def assertSameOutput(self, drf_serializer, values_serializer, queryset):
+        self.assertEqual([name for name, _, _ in values_serializer.fields], drf_serializer.Meta.fields)
+        rows = list(queryset.values(*values_serializer.columns()))
+        self.assertEqual(len(rows), queryset.count())
+        for request in (None, RequestFactory().get('/')):
+            for time_zone in ('UTC', 'America/Sao_Paulo'):
+                with self.subTest(request=request, time_zone=time_zone), timezone.override(time_zone):
+                    cache.clear()
+                    expected = JSONRenderer().render(drf_serializer(queryset, many=True, context={'request': request}).data)
+                    self.assertEqual(JSONRenderer().render(values_serializer.serialize(rows, request)), expected)
+                    # Cold, then from the fragments
+                    self.assertEqual(JSONRenderer().render(values_serializer.serialize_cached(rows, request)), expected)
+                    self.assertEqual(JSONRenderer().render(values_serializer.serialize_cached(rows, request)), expected)
+
+
+class FastSerializerContractTests(FastSerializerContract, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        phones = Phones.objects.bulk_create([
+            Phones(name='Galaxy S24', slug='samsung-galaxy-s24', brand='Samsung', description='Flagship'),
+            Phones(name='Pixel 9 — Édition', slug='google-pixel-9', brand='Google', description=None),
+            Phones(name='Phone 3', slug='phone-3', brand='Brand', description=''),
+        ])
+        PhoneVariant.objects.bulk_create([
+            PhoneVariant(
+                phone=phones[number % len(phones)],
+                sku=f'SKU-{number}',
+                color=['Black', 'Blanc cassé', ''][number % 3],
+                storage='128GB',
+                price=[Decimal('999.99'), Decimal('5'), Decimal('0.5'), Decimal('12345678.90')][number % 4],
+                stock=number,
+                image=['', 'phones/black.jpg', 'phones/space gray.png'][number % 3],
+                is_active=number % 5 != 0,
+                is_new_arrival=number % 2 == 0,
+                is_best_seller=number % 3 == 0
+            )
+            for number in range(24)
+        ])
+        Accessory.objects.bulk_create([
+            Accessory(
+                name=f'Accessory {number} ü',
+                slug=f'accessory-{number}',
+                description=[None, '', 'A case'][number % 3],
+                price=[Decimal('19.90'), Decimal('7'), Decimal('0.01')][number % 3],
+                stock=number,
+                image=['accessories/case.jpg', ''][number % 2],
+                is_active=number % 4 != 0,
+                is_new_arrival=number % 2 == 1,
+                is_best_seller=number % 3 == 1
+            )
+            for number in range(12)
+        ])
+
+    def test_phone_variant(self):
+        self.assertSameOutput(
+            PhoneVariantSerializer,
+            PhoneVariantValuesSerializer,
+            PhoneVariant.objects.select_related('phone').order_by('id')
+        )
+
+    def test_accessory(self):
+        self.assertSameOutput(AccessorySerializer, AccessoryValuesSerializer, Accessory.objects.order_by('id'))
@@ -6,6 +6,13 @@ from django.views.generic import RedirectView
 from store.views import (
     NewArrivalsAPIView, 
     BestSellersAPIView,
+    PhoneListAPIView,
+    AccessoryListAPIView,
+    SearchAPIView,
+    PhoneFacetsAPIView,
+    AccessoryFacetsAPIView,
+    StockReservationAPIView,
+    StockReservationDetailAPIView,
     PhoneVariantDetailAPIView,
     AccessoryDetailAPIView
 )
@@ -19,6 +26,13 @@ urlpatterns = [
    
     path('api/new-arrivals/', NewArrivalsAPIView.as_view(), name='new_arrivals'),
     path('api/best-sellers/', BestSellersAPIView.as_view(), name='best_sellers'),
+    path('api/search/', SearchAPIView.as_view(), name='search'),
+    path('api/facets/phones/', PhoneFacetsAPIView.as_view(), name='phone_facets'),
+    path('api/facets/accessories/', AccessoryFacetsAPIView.as_view(), name='accessory_facets'),
+    path('api/reservations/', StockReservationAPIView.as_view(), name='stock_reservations'),
+    path('api/reservations/<uuid:reference>/', StockReservationDetailAPIView.as_view(), name='stock_reservation'),
+    path('api/phones/', PhoneListAPIView.as_view(), name='phone_list'),
+    path('api/accessories/', AccessoryListAPIView.as_view(), name='accessory_list'),
     path('api/phones/<slug:slug>/', PhoneVariantDetailAPIView.as_view(), name='phone_detail'),
     path('api/accessories/<slug:slug>/', AccessoryDetailAPIView.as_view(), name='accessory_detail'),
 ]  + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
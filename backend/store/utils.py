@@ -0,0 +1,149 @@
+"""
+Utility functions for the store app.
+"""
+from urllib.parse import urlparse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpRequest
+
+
+def next_free_slug(base_slug, taken):
+    """
+    Get the first of base_slug, base_slug-1, base_slug-2, ... not in taken
+    """
+    if base_slug not in taken:
+        return base_slug
+    n = 1
+    while f"{base_slug}-{n}" in taken:
+        n += 1
+    return f"{base_slug}-{n}"
+
+
+def allocate_slug(queryset, base_slug, field='slug'):
+    """
+    Get the first free slug for base_slug with a single prefix query,
+    instead of one exists() query per taken suffix.
+
+    Args:
+        queryset: Rows whose slugs are taken, e.g. Model.objects
+        base_slug (str): The slug to use when it is free
+        field (str): Name of the slug field
+
+    Returns:
+        str: The allocated slug
+    """
+    return allocate_slugs(queryset, [base_slug], field)[0]
+
+
+def allocate_slugs(queryset, base_slugs, field='slug', batch_size=500):
+    """
+    Allocate slugs for a batch of new rows. Slugs are unique among
+    themselves and against the existing rows, using one prefix query per
+    batch_size distinct base slugs.
+
+    Args:
+        queryset: Rows whose slugs are taken, e.g. Model.objects
+        base_slugs (list): One base slug per new row; duplicates get suffixes
+        field (str): Name of the slug field
+
+    Returns:
+        list: The allocated slugs, in the order of base_slugs
+    """
+    distinct = list(dict.fromkeys(base_slugs))
+    taken = set()
+    for start in range(0, len(distinct), batch_size):
+        prefixes = Q()
+        for base_slug in distinct[start:start + batch_size]:
+            prefixes |= Q(**{f'{field}__startswith': base_slug})
+        taken.update(queryset.filter(prefixes).values_list(field, flat=True))
+
+    slugs = []
+    for base_slug in base_slugs:
+        slug = next_free_slug(base_slug, taken)
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def save_with_unique_slug(instance, base_slug, save, field='slug', attempts=5):
+    """
+    Run save() with a freshly allocated slug, retrying with the next free
+    slug when a concurrent writer took it between allocation and insert.
+
+    Args:
+        instance: The model instance being saved
+        base_slug (str): The slug to allocate from, or None to keep the
+            instance's current slug and just call save()
+        save (callable): Saves the instance
+        field (str): Name of the slug field
+        attempts (int): How many slugs to try before giving up
+    """
+    if base_slug is None:
+        return save()
+
+    manager = type(instance)._default_manager
+    for attempt in range(attempts):
+        slug = allocate_slug(manager, base_slug, field)
+        setattr(instance, field, slug)
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            lost_race = manager.filter(**{field: slug}).exclude(pk=instance.pk).exists()
+            if not lost_race or attempt == attempts - 1:
+                setattr(instance, field, '')
+                raise
+
+
+def save_kwargs_excluding(instance, kwargs, excluded):
+    """
+    Leave fields out of the UPDATE when an existing row is saved. For
+    counters that are only changed with `SET field = field + n` statements,
+    which a save() would overwrite with the value it loaded.
+
+    Args:
+        instance: The model instance being saved
+        kwargs (dict): The keyword arguments passed to save()
+        excluded (set): Names of the fields to leave out
+
+    Returns:
+        dict: kwargs with update_fields set, unless the row is new or the
+            caller chose the fields
+    """
+    if instance._state.adding or kwargs.get('force_insert') or kwargs.get('update_fields') is not None:
+        return kwargs
+    deferred = instance.get_deferred_fields()
+    return {**kwargs, 'update_fields': [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.attname not in deferred and field.name not in excluded
+    ]}
+
+
+class CatalogRequest(HttpRequest):
+    """
+    GET / on the public origin of the API, see build_catalog_request
+    """
+    def __init__(self, scheme, host):
+        super().__init__()
+        self.method = 'GET'
+        self.path = self.path_info = '/'
+        self.META['HTTP_HOST'] = host
+        self._scheme = scheme
+
+    def _get_scheme(self):
+        return self._scheme
+
+
+def build_catalog_request():
+    """
+    Request used as serializer context when payloads are built outside of a
+    request (the cache warmer, the flash deal scheduler), so absolute URLs
+    in them use the public origin, CATALOG_BASE_URL, as during a real
+    request
+
+    Returns:
+        HttpRequest: GET / with the host and scheme of CATALOG_BASE_URL
+    """
+    base_url = urlparse(settings.CATALOG_BASE_URL)
+    return CatalogRequest(base_url.scheme, base_url.netloc)
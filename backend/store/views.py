@@ -1,115 +1,277 @@
+from decimal import Decimal, InvalidOperation
 from django.utils import timezone
 from django.db.models import Q
-from django.core.cache import cache
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 from rest_framework.pagination import PageNumberPagination
 
 from .models import Phones, PhoneVariant, Accessory
+from .services.product_service import ProductService
+from .services.payload_service import CatalogPayloadService
+from .services.search_service import SearchService
+from .services.facet_service import FacetService
+from .services.inventory_service import InventoryService, InsufficientStock, ReservationLimitExceeded
 from .serializers import (
-    PhoneSerializer, 
-    PhoneVariantSerializer, 
-    AccessorySerializer
+    PhoneVariantSerializer,
+    AccessorySerializer,
+    StockReservationRequestSerializer,
+    StockReservationSerializer
+)
+from .pagination import KeysetPagination
+from .responses import rendered_json_response
+from .services.cache_service import (
+    CatalogCacheService,
+    NEW_ARRIVALS_KEY,
+    BEST_SELLERS_KEY
 )
-from .services.product_service import ProductService
 
 class ProductPagination(PageNumberPagination):
     page_size = 8
     page_size_query_param = 'page_size'
     max_page_size = 20
 
-class NewArrivalsAPIView(APIView):
+def get_listing_filters(request):
+    """
+    Parse the active, min_price and max_price filters of a catalog listing
+
+    Raises:
+        ValidationError: If a filter value is invalid
+    """
+    params = request.query_params
+    active = params.get('active', 'true').lower()
+    if active not in ('true', 'false', 'all'):
+        raise ValidationError({'active': "Must be one of: true, false, all"})
+    filters = {'active': None if active == 'all' else active == 'true'}
+    for name in ('min_price', 'max_price'):
+        try:
+            filters[name] = Decimal(params[name]) if params.get(name) else None
+        except InvalidOperation:
+            raise ValidationError({name: "Must be a number"})
+        if filters[name] is not None and not filters[name].is_finite():
+            raise ValidationError({name: "Must be a number"})
+    return filters
+
+class PhoneListAPIView(APIView):
+    """
+    All phone variants, filtered by ?brand=, ?active= (true, false or all)
+    and ?min_price= / ?max_price=, sorted by ?sort= and paginated by ?cursor=
+    """
     permission_classes = [AllowAny]
-    pagination_class = ProductPagination
-    
+    pagination_class = KeysetPagination
+    sort_fields = {
+        'newest': ('createdAt', True),
+        'price': ('price', False),
+        '-price': ('price', True),
+        'name': ('phone__name', False),
+    }
+    default_sort = 'newest'
+
     def get(self, request, format=None):
-        cache_key = 'new_arrivals'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-            
-        new_arrivals = ProductService.get_new_arrivals()
-        
-        response_data = {
-            'products': PhoneVariantSerializer(
-                new_arrivals['phones'],
+        variants = ProductService.get_phone_variants(
+            brand=request.query_params.get('brand'),
+            **get_listing_filters(request)
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(variants, request, view=self)
+        serializer = PhoneVariantSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+class AccessoryListAPIView(APIView):
+    """
+    All accessories, filtered by ?active= (true, false or all) and
+    ?min_price= / ?max_price=, sorted by ?sort= and paginated by ?cursor=
+    """
+    permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    sort_fields = {
+        'newest': ('createdAt', True),
+        'price': ('price', False),
+        '-price': ('price', True),
+        'name': ('name', False),
+    }
+    default_sort = 'newest'
+
+    def get(self, request, format=None):
+        accessories = ProductService.get_accessories(**get_listing_filters(request))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(accessories, request, view=self)
+        serializer = AccessorySerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+class SearchAPIView(APIView):
+    """
+    Search active phone variants and accessories with ?q=, returning up to
+    ?limit= (max 50) of each, best matches first
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, format=None):
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            raise ValidationError({'limit': "Must be a number"})
+        results = SearchService.search(query, limit=limit)
+        return Response({
+            'query': query,
+            'phones': PhoneVariantSerializer(
+                results['phones'],
                 many=True,
                 context={'request': request}
-            ).data + AccessorySerializer(
-                new_arrivals['accessories'],
+            ).data,
+            'accessories': AccessorySerializer(
+                results['accessories'],
                 many=True,
                 context={'request': request}
             ).data
-        }
-        
-        # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
-        return Response(response_data)
+        })
 
-class BestSellersAPIView(APIView):
+class PhoneFacetsAPIView(APIView):
+    """
+    Active phone variants filtered by ?brand=, ?color=, ?storage= and
+    ?price= (a price bucket such as 500-750), each repeatable. Returns the
+    number of matches, the count of every facet value and up to ?limit=
+    (max 100) of the newest matches.
+    """
     permission_classes = [AllowAny]
-    pagination_class = ProductPagination
-    
+    product_type = 'phone'
+    serializer_class = PhoneVariantSerializer
+
+    def get_products(self, ids):
+        return PhoneVariant.objects.filter(id__in=ids).select_related('phone')
+
     def get(self, request, format=None):
-        cache_key = 'best_sellers'
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-            
-        best_sellers = ProductService.get_best_sellers()
-        
-        response_data = {
-            'products': PhoneVariantSerializer(
-                best_sellers['phones'],
-                many=True,
-                context={'request': request}
-            ).data + AccessorySerializer(
-                best_sellers['accessories'],
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 0), 100)
+        except ValueError:
+            raise ValidationError({'limit': "Must be a number"})
+        result = FacetService.query(
+            self.product_type,
+            {facet: request.query_params.getlist(facet) for facet in FacetService.FACETS[self.product_type]},
+            limit=limit
+        )
+        products = {product.id: product for product in self.get_products(result['ids'])}
+        return Response({
+            'count': result['count'],
+            'facets': result['facets'],
+            'results': self.serializer_class(
+                [products[product_id] for product_id in result['ids'] if product_id in products],
                 many=True,
                 context={'request': request}
             ).data
-        }
-        
-        # Cache for 15 minutes
-        cache.set(cache_key, response_data, 60 * 15)
-        
-        return Response(response_data)
+        })
+
+class AccessoryFacetsAPIView(PhoneFacetsAPIView):
+    """
+    Active accessories filtered by ?price= buckets, as PhoneFacetsAPIView
+    """
+    product_type = 'accessory'
+    serializer_class = AccessorySerializer
+
+    def get_products(self, ids):
+        return Accessory.objects.filter(id__in=ids)
+
+class StockReservationAPIView(APIView):
+    """
+    Hold stock for a cart: POST product_type, product_id and quantity.
+    The reservation expires after STOCK_RESERVATION_TIMEOUT seconds unless
+    the order is placed. Clients are rate limited and may hold at most
+    STOCK_RESERVATION_MAX_HELD_PER_CLIENT at a time.
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'stock_reservations'
+
+    def get_client(self, request):
+        """
+        The user, or the IP address (as identified by the throttle) for
+        anonymous clients
+        """
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_throttles()[0].get_ident(request)}'
+
+    def post(self, request, format=None):
+        serializer = StockReservationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reservation = InventoryService.reserve(
+                client=self.get_client(request),
+                **serializer.validated_data
+            )
+        except InsufficientStock:
+            return Response(
+                {"error": "Not enough stock available"},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ReservationLimitExceeded:
+            return Response(
+                {"error": "Too much stock already held; release or buy some first"},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(StockReservationSerializer(reservation).data, status=status.HTTP_201_CREATED)
+
+class StockReservationDetailAPIView(APIView):
+    """
+    DELETE releases a held reservation
+    """
+    permission_classes = [AllowAny]
+
+    def delete(self, request, reference, format=None):
+        if not InventoryService.release(reference):
+            return Response(
+                {"error": "Reservation not found or no longer held"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class NewArrivalsAPIView(APIView):
+    permission_classes = [AllowAny]
+    pagination_class = ProductPagination
+    
+    def get(self, request, format=None):
+        payload = CatalogCacheService.get_or_build(
+            NEW_ARRIVALS_KEY,
+            lambda: CatalogPayloadService.build_new_arrivals(request)
+        )
+        return rendered_json_response(request, payload)
+
+class BestSellersAPIView(APIView):
+    permission_classes = [AllowAny]
+    pagination_class = ProductPagination
+    
+    def get(self, request, format=None):
+        payload = CatalogCacheService.get_or_build(
+            BEST_SELLERS_KEY,
+            lambda: CatalogPayloadService.build_best_sellers(request)
+        )
+        return rendered_json_response(request, payload)
 
 class PhoneVariantDetailAPIView(APIView):
     permission_classes = [AllowAny] 
     def get(self, request, slug, format=None):
-        try:
-            cache_key = f'phone_detail_{slug}'
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                return Response(cached_data)
-                
+        def build():
             product_data = ProductService.get_phone_details_by_slug(slug)
             if not product_data:
+                return None
+            return CatalogPayloadService.build_phone_detail(product_data, request)
+        
+        try:
+            payload = CatalogCacheService.get_or_build(
+                CatalogCacheService.phone_detail_key(slug),
+                build,
+                metrics_name='phone_detail'
+            )
+            if payload is None:
                 return Response(
                     {"error": "Phone not found or has no active variants"},
                     status=status.HTTP_404_NOT_FOUND
                 )
-                
-            response_data = {
-                'phone': PhoneSerializer(product_data['phone'], context={'request': request}).data,
-                'variants': PhoneVariantSerializer(
-                    product_data['variants'],
-                    many=True,
-                    context={'request': request}
-                ).data,
-                'related_products': PhoneVariantSerializer(
-                    product_data['related_products'],
-                    many=True,
-                    context={'request': request}
-                ).data
-            }
-            
-            # Cache for 15 minutes
-            cache.set(cache_key, response_data, 60 * 15)
-            return Response(response_data)
+            return rendered_json_response(request, payload)
             
         except Exception as e:
             return Response(
@@ -121,36 +283,26 @@ class AccessoryDetailAPIView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request, slug, format=None):
-        try:
-            cache_key = f'accessory_detail_{slug}'
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                return Response(cached_data)
-                
+        def build():
             product_data = ProductService.get_accessory_details_by_slug(slug)
             if not product_data:
+                return None
+            return CatalogPayloadService.build_accessory_detail(product_data, request)
+        
+        try:
+            payload = CatalogCacheService.get_or_build(
+                CatalogCacheService.accessory_detail_key(slug),
+                build,
+                metrics_name='accessory_detail'
+            )
+            if payload is None:
                 return Response(
                     {"error": "Accessory not found or not active"},
                     status=status.HTTP_404_NOT_FOUND
                 )
-                
-            response_data = {
-                'accessory': AccessorySerializer(
-                    product_data['accessory'],
-                    context={'request': request}
-                ).data,
-                'related_products': AccessorySerializer(
-                    product_data['related_products'],
-                    many=True,
-                    context={'request': request}
-                ).data
-            }
-            
-            # Cache for 15 minutes
-            cache.set(cache_key, response_data, 60 * 15)
-            return Response(response_data)
+            return rendered_json_response(request, payload)
         except Exception as e:
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_404_NOT_FOUND
-            )
\ No newline at end of file
+            )